@@ -2,18 +2,55 @@
 Shift Manager API - FastAPI Backend
 シフト管理システムのAPIサーバー
 """
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Optional
-import calendar
+from fastapi.responses import StreamingResponse
+from contextlib import asynccontextmanager
+from typing import Optional, AsyncIterator
+import asyncio
+import json
+import os
+import queue
+
+from backend import (
+    ShiftRequest, ShiftResponse, SolveExecutor, JobManager, SolveJobResponse,
+    SolveCancelled, FeasibilityResponse, analyze_request
+)
+
+# ソルバー実行プール（環境変数で調整可能）
+solve_executor = SolveExecutor(
+    max_workers=int(os.environ.get("SHIFT_SOLVE_WORKERS", 0)) or None,
+    max_concurrent=int(os.environ.get("SHIFT_SOLVE_MAX_CONCURRENT", 0)) or None
+)
+
+# SSEストリームで進捗キューを確認する間隔（秒）
+SSE_POLL_SECONDS = 0.5
+
+# 計算中にクライアントの切断を確認する間隔（秒）
+DISCONNECT_POLL_SECONDS = 0.5
+
+# 非同期ジョブ管理（終了したジョブの結果保持期間: 秒）
+job_manager = JobManager(
+    solve_executor,
+    retention_seconds=float(os.environ.get("SHIFT_JOB_RETENTION_SECONDS", 3600))
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """アプリケーションの起動・終了処理"""
+    solve_executor.start()
+    yield
+    job_manager.cancel_all()
+    solve_executor.shutdown()
 
-from backend import StaffData, ShiftRequest, ShiftResponse, ShiftSolver
 
 # FastAPI アプリケーション
 app = FastAPI(
     title="Shift Manager API",
     version="2.0.0",
-    description="シフト表自動生成システムのバックエンドAPI"
+    description="シフト表自動生成システムのバックエンドAPI",
+    lifespan=lifespan
 )
 
 # CORS設定
@@ -51,12 +88,79 @@ def parse_days(input_str: Optional[str]) -> list:
         return []
 
 
+def format_sse(event: str, data) -> str:
+    """Server-Sent Events形式のメッセージを作成"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def run_until_disconnected(http_request: Request, task: asyncio.Task,
+                                 cancel_event) -> Optional[ShiftResponse]:
+    """
+    計算タスクの完了を待つ。クライアントが切断した場合はソルバーを中断する
+    
+    Raises:
+        SolveCancelled: クライアントの切断により中断した場合
+    """
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await http_request.is_disconnected():
+                cancel_event.set()
+    except asyncio.CancelledError:
+        # サーバー側でハンドラーが中断された場合もソルバーを止める
+        cancel_event.set()
+        raise
+
+
+async def stream_solve_events(task: asyncio.Task, progress_queue,
+                              cancel_event) -> AsyncIterator[str]:
+    """
+    ソルバーの進捗をSSEとして送信し、最後に結果を送信する
+    
+    クライアントが切断してストリームが閉じられた場合はソルバーを中断する。
+    
+    Args:
+        task: SolveExecutor.run() のタスク
+        progress_queue: ワーカーが進捗を書き込む共有キュー
+        cancel_event: ソルバーのキャンセル用イベント
+    """
+    loop = asyncio.get_running_loop()
+    
+    try:
+        while True:
+            try:
+                progress = await loop.run_in_executor(
+                    None, progress_queue.get, True, SSE_POLL_SECONDS
+                )
+            except queue.Empty:
+                if task.done():
+                    break
+                continue
+            yield format_sse("progress", progress)
+    finally:
+        if not task.done():
+            cancel_event.set()
+    
+    try:
+        response = task.result()
+    except Exception as e:
+        yield format_sse("error", {"detail": f"エラーが発生しました: {str(e)}"})
+        return
+    
+    if response is None:
+        yield format_sse("error", {"detail": "シフトの作成に失敗しました"})
+    else:
+        yield format_sse("result", response.dict())
+
+
 # ==========================================
 # API Endpoints
 # ==========================================
 
 @app.post("/api/shift/solve", response_model=ShiftResponse)
-async def create_shift(request: ShiftRequest):
+async def create_shift(request: ShiftRequest, http_request: Request):
     """
     シフトを作成する
     
@@ -65,37 +169,133 @@ async def create_shift(request: ShiftRequest):
     - **target_off_days**: 常勤スタッフの目標公休日数 (1-15)
     - **staff_data**: スタッフ設定のリスト
     - **max_attempts**: 最大試行回数 (デフォルト: 2500)
+    - **workers**: 並列ワーカープロセス数 (デフォルト: 1)
+    - **time_limit_ms**: 計算時間の上限（ミリ秒）。超過時点の最良解を返す
+    - **anneal_iterations**: 焼きなましによる改善の反復回数 (デフォルト: 0=行わない)
+    - **anneal_time_ms**: 焼きなましによる改善の時間（ミリ秒）
+    - **lns_iterations**: 破壊と再構築による改善の反復回数 (デフォルト: 0=行わない)
+    - **lns_time_ms**: 破壊と再構築による改善の時間（ミリ秒）
+    - **engine**: 探索エンジン (multistart: 構築の繰り返し（デフォルト）, tabu: タブー探索,
+      exact: 制約モデルによる厳密解法, portfolio: 複数エンジンの同時実行,
+      colgen: 行の候補の組み合わせによる列生成。register_engineで登録した名前も可)
+    - **night_assignment**: 夜勤の配置方法 (greedy: 貪欲法（デフォルト）, flow: 最小費用流)
+    - **early_late_assignment**: 早番・遅番の配置方法 (greedy: 貪欲法（デフォルト）, flow: 最小費用流)
+    - **off_assignment**: 公休の配置方法 (greedy: 貪欲法（デフォルト）, flow: 最小費用流)
     """
     if not request.staff_data:
         raise HTTPException(status_code=400, detail="スタッフが登録されていません")
     
     try:
-        solver = ShiftSolver(
-            staff_data=request.staff_data,
-            year=request.year,
-            month=request.month,
-            target_off_days=request.target_off_days,
-            max_attempts=request.max_attempts
+        # ソルバーはプロセスプールで実行し、イベントループをブロックしない
+        cancel_event = solve_executor.create_event()
+        task = asyncio.create_task(
+            solve_executor.run(request, cancel_event=cancel_event)
         )
+        response = await run_until_disconnected(http_request, task, cancel_event)
         
-        schedule, errors = solver.solve()
-        
-        if schedule is None:
+        if response is None:
             raise HTTPException(status_code=500, detail="シフトの作成に失敗しました")
         
-        _, days = calendar.monthrange(request.year, request.month)
-        
-        return ShiftResponse(
-            schedule=schedule,
-            errors=errors,
-            year=request.year,
-            month=request.month,
-            days=days
-        )
+        return response
+    except SolveCancelled:
+        # クライアント切断時（レスポンスは届かない）
+        raise HTTPException(status_code=499, detail="クライアントが切断したため中断しました")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"エラーが発生しました: {str(e)}")
+
+
+@app.post("/api/shift/analyze", response_model=FeasibilityResponse)
+async def analyze_shift(request: ShiftRequest):
+    """
+    シフトを作成せずに、固定シフト・希望だけから解消できない欠員を分析する
+    
+    リクエスト形式は /api/shift/solve と同じ（探索の設定は使わない）。
+    
+    - **feasible**: 解消できない欠員が見つからなかったか
+    - **issues**: 解消できない欠員の説明（夜勤・早番・遅番に入れる人がいない日、人数が足りない日など）
+    - **infeasible_days**: 解消できない欠員がある日
+    - **capacity** / **demand**: 日ごとの空いている常勤スタッフの数と必要な人数
+    """
+    if not request.staff_data:
+        raise HTTPException(status_code=400, detail="スタッフが登録されていません")
+    
+    try:
+        return analyze_request(request)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"エラーが発生しました: {str(e)}")
 
 
+@app.post("/api/shift/solve/stream")
+async def create_shift_stream(request: ShiftRequest, include_schedule: bool = False):
+    """
+    シフトを作成し、計算の進捗をServer-Sent Eventsで送信する
+    
+    リクエスト形式は /api/shift/solve と同じ。
+    
+    - **include_schedule**: 最良スコア更新時の進捗に最良スケジュールを含めるか
+    
+    イベント:
+    - **progress**: 試行回数・最良スコア・ペナルティ内訳（更新時はスケジュールも）
+    - **result**: 最終結果（/api/shift/solve のレスポンスと同じ形式）
+    - **error**: エラー
+    """
+    if not request.staff_data:
+        raise HTTPException(status_code=400, detail="スタッフが登録されていません")
+    
+    progress_queue = solve_executor.create_queue()
+    cancel_event = solve_executor.create_event()
+    task = asyncio.create_task(
+        solve_executor.run(request, progress_queue.put, include_schedule, cancel_event)
+    )
+    
+    return StreamingResponse(
+        stream_solve_events(task, progress_queue, cancel_event),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.post("/api/shift/jobs", response_model=SolveJobResponse, status_code=202)
+async def create_shift_job(request: ShiftRequest):
+    """
+    シフト作成ジョブを登録する（計算はバックグラウンドで実行）
+    
+    リクエスト形式は /api/shift/solve と同じ。
+    返却されたjob_idで進捗・結果を取得する。
+    """
+    if not request.staff_data:
+        raise HTTPException(status_code=400, detail="スタッフが登録されていません")
+    
+    job = job_manager.submit(request)
+    return job.to_response()
+
+
+@app.get("/api/shift/jobs/{job_id}", response_model=SolveJobResponse)
+async def get_shift_job(job_id: str):
+    """
+    シフト作成ジョブの状態・進捗・結果を取得する
+    
+    - **job_id**: ジョブID
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="ジョブが見つかりません")
+    return job.to_response()
+
+
+@app.delete("/api/shift/jobs/{job_id}", response_model=SolveJobResponse)
+async def cancel_shift_job(job_id: str):
+    """
+    シフト作成ジョブをキャンセルする（終了済みの場合は結果を破棄）
+    
+    - **job_id**: ジョブID
+    """
+    job = job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="ジョブが見つかりません")
+    return job.to_response()
+
+
 @app.post("/api/shift/parse-days")
 async def parse_days_endpoint(input_str: Optional[str] = None):
     """
@@ -115,6 +315,11 @@ async def root():
         "version": "2.0.0",
         "endpoints": {
             "POST /api/shift/solve": "シフトを作成",
+            "POST /api/shift/solve/stream": "シフトを作成（進捗をSSEで送信）",
+            "POST /api/shift/analyze": "解消できない欠員を計算前に分析",
+            "POST /api/shift/jobs": "シフト作成ジョブを登録",
+            "GET /api/shift/jobs/{job_id}": "ジョブの状態・結果を取得",
+            "DELETE /api/shift/jobs/{job_id}": "ジョブをキャンセル",
             "POST /api/shift/parse-days": "日付文字列をパース",
             "GET /docs": "APIドキュメント (Swagger UI)",
             "GET /redoc": "APIドキュメント (ReDoc)"
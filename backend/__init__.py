@@ -1,17 +1,39 @@
 """
 Shift Manager Backend Package
 """
-from .models import StaffData, ShiftRequest, ShiftResponse, ShiftTypes
+from .models import (
+    StaffData, ShiftRequest, ShiftResponse, ShiftTypes, JobStatus, SolveJobResponse,
+    FeasibilityResponse,
+    SolverEngine, NightAssignment, EarlyLateAssignment, OffAssignment
+)
 from .rules import ShiftRuleChecker
-from .solver import ShiftSolver
+from .solver import ShiftSolver, SolveCancelled
+from .engines import register_engine, get_engine
+from .executor import SolveExecutor, solve_request, analyze_request
+from .jobs import JobManager, SolveJob
 
 __all__ = [
     "StaffData",
     "ShiftRequest", 
     "ShiftResponse",
     "ShiftTypes",
+    "JobStatus",
+    "SolveJobResponse",
+    "FeasibilityResponse",
+    "SolverEngine",
+    "NightAssignment",
+    "EarlyLateAssignment",
+    "OffAssignment",
     "ShiftRuleChecker",
     "ShiftSolver",
+    "SolveCancelled",
+    "register_engine",
+    "get_engine",
+    "SolveExecutor",
+    "solve_request",
+    "analyze_request",
+    "JobManager",
+    "SolveJob",
 ]
 
 
@@ -0,0 +1,424 @@
+"""
+Flow Assignment - 最小費用流による配置
+Version: 2.1.0
+
+構築フェーズの配置を「スタッフ → 日」の割り当て問題として最小費用流（flow.py）で解く。
+
+- NightFlowAssigner: 夜勤の配置（Phase 3 の貪欲法の代わり）
+- EarlyLateFlowAssigner: 早番・遅番の配置（Phase 4 の貪欲法の代わり）
+- OffFlowAssigner: 公休の配置（Phase 5 の日勤埋めの前に、Phase 6 の貪欲法の代わり）
+
+夜勤・早番遅番の費用はペナルティ（SolverConfig）に、公休の費用は日勤帯人数の2乗和に揃え、
+COST_SCALE倍した整数で扱う。
+同点の割り当ては1未満のペナルティに相当する乱数の費用で崩し、試行ごとに異なる解を作る。
+"""
+import random
+from typing import List, Dict, Optional, TYPE_CHECKING
+
+from .flow import MinCostFlow
+from .grid import ShiftCode, ShiftGrid
+
+if TYPE_CHECKING:
+    from .solver import ShiftSolver
+
+
+# =============================================================================
+# 定数定義
+# =============================================================================
+
+class NightFlowConfig:
+    """夜勤の割り当ての設定値"""
+    COST_SCALE = 100    # ペナルティ1点あたりの費用
+    JITTER = 100        # 同点を崩す乱数の費用の幅（ペナルティ1点未満）
+    ALIGN_BONUS = 20    # 希望休の2日前（明けの翌日が希望休）の夜勤を優先する度合い（ペナルティ点）
+    MIN_GAP = 3         # 同じスタッフの夜勤の間隔の最小日数（夜→明け→公休）
+
+
+class EarlyLateFlowConfig:
+    """早番・遅番の割り当ての設定値"""
+    COST_SCALE = 100    # ペナルティ1点あたりの費用
+    JITTER = 100        # 同点を崩す乱数の費用の幅（ペナルティ1点未満）
+    LOAD_STEP = 2       # 同じスタッフへのk回目の割り当てに加える費用（ペナルティ点 × k）
+
+
+class OffFlowConfig:
+    """公休の割り当ての設定値"""
+    COST_SCALE = 100    # 日勤帯人数の2乗和1あたりの費用
+    JITTER = 100        # 同点を崩す乱数の費用の幅（2乗和1未満）
+
+
+_NIGHT = (ShiftCode.NIGHT,)
+_EARLY_LATE = (ShiftCode.EARLY, ShiftCode.LATE)
+
+
+def _apply_path(grid: ShiftGrid, rule_checker, added: List[tuple], removed: List[tuple],
+                unchecked=()) -> Optional[int]:
+    """
+    増加路の割り当てをシフト表に仮に反映し、追加したセルがルールを満たすか確認する
+
+    外した割り当てを空きに戻してから、追加する割り当てを1件ずつ配置してcheck_rulesで確認する。
+    違反があれば反映した分を元に戻す。
+
+    Args:
+        grid: シフト表（直接更新する）
+        rule_checker: ShiftRuleChecker
+        added: 追加する (辺の番号, (スタッフ, 日, コード)) のリスト
+        removed: 外す (スタッフ, 日, コード) のリスト
+        unchecked: ルールを確認しないスタッフ
+
+    Returns:
+        受け入れるならNone、拒否するなら違反した辺の番号
+    """
+    for i, d, _ in removed:
+        grid.set(i, d, ShiftCode.EMPTY)
+    rejected = None
+    for e, (i, d, code) in added:
+        if grid.rows[i][d] != ShiftCode.EMPTY:
+            rejected = e
+            break
+        grid.set(i, d, code)
+        if i not in unchecked and not rule_checker.check_rules(i, d, grid, code):
+            rejected = e
+            break
+    if rejected is not None:
+        # 仮に反映した分を元に戻す
+        for e, (i, d, code) in added:
+            if grid.rows[i][d] == code:
+                grid.set(i, d, ShiftCode.EMPTY)
+            if e == rejected:
+                break
+        for i, d, code in removed:
+            grid.set(i, d, code)
+    return rejected
+
+
+def _split_path(path: List[int], arcs: Dict[int, tuple]):
+    """増加路を、追加する割り当て (辺の番号, 割り当て) と外す割り当てに分ける"""
+    added, removed = [], []
+    for e in path:
+        if e in arcs:
+            added.append((e, arcs[e]))
+        elif e ^ 1 in arcs:
+            removed.append(arcs[e ^ 1])
+    return added, removed
+
+
+class NightFlowAssigner:
+    """
+    最小費用流による夜勤の配置
+
+    始点 → スタッフ → 日 → 終点 のネットワークで、夜勤のない日を埋めることを最優先に
+    （日 → 終点の辺の報酬が夜勤欠員ペナルティ）、夜勤目標との差（始点 → スタッフの辺）が
+    小さくなるように割り当てる。スタッフ → 日の辺は、その時点のシフト表に夜勤を置ける組だけを張る。
+
+    同じスタッフの夜勤が3日以内に重なる（明け・公休と衝突する）割り当てはフローでは表せないため、
+    増加路ごとに確認し、衝突する辺を除いて探し直す。
+
+    使い方:
+        NightFlowAssigner(solver, SolverConfig).assign(grid, night_counts)
+    """
+
+    def __init__(self, solver: "ShiftSolver", config):
+        """
+        Args:
+            solver: ルールチェッカー・夜勤目標を持つソルバー
+            config: ペナルティの設定値（SolverConfig）
+        """
+        self.solver = solver
+        self.config = config
+
+    def assign(self, grid: ShiftGrid, night_counts: List[int]) -> None:
+        """
+        夜勤のない日に夜勤を配置する（grid・night_countsを直接更新する）
+
+        割り当てられなかった日はそのまま残す。
+        """
+        solver = self.solver
+        config = NightFlowConfig
+        scale = config.COST_SCALE
+        days = solver.days
+        staff = solver.regular_idx
+        open_days = [d for d in range(days) if solver._count_day_staff(grid, d, _NIGHT) == 0]
+        if not staff or not open_days:
+            return
+
+        # 頂点: 0=始点, 1=終点, 2..=スタッフ, その後に日
+        source, sink = 0, 1
+        staff_node = {i: 2 + k for k, i in enumerate(staff)}
+        day_node = {d: 2 + len(staff) + k for k, d in enumerate(open_days)}
+        mcf = MinCostFlow(2 + len(staff) + len(open_days))
+
+        target_cost = self.config.PENALTY_NIGHT_TARGET * scale
+        for i in staff:
+            deficit = max(0, solver.night_targets[i] - night_counts[i])
+            if deficit:
+                mcf.add_edge(source, staff_node[i], deficit, -target_cost)
+            mcf.add_edge(source, staff_node[i], days, target_cost)
+
+        missing_cost = self.config.PENALTY_NIGHT_MISSING * scale
+        for d in open_days:
+            mcf.add_edge(day_node[d], sink, 1, -missing_cost)
+
+        arcs: Dict[int, tuple] = {}  # 辺の番号 → (スタッフ, 日)
+        for i in staff:
+            aligned = self._aligned_night_days(i)
+            for d in open_days:
+                if not solver.rule_checker.can_place_night(i, d, grid):
+                    continue
+                cost = random.randrange(config.JITTER)
+                if d in aligned:
+                    cost -= config.ALIGN_BONUS * scale
+                arcs[mcf.add_edge(staff_node[i], day_node[d], 1, cost)] = (i, d)
+
+        assigned: Dict[int, List[int]] = {i: [] for i in staff}
+
+        def accept_path(path: List[int]) -> Optional[int]:
+            """増加路を適用した後の各スタッフの夜勤が衝突しないか確認する"""
+            added, removed = _split_path(path, arcs)
+            for e, (i, d) in added:
+                others = [x for x in assigned[i] if (i, x) not in removed]
+                if any(abs(x - d) < config.MIN_GAP for x in others):
+                    return e
+            for _, (i, d) in added:
+                assigned[i].append(d)
+            for i, d in removed:
+                assigned[i].remove(d)
+            return None
+
+        mcf.solve(source, sink, accept_path=accept_path)
+
+        # 割り当てを日付順に配置する（配置時点のシフト表で改めて確認する）
+        for i in staff:
+            for d in sorted(assigned[i]):
+                if solver.rule_checker.can_place_night(i, d, grid):
+                    solver._place_night_shift(i, d, grid, night_counts)
+
+    def _aligned_night_days(self, staff_idx: int) -> set:
+        """明けの翌日が希望休・休暇になる夜勤の日（0-indexed）"""
+        s = self.solver.staff_dict_list[staff_idx]
+        off_days = set(s["req_off"] + s["refresh_days"] + s["paid_leave_days"])
+        return {off_day - 3 for off_day in off_days}
+
+
+class EarlyLateFlowAssigner:
+    """
+    最小費用流による早番・遅番の配置
+
+    始点 → スタッフ → セル(スタッフ, 日) → 枠(日, 早番/遅番) → 終点 のネットワークで、
+    月全体の早番・遅番の欠員が最小になるように割り当てる（枠 → 終点の辺の報酬が欠員ペナルティ）。
+    セルの容量は1（同じ日に早番と遅番を兼ねない）。始点 → スタッフの辺は割り当て回数に応じて
+    費用を増やし、同じスタッフへの偏りを避ける。
+
+    翌日との逆行・連勤などスタッフの行の中のルールはフローでは表せないため、
+    増加路ごとにシフト表へ仮に反映してcheck_rulesで確認し、違反する辺を除いて探し直す。
+
+    使い方:
+        EarlyLateFlowAssigner(solver, SolverConfig).assign(grid)
+    """
+
+    def __init__(self, solver: "ShiftSolver", config):
+        """
+        Args:
+            solver: ルールチェッカーを持つソルバー
+            config: ペナルティの設定値（SolverConfig）
+        """
+        self.solver = solver
+        self.config = config
+
+    def assign(self, grid: ShiftGrid) -> None:
+        """
+        早番・遅番のいない日に配置する（gridを直接更新する）
+
+        割り当てられなかった枠はそのまま残す。
+        """
+        solver = self.solver
+        config = EarlyLateFlowConfig
+        scale = config.COST_SCALE
+        rule_checker = solver.rule_checker
+
+        missing_cost = {ShiftCode.EARLY: self.config.PENALTY_EARLY_MISSING * scale,
+                        ShiftCode.LATE: self.config.PENALTY_LATE_MISSING * scale}
+        slots = [(d, code) for d in range(solver.days) for code in _EARLY_LATE
+                 if solver._count_day_staff(grid, d, (code,)) == 0]
+        # 早番パートは空きセルがあれば早番にできる（ルール確認なし。_place_early_shift()と同じ）
+        early_part = [i for i, s in enumerate(solver.staff_dict_list) if s["type"] == 2]
+        staff = solver.regular_idx + early_part
+        if not slots or not staff:
+            return
+
+        # 候補: (スタッフ, 日, コード)。早番パートはルールを確認しない
+        checked = set(early_part)
+        candidates = []
+        for i in staff:
+            row = grid.rows[i]
+            for d, code in slots:
+                if row[d] != ShiftCode.EMPTY:
+                    continue
+                if code == ShiftCode.LATE and i in checked:
+                    continue
+                if i in checked or rule_checker.check_rules(i, d, grid, code):
+                    candidates.append((i, d, code))
+        cells = sorted({(i, d) for i, d, _ in candidates})
+
+        # 頂点: 0=始点, 1=終点, 2..=スタッフ, その後にセル・枠
+        source, sink = 0, 1
+        staff_node = {i: 2 + k for k, i in enumerate(staff)}
+        cell_node = {cell: 2 + len(staff) + k for k, cell in enumerate(cells)}
+        slot_node = {slot: 2 + len(staff) + len(cells) + k for k, slot in enumerate(slots)}
+        mcf = MinCostFlow(2 + len(staff) + len(cells) + len(slots))
+
+        for slot in slots:
+            mcf.add_edge(slot_node[slot], sink, 1, -missing_cost[slot[1]])
+
+        cell_counts = {i: 0 for i in staff}
+        for i, d in cells:
+            mcf.add_edge(staff_node[i], cell_node[(i, d)], 1, 0)
+            cell_counts[i] += 1
+        for i in staff:
+            # k回目の割り当ての費用を k × LOAD_STEP にする（凸費用）
+            for k in range(cell_counts[i]):
+                mcf.add_edge(source, staff_node[i], 1, k * config.LOAD_STEP * scale)
+
+        arcs: Dict[int, tuple] = {}  # 辺の番号 → (スタッフ, 日, コード)
+        for i, d, code in candidates:
+            cost = random.randrange(config.JITTER)
+            arcs[mcf.add_edge(cell_node[(i, d)], slot_node[(d, code)], 1, cost)] = (i, d, code)
+
+        def accept_path(path: List[int]) -> Optional[int]:
+            """増加路をシフト表に仮に反映し、追加したセルがルールを満たすか確認する"""
+            added, removed = _split_path(path, arcs)
+            return _apply_path(grid, rule_checker, added, removed, checked)
+
+        mcf.solve(source, sink, accept_path=accept_path)
+
+
+class OffFlowAssigner:
+    """
+    最小費用流による公休の配置
+
+    始点 → スタッフ → 日 → 終点 のネットワークで、常勤スタッフの残りの公休（公休目標との差）を
+    まとめて空きセルに割り当てる。公休にならなかった空きセルは後で日勤帯になるものとして、
+    各日の日勤帯人数の見込みの2乗和が最小（分散が最小）になるように割り当てる。
+    日 → 終点の辺は、その日のk回目の公休ほど費用が高くなる凸費用にする。
+
+    始点 → スタッフの辺には報酬を付け、公休目標に届くまで割り当てる。
+    前後の日に関わるルールは、増加路ごとにシフト表へ仮に反映してcheck_rulesで確認する。
+    また、公休が偏って残りの空きセルを日勤で埋められなくなる（連勤の上限を超える）割り当ても、
+    残りの公休数で埋められない場合は除外する。
+
+    使い方:
+        OffFlowAssigner(solver).assign(grid)
+    """
+
+    def __init__(self, solver: "ShiftSolver"):
+        """
+        Args:
+            solver: ルールチェッカー・公休目標を持つソルバー
+        """
+        self.solver = solver
+
+    def assign(self, grid: ShiftGrid) -> None:
+        """
+        常勤スタッフの空きセルに公休を配置する（gridを直接更新する）
+
+        公休目標に届かなかった分はそのまま残す。
+        """
+        solver = self.solver
+        config = OffFlowConfig
+        scale = config.COST_SCALE
+        rule_checker = solver.rule_checker
+        days = solver.days
+
+        needs = {}
+        candidates = []
+        for i in solver.regular_idx:
+            row = grid.rows[i]
+            empty_days = [d for d in range(days) if row[d] == ShiftCode.EMPTY]
+            need = min(solver.target_off_days - solver._count_current_off(i, grid), len(empty_days))
+            if need <= 0:
+                continue
+            needs[i] = need
+            candidates += [(i, d) for d in empty_days
+                           if rule_checker.check_rules(i, d, grid, ShiftCode.OFF)]
+        if not candidates:
+            return
+
+        # 公休にならなかった空きセルを日勤帯とした場合の各日の人数
+        projected = [solver._count_day_staff(grid, d, ShiftCode.DAY_SHIFTS)
+                     + sum(1 for i in solver.regular_idx if grid.rows[i][d] == ShiftCode.EMPTY)
+                     for d in range(days)]
+
+        # 頂点: 0=始点, 1=終点, 2..=スタッフ, その後に日
+        source, sink = 0, 1
+        staff_node = {i: 2 + k for k, i in enumerate(needs)}
+        day_node = [2 + len(needs) + d for d in range(days)]
+        mcf = MinCostFlow(2 + len(needs) + days)
+
+        # 増加路の乱数の費用の合計より大きな報酬にし、公休目標に届くまで流す
+        reward = (len(needs) + 1) * config.JITTER
+        for i, need in needs.items():
+            mcf.add_edge(source, staff_node[i], need, -reward)
+
+        day_cells = [0] * days
+        arcs: Dict[int, tuple] = {}  # 辺の番号 → (スタッフ, 日, コード)
+        for i, d in candidates:
+            day_cells[d] += 1
+            cost = random.randrange(config.JITTER)
+            arcs[mcf.add_edge(staff_node[i], day_node[d], 1, cost)] = (i, d, ShiftCode.OFF)
+        for d in range(days):
+            # k回目の公休で人数が projected-k+1 → projected-k になる（2乗の差は 2k-2×projected-1）
+            for k in range(1, day_cells[d] + 1):
+                mcf.add_edge(day_node[d], sink, 1, (2 * k - 2 * projected[d] - 1) * scale)
+
+        placed = {i: 0 for i in needs}
+        rest_needed = {i: self._min_rest_needed(i, grid) for i in needs}
+
+        def accept_path(path: List[int]) -> Optional[int]:
+            """
+            増加路をシフト表に仮に反映し、追加したセルがルールを満たし、
+            各スタッフの残りの空きセルを残りの公休数で埋められるか確認する
+            """
+            added, removed = _split_path(path, arcs)
+            rejected = _apply_path(grid, rule_checker, added, removed)
+            if rejected is not None:
+                return rejected
+            # 公休が1日増えるのは増加路の最初のスタッフだけ（他のスタッフは公休の日が移る）
+            first = added[0][1][0]
+            placed[first] += 1
+            updated = {}
+            for e, (i, _, _) in added:
+                needed = self._min_rest_needed(i, grid)
+                if needed > needs[i] - placed[i] and needed >= rest_needed[i]:
+                    # 仮に反映した分を元に戻す
+                    placed[first] -= 1
+                    for _, (j, x, _) in added:
+                        grid.set(j, x, ShiftCode.EMPTY)
+                    for j, x, code in removed:
+                        grid.set(j, x, code)
+                    return e
+                updated[i] = needed
+            rest_needed.update(updated)
+            return None
+
+        mcf.solve(source, sink, accept_path=accept_path)
+
+    def _min_rest_needed(self, staff_idx: int, grid: ShiftGrid) -> int:
+        """
+        空きセルを日付順に日勤で埋めたとき、ルール上日勤にできないセルの数
+        （残りの空きセルを埋めるのに必要な休みの数の目安）
+        """
+        rule_checker = self.solver.rule_checker
+        row = grid.rows[staff_idx]
+        filled = []
+        needed = 0
+        for d in range(self.solver.days):
+            if row[d] != ShiftCode.EMPTY:
+                continue
+            if rule_checker.check_rules(staff_idx, d, grid, ShiftCode.DAY):
+                grid.set(staff_idx, d, ShiftCode.DAY)
+                filled.append(d)
+            else:
+                needed += 1
+        for d in filled:
+            grid.set(staff_idx, d, ShiftCode.EMPTY)
+        return needed
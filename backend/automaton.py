@@ -0,0 +1,275 @@
+"""
+Rule Automaton - シフトルールの有限オートマトン
+Version: 2.1.0
+
+1スタッフの行に対するルール（rules.py）を、シフト種別を1日ずつ読む有限オートマトンに
+コンパイルする。状態は「直前のシフト・勤務の連続日数・日勤帯の連続日数・連続区間に夜勤を含むか」で、
+遷移表を引くだけで行全体を1回の走査で検証できる。
+
+- 前向きの状態（月初から読む）: 前月末のシフト・連勤数から始め、d日目の前日までを読んだ状態
+- 後ろ向きの状態（月末から読む）: d日目以降を逆順に読んだ状態（先頭の連続区間を表す）
+
+セルdに置けるかは、d日目の前までの前向きの状態にシフトを1日進め、
+d+1日目以降の後ろ向きの状態とつなげて判定する（can_place()）。
+
+連勤数は、夜勤を明けの分と合わせて2日、明けを0日として数える
+（夜勤の時点で明けの分を数えるShiftRuleChecker.check_rules()と同じ）。
+未配置（空き）は休みとして扱い、前日との組は問わない。
+"""
+from typing import List, Optional, Sequence
+
+from .grid import ShiftCode, IS_DAY_SHIFT, IS_WORK_SHIFT
+
+
+# 遷移できないことを表す状態
+DEAD = -1
+
+_MASK = ShiftCode.KIND_MASK
+_KINDS = ShiftCode.KIND_MASK + 1
+_EMPTY = ShiftCode.EMPTY
+_NIGHT = ShiftCode.NIGHT
+_NIGHT_REST = ShiftCode.NIGHT_REST
+
+# 状態は1つの整数にまとめる
+#   bit0-3: 直前（後ろ向きは先頭）のシフト種別, bit4-6: 勤務の連続日数,
+#   bit7-9: 日勤帯の連続日数（上限+1で頭打ち）, bit10: 連続区間に夜勤・明けを含む
+_WORK_SHIFT = 4
+_DAY_SHIFT = 7
+_NIGHT_BIT = 1 << 10
+_N_STATES = 1 << 11
+_FIELD_MASK = 0x07
+
+
+def _pack(kind: int, work: int, day: int, night: bool) -> int:
+    """状態を整数にまとめる"""
+    return kind | work << _WORK_SHIFT | day << _DAY_SHIFT | (_NIGHT_BIT if night else 0)
+
+
+def _unpack(state: int):
+    """状態を (シフト種別, 勤務の連続日数, 日勤帯の連続日数, 夜勤を含むか) に分ける"""
+    return (state & _MASK, state >> _WORK_SHIFT & _FIELD_MASK,
+            state >> _DAY_SHIFT & _FIELD_MASK, bool(state & _NIGHT_BIT))
+
+
+def _work_days(kind: int) -> int:
+    """連勤数への加算（夜勤は明けの分を含めて2日、明けは0日）"""
+    if kind == _NIGHT:
+        return 2
+    if kind == _NIGHT_REST:
+        return 0
+    return 1 if IS_WORK_SHIFT[kind] else 0
+
+
+class RuleAutomaton:
+    """
+    シフトルールの有限オートマトン
+
+    使い方:
+        automaton = RuleAutomaton(PAIR_LEGAL, max_work=5, max_day_streak=3)
+        start = automaton.start_state(prev_code, prev_streak)
+        bad_day = automaton.validate_row(row, start)   # Noneなら違反なし
+        automaton.can_place(row, d, ShiftCode.DAY, start)
+    """
+
+    def __init__(self, pair_legal: Sequence[Sequence[bool]], max_work: int,
+                 max_day_streak: Optional[int]):
+        """
+        Args:
+            pair_legal: 隣接する2日の種別コードの組が許されるか（rules.PAIR_LEGAL）
+            max_work: 最大連勤日数
+            max_day_streak: 日勤帯のみの最大連勤日数（連続区間に夜勤を含む場合は超えてよい）。
+                            Noneの場合は確認しない（パート）
+        """
+        if max_work > _FIELD_MASK or (max_day_streak or 0) + 1 > _FIELD_MASK:
+            raise ValueError("連勤日数の上限が大きすぎます")
+        self.max_work = max_work
+        self.max_day_streak = max_day_streak
+
+        # 隣接する日の組: 未配置の日は後で決まるため前日との組は問わない。
+        # また、夜勤の翌日は明け（または未配置）のみ
+        self._pair = tuple(
+            tuple(n == _EMPTY or (pair_legal[p][n] and (p != _NIGHT or n == _NIGHT_REST))
+                  for n in range(_KINDS))
+            for p in range(_KINDS))
+
+        # 遷移表: _forward[state * _KINDS + kind], _backward[state * _KINDS + kind]
+        self._forward = [DEAD] * (_N_STATES * _KINDS)
+        self._backward = [DEAD] * (_N_STATES * _KINDS)
+        for state in range(_N_STATES):
+            if not self._is_state(state):
+                continue
+            for kind in range(_KINDS):
+                self._forward[state * _KINDS + kind] = self._step_forward(state, kind)
+                self._backward[state * _KINDS + kind] = self._step_backward(kind, state)
+
+        # 月末の外側（後ろ向きの初期状態）
+        self.end_state = _pack(_EMPTY, 0, 0, False)
+
+    # =========================================================================
+    # 状態・遷移の定義
+    # =========================================================================
+
+    def _is_state(self, state: int) -> bool:
+        """状態として使う整数か"""
+        kind, work, day, _ = _unpack(state)
+        return (kind < _KINDS and work <= self.max_work
+                and day <= (self.max_day_streak or 0) + 1)
+
+    def _pending(self, state: int) -> bool:
+        """日勤帯の連勤が上限を超え、同じ連続区間に夜勤が必要な状態か"""
+        if self.max_day_streak is None:
+            return False
+        _, _, day, night = _unpack(state)
+        return day > self.max_day_streak and not night
+
+    def _cap_day(self, day: int) -> int:
+        """日勤帯の連続日数を頭打ちにする"""
+        if self.max_day_streak is None:
+            return 0
+        return min(day, self.max_day_streak + 1)
+
+    def _step_forward(self, state: int, kind: int) -> int:
+        """前向きの状態にkindの日を1日加える"""
+        return self._extend(state, kind, self._pair[state & _MASK][kind])
+
+    def _step_backward(self, kind: int, state: int) -> int:
+        """後ろ向きの状態の前にkindの日を1日加える"""
+        return self._extend(state, kind, self._pair[kind][state & _MASK])
+
+    def _extend(self, state: int, kind: int, adjacent_legal: bool) -> int:
+        """連続区間の端（前向きは末尾、後ろ向きは先頭）にkindの日を加える"""
+        if not adjacent_legal:
+            return DEAD
+        _, work, day, night = _unpack(state)
+        if not IS_WORK_SHIFT[kind]:
+            # 連続区間が終わる
+            if self._pending(state):
+                return DEAD
+            return _pack(kind, 0, 0, False)
+        work += _work_days(kind)
+        if work > self.max_work:
+            return DEAD
+        day = self._cap_day(day + 1) if IS_DAY_SHIFT[kind] else 0
+        night = night or not IS_DAY_SHIFT[kind]
+        return _pack(kind, work, day, night)
+
+    # =========================================================================
+    # 行の検証
+    # =========================================================================
+
+    def start_state(self, prev_code: int, prev_streak: int) -> int:
+        """
+        前月末のシフト・連勤数から前向きの初期状態を作る
+
+        前月末が夜勤の場合は、1日目の明けの分を連勤数に含める。
+        連勤数が上限以上の場合は上限として扱う（前月の分は違反とせず、翌日の勤務を違反とする）。
+        """
+        kind = prev_code & _MASK
+        work = prev_streak + 1 if kind == _NIGHT else prev_streak
+        day = min(prev_streak, self.max_day_streak or 0) if IS_DAY_SHIFT[kind] else 0
+        night = kind == _NIGHT or kind == _NIGHT_REST
+        return _pack(kind, min(work, self.max_work), day, night)
+
+    def step(self, state: int, code: int) -> int:
+        """前向きの状態にcodeの日を1日加える（遷移できなければDEAD）"""
+        if state == DEAD:
+            return DEAD
+        return self._forward[state * _KINDS + (code & _MASK)]
+
+    def accepts(self, state: int) -> bool:
+        """前向きの状態で月末を迎えてよいか"""
+        return state != DEAD and not self._pending(state)
+
+    def validate_row(self, row: Sequence[int], start: int) -> Optional[int]:
+        """
+        行全体がルールを満たすか確認する
+
+        Returns:
+            最初に違反した日（0-indexed）。違反がなければNone
+        """
+        forward = self._forward
+        state = start
+        for d, code in enumerate(row):
+            state = forward[state * _KINDS + (code & _MASK)]
+            if state == DEAD:
+                return d
+        if self._pending(state):
+            return len(row) - 1
+        return None
+
+    def prefix_states(self, row: Sequence[int], start: int) -> List[int]:
+        """
+        前向きの状態の列（長さ days + 1）
+
+        [d] はd日目の前日までを読んだ状態（[0] は初期状態）。途中で違反した以降はDEAD。
+        """
+        forward = self._forward
+        states = [start]
+        state = start
+        for code in row:
+            if state != DEAD:
+                state = forward[state * _KINDS + (code & _MASK)]
+            states.append(state)
+        return states
+
+    def suffix_states(self, row: Sequence[int]) -> List[int]:
+        """
+        後ろ向きの状態の列（長さ days + 1）
+
+        [d] はd日目以降を読んだ状態（[days] は月末の外側）。途中で違反した以前はDEAD。
+        """
+        backward = self._backward
+        states = [self.end_state]
+        state = self.end_state
+        for code in reversed(row):
+            if state != DEAD:
+                state = backward[state * _KINDS + (code & _MASK)]
+            states.append(state)
+        states.reverse()
+        return states
+
+    def join(self, prefix: int, code: int, suffix: int) -> bool:
+        """
+        前向きの状態prefixの翌日にcodeを置き、その翌日から後ろ向きの状態suffixが続く行が
+        ルールを満たすか
+        """
+        if prefix == DEAD or suffix == DEAD:
+            return False
+        state = self._forward[prefix * _KINDS + (code & _MASK)]
+        if state == DEAD:
+            return False
+        kind, work, day, night = _unpack(state)
+        first, s_work, s_day, s_night = _unpack(suffix)
+        if not self._pair[kind][first]:
+            return False
+        if not (IS_WORK_SHIFT[kind] and IS_WORK_SHIFT[first]):
+            # 連続区間はcodeの日で切れる
+            return not self._pending(state) and not self._pending(suffix)
+        if work + s_work > self.max_work:
+            return False
+        if self.max_day_streak is None or night or s_night:
+            return True
+        longest = day + s_day if IS_DAY_SHIFT[kind] and IS_DAY_SHIFT[first] else max(day, s_day)
+        return longest <= self.max_day_streak
+
+    def can_place(self, row: Sequence[int], day_idx: int, code: int, start: int) -> bool:
+        """
+        セルday_idxをcodeにしても行全体がルールを満たすか
+
+        行の他の部分で既に違反している場合はFalse。
+        同じ行で複数のセルを判定する場合は、prefix_states()・suffix_states()を1回求めて
+        join()を使う方が速い。
+        """
+        state = start
+        forward = self._forward
+        for d in range(day_idx):
+            state = forward[state * _KINDS + (row[d] & _MASK)]
+            if state == DEAD:
+                return False
+        suffix = self.end_state
+        backward = self._backward
+        for d in range(len(row) - 1, day_idx, -1):
+            suffix = backward[suffix * _KINDS + (row[d] & _MASK)]
+            if suffix == DEAD:
+                return False
+        return self.join(state, code, suffix)
@@ -0,0 +1,344 @@
+"""
+Column Generation - 行の候補の組み合わせによる探索
+Version: 2.1.0
+
+シフトルール（rules.py）はすべて1スタッフの行の中で完結し、人員配置の目標（早番・遅番・夜勤・
+日勤帯人数）はすべて日ごとの集計であることを利用する。常勤スタッフごとにルールを満たす行の
+候補（列）を持ち、各スタッフに1行ずつ選んでスコアを最大化する（集合分割問題）。
+
+- 列: RowPatternSampler（patterns.py）で作る、ルール・固定日・勤務日数（公休数）・夜勤目標を
+  満たす行。固定日（Phase 0-2 の結果）とパートスタッフの行は変更しない
+- マスター問題: 貪欲法と修復。選んでいる行を候補の行に差し替える変更をScoreEvaluatorで差分評価し、
+  改善する差し替えがなくなるまで適用する
+- 価格付け: LPの双対変数の代わりに、他のスタッフの行を固定したときの日ごとの過不足から
+  日・シフトの重みを決め、重みに比例して行をサンプリングして候補に加える
+"""
+import random
+import time
+from typing import List, Dict, Tuple, Optional, Callable, TYPE_CHECKING
+
+from .grid import ShiftCode, ShiftGrid, IS_DAY_SHIFT
+from .patterns import RowPatternSampler
+from .scoring import ScoreEvaluator, Change
+
+if TYPE_CHECKING:
+    from .solver import ShiftSolver
+
+
+# =============================================================================
+# 定数定義
+# =============================================================================
+
+class ColumnGenerationConfig:
+    """列生成の設定値"""
+    SEED_ATTEMPTS = 16         # 最初の候補に行を加える構築（Phase 3-9）の試行回数
+    INITIAL_COLUMNS = 8        # スタッフごとの最初の候補数（重みなしのサンプリング）
+    COLUMNS_PER_ROUND = 4      # 価格付け1回でスタッフに追加する候補数
+    MAX_COLUMNS = 64           # スタッフごとの候補数の上限（超えたら古い候補から捨てる）
+    WEIGHT_BASE = 4            # 過不足のない日・シフトの重み
+    WEIGHT_NEEDED = 64         # 不足している日・シフトの重み
+    WEIGHT_SURPLUS = 1         # 重複・過剰になる日・シフトの重み
+    STALL_PASSES = 12          # 最良スコアが改善しないまま全スタッフを何周したら終了するか
+    PROGRESS_INTERVAL = 10     # 進捗通知の間隔（価格付けの回数）
+
+
+# 固定されていないセルの選択肢
+_CHOICES = (ShiftCode.EARLY, ShiftCode.DAY, ShiftCode.LATE,
+            ShiftCode.NIGHT, ShiftCode.NIGHT_REST, ShiftCode.OFF)
+
+_EARLY = ShiftCode.EARLY
+_LATE = ShiftCode.LATE
+_NIGHT = ShiftCode.NIGHT
+_DAY = ShiftCode.DAY
+
+# 行の候補（シフトコードのタプル）
+Column = Tuple[int, ...]
+
+
+class ColumnGeneration:
+    """
+    行の候補の組み合わせによる探索
+
+    使い方:
+        colgen = ColumnGeneration(solver, SolverConfig)
+        best_grid, best_score, rounds = colgen.run(evaluator, iterations=100)
+    """
+
+    def __init__(self, solver: "ShiftSolver", config):
+        """
+        Args:
+            solver: Phase 0-2 を計算済みのShiftSolver
+            config: 人員配置の目標を持つ設定クラス（SolverConfig）
+        """
+        self.solver = solver
+        self.config = config
+        self.days = solver.days
+        self.seed, _ = solver._get_seed_state()
+
+        # 行を作れる常勤スタッフと、そのサンプリング条件（勤務日数の上限, 夜勤回数, 勤務日数ちょうど）
+        self.allowed: Dict[int, List[Tuple[int, ...]]] = {}
+        self.params: Dict[int, Tuple[int, int, bool]] = {}
+        for i in solver.regular_idx:
+            allowed = [_CHOICES if self.seed.get(i, d) == ShiftCode.EMPTY
+                       else (self.seed.get(i, d),) for d in range(self.days)]
+            params = self._find_params(i, allowed)
+            if params is not None:
+                self.allowed[i] = allowed
+                self.params[i] = params
+        self.staff = list(self.params)
+
+        self.pools: Dict[int, List[Column]] = {i: [] for i in self.staff}
+        self._known: Dict[int, set] = {i: set() for i in self.staff}
+
+    def add_rows(self, grid: ShiftGrid) -> None:
+        """構築したスケジュールの各行を候補に加える（run()の前に呼ぶ）"""
+        for i in self.staff:
+            self._add_column(i, tuple(grid.rows[i]))
+
+    # =========================================================================
+    # 列の作成
+    # =========================================================================
+
+    def _find_params(self, staff_idx: int,
+                     allowed: List[Tuple[int, ...]]) -> Optional[Tuple[int, int, bool]]:
+        """
+        行を作れるサンプリング条件を探す
+
+        公休数・夜勤目標どおりの行を優先し、作れなければ条件を緩める。
+        どの条件でも作れない場合（固定日同士がルールに反する場合など）はNone。
+        """
+        solver = self.solver
+        automaton, start = solver.rule_checker.row_automaton(staff_idx)
+        work_limit = solver.work_limits[staff_idx]
+        target = solver.night_targets[staff_idx]
+        candidates = [(work_limit, target, True), (work_limit, target, False)]
+        candidates += [(self.days, nights, False) for nights in range(target, -1, -1)]
+        for params in candidates:
+            sampler = RowPatternSampler(automaton, start, allowed, params[0], params[1],
+                                        exact_work=params[2])
+            if sampler.count() > 0:
+                return params
+        return None
+
+    def _sampler(self, staff_idx: int,
+                 weights: Optional[List[Tuple[int, ...]]] = None) -> RowPatternSampler:
+        """スタッフの行のサンプラー"""
+        automaton, start = self.solver.rule_checker.row_automaton(staff_idx)
+        work_limit, nights, exact_work = self.params[staff_idx]
+        return RowPatternSampler(automaton, start, self.allowed[staff_idx], work_limit, nights,
+                                 weights=weights, exact_work=exact_work)
+
+    def _add_column(self, staff_idx: int, column: Column) -> bool:
+        """候補に加える（既にある場合はFalse）"""
+        if column in self._known[staff_idx]:
+            return False
+        pool = self.pools[staff_idx]
+        pool.append(column)
+        self._known[staff_idx].add(column)
+        if len(pool) > ColumnGenerationConfig.MAX_COLUMNS:
+            self._known[staff_idx].discard(pool.pop(0))
+        return True
+
+    def _price(self, evaluator: ScoreEvaluator, staff_idx: int) -> List[Tuple[int, ...]]:
+        """
+        価格付けの重み: 他のスタッフの行を固定したときの日ごとの過不足から決める
+
+        早番・遅番・夜勤が他に誰もいない日はそのシフトを、日勤帯が最低人員に足りない日は
+        日勤帯のシフトを重くし、重複になるシフトを軽くする。
+        """
+        cfg = ColumnGenerationConfig
+        row = evaluator.grid.rows[staff_idx]
+        weights = []
+        for d, codes in enumerate(self.allowed[staff_idx]):
+            if len(codes) == 1:
+                weights.append((1,))
+                continue
+            code = row[d]
+            early, late, night, day_staff = evaluator.day_stats[d]
+            early -= code == _EARLY
+            late -= code == _LATE
+            night -= code == _NIGHT
+            day_staff -= IS_DAY_SHIFT[code]
+            short_day = day_staff < self.config.MIN_DAY_STAFF
+
+            day_weight = cfg.WEIGHT_NEEDED if short_day else cfg.WEIGHT_BASE
+            weight_of = {
+                _EARLY: cfg.WEIGHT_NEEDED if early == 0 else cfg.WEIGHT_SURPLUS,
+                _LATE: cfg.WEIGHT_NEEDED if late == 0 else cfg.WEIGHT_SURPLUS,
+                _NIGHT: cfg.WEIGHT_NEEDED if night == 0 else cfg.WEIGHT_SURPLUS,
+                _DAY: day_weight,
+            }
+            weights.append(tuple(weight_of.get(c, cfg.WEIGHT_BASE) for c in codes))
+        return weights
+
+    # =========================================================================
+    # マスター問題
+    # =========================================================================
+
+    def _changes(self, grid: ShiftGrid, staff_idx: int, column: Column) -> List[Change]:
+        """行をcolumnに差し替える変更のリスト"""
+        row = grid.rows[staff_idx]
+        return [(staff_idx, d, code) for d, code in enumerate(column) if row[d] != code]
+
+    def _best_column(self, evaluator: ScoreEvaluator, staff_idx: int,
+                     columns: List[Column]) -> Tuple[int, Optional[List[Change]]]:
+        """columnsのうち差し替えたときのスコアの増分が最大のもの"""
+        best_delta, best_changes = 0, None
+        for column in columns:
+            changes = self._changes(evaluator.grid, staff_idx, column)
+            if not changes:
+                continue
+            delta = evaluator.delta(changes)
+            if best_changes is None or delta > best_delta:
+                best_delta, best_changes = delta, changes
+        return best_delta, best_changes
+
+    def _improve(self, evaluator: ScoreEvaluator) -> bool:
+        """候補への差し替えで改善できなくなるまで差し替える（改善した場合True）"""
+        improved = False
+        while True:
+            changed = False
+            for i in random.sample(self.staff, len(self.staff)):
+                delta, changes = self._best_column(evaluator, i, self.pools[i])
+                if changes is not None and delta > 0:
+                    evaluator.apply(changes)
+                    changed = improved = True
+            if not changed:
+                return improved
+
+    def _generate(self, evaluator: ScoreEvaluator, staff_idx: int) -> List[Column]:
+        """価格付けの重みで行をサンプリングし、新しい候補を返す"""
+        sampler = self._sampler(staff_idx, self._price(evaluator, staff_idx))
+        columns = [tuple(sampler.sample())
+                   for _ in range(ColumnGenerationConfig.COLUMNS_PER_ROUND)]
+        return [c for c in columns if self._add_column(staff_idx, c)]
+
+    def _conflicting_staff(self, evaluator: ScoreEvaluator, staff_idx: int,
+                           undo: List[Change]) -> Optional[int]:
+        """
+        差し替え（undoは元に戻す変更）で重複・欠員になった早番・遅番・夜勤を埋め合わせられるスタッフ
+
+        重複した日はそのシフトに入っている他のスタッフ、欠員になった日はその日が固定でない
+        他のスタッフから選ぶ。
+        """
+        grid = evaluator.grid
+        candidates = []
+        for _, d, old in undo:
+            new = grid.rows[staff_idx][d]
+            for k, shift in enumerate((_EARLY, _LATE, _NIGHT)):
+                count = evaluator.day_stats[d][k]
+                if shift == new and count > 1:
+                    candidates += [j for j in self.staff if j != staff_idx
+                                   and grid.rows[j][d] == shift and len(self.allowed[j][d]) > 1]
+                elif shift == old and count == 0:
+                    candidates += [j for j in self.staff if j != staff_idx
+                                   and len(self.allowed[j][d]) > 1]
+        return random.choice(candidates) if candidates else None
+
+    def _replace(self, evaluator: ScoreEvaluator, staff_idx: int) -> None:
+        """
+        スタッフの行を新しい候補に差し替える
+
+        スコアが下がらなければそのまま採用する（同じでも採用して探索を進める）。
+        下がる場合は、重複・欠員を埋め合わせられる他のスタッフ1人の行も差し替え、
+        2行の合計でスコアが下がらなければ採用し、下がれば元に戻す。
+        """
+        delta, changes = self._best_column(evaluator, staff_idx,
+                                           self._generate(evaluator, staff_idx))
+        if changes is None:
+            return
+        grid = evaluator.grid
+        undo = [(i, d, grid.get(i, d)) for i, d, _ in changes]
+        evaluator.apply(changes)
+        if delta >= 0:
+            if delta > 0:
+                self._improve(evaluator)
+            return
+
+        partner = self._conflicting_staff(evaluator, staff_idx, undo)
+        if partner is not None:
+            self._generate(evaluator, partner)
+            partner_delta, partner_changes = self._best_column(evaluator, partner,
+                                                               self.pools[partner])
+            if partner_changes is not None and delta + partner_delta >= 0:
+                evaluator.apply(partner_changes)
+                if delta + partner_delta > 0:
+                    self._improve(evaluator)
+                return
+        evaluator.apply(undo)
+
+    # =========================================================================
+    # 実行
+    # =========================================================================
+
+    def run(self, evaluator: ScoreEvaluator, iterations: Optional[int] = None,
+            deadline: Optional[float] = None,
+            should_stop: Optional[Callable[[], bool]] = None,
+            progress_callback: Optional[Callable[[int, ShiftGrid, int, bool], None]] = None
+            ) -> Tuple[ShiftGrid, int, int]:
+        """
+        列生成を実行する
+
+        evaluator.grid（構築済みのスケジュール）とadd_rows()で加えたスケジュールの各行を
+        最初の候補とし、価格付けで候補を追加しながらマスター問題を解き直す。
+        最良スコアが改善しないまま全スタッフをSTALL_PASSES周したら終了する。
+        evaluator.gridを直接書き換える。
+
+        Args:
+            evaluator: 初期解のシフト表を持つ差分評価オブジェクト
+            iterations: 価格付けの回数の上限
+            deadline: 終了時刻（time.monotonic()基準）
+            should_stop: 価格付けごとに呼ばれる中断判定関数
+            progress_callback: 最良スコア更新時とPROGRESS_INTERVAL回ごとに
+                               (回数, 最良スケジュール, 最良スコア, 更新したか) で呼ばれる
+
+        Returns:
+            (best_grid, best_score, 完了した価格付けの回数)
+        """
+        grid = evaluator.grid
+        best_grid = grid.copy()
+        best_score = evaluator.score
+        if not self.staff:
+            return best_grid, best_score, 0
+
+        # 最初の候補: 初期解の行と、重みなしでサンプリングした行
+        for i in self.staff:
+            self._add_column(i, tuple(grid.rows[i]))
+            sampler = self._sampler(i)
+            for _ in range(ColumnGenerationConfig.INITIAL_COLUMNS):
+                self._add_column(i, tuple(sampler.sample()))
+        if self._improve(evaluator):
+            best_grid, best_score = grid.copy(), evaluator.score
+            if progress_callback is not None:
+                progress_callback(0, best_grid, best_score, True)
+
+        iteration = 0
+        last_improved = 0
+        stall_limit = ColumnGenerationConfig.STALL_PASSES * len(self.staff)
+        order: List[int] = []
+        while iterations is None or iteration < iterations:
+            if iteration - last_improved >= stall_limit:
+                break  # 価格付けで改善する候補が見つからなくなった
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            if should_stop is not None and should_stop():
+                break
+            if best_score == 0:
+                break  # これ以上改善できない
+            iteration += 1
+
+            # 価格付け: スタッフを順に回り、過不足に応じた重みで候補を追加して差し替える
+            if not order:
+                order = random.sample(self.staff, len(self.staff))
+            self._replace(evaluator, order.pop())
+
+            improved = evaluator.score > best_score
+            if improved:
+                best_score = evaluator.score
+                best_grid = grid.copy()
+                last_improved = iteration
+            if progress_callback is not None and (
+                    improved or iteration % ColumnGenerationConfig.PROGRESS_INTERVAL == 0):
+                progress_callback(iteration, best_grid, best_score, improved)
+
+        return best_grid, best_score, iteration
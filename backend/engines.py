@@ -0,0 +1,165 @@
+"""
+Engines - 探索エンジンの登録と呼び出し
+Version: 2.1.0
+
+探索エンジンは、Phase 0-2 を計算済みのShiftSolver（正規化済みの入力を持つ）から
+スケジュールとスコア（SearchResult）を求める関数として、名前で登録する。
+ShiftSolver.solve()は engine の名前で登録済みの関数を呼び出し、
+その結果に破壊と再構築・焼きなましによる改善を行う。
+
+エンジン関数の引数:
+    solver: ShiftSolver
+    stop_event: 停止イベント（is_set()を持つオブジェクト、またはNone）
+    progress_callback: 進捗通知用コールバック（またはNone）
+    include_schedule: 最良スコア更新時の進捗に最良スケジュールを含めるか
+    deadline: 打ち切り時刻（time.monotonic()基準、またはNone）
+
+新しいエンジンは次のように登録する:
+    @register_engine("my_engine")
+    def run_my_engine(solver, stop_event, progress_callback, include_schedule, deadline):
+        ...
+        return SearchResult(grid, score, attempts, early_exit)
+"""
+from typing import List, Dict, Optional, Callable, TYPE_CHECKING
+
+from .models import SolverEngine
+from .exact import ExactStatus, exact_backend
+from .parallel import solve_portfolio
+
+if TYPE_CHECKING:
+    from .solver import ShiftSolver, SearchResult
+
+
+EngineFunc = Callable[..., "SearchResult"]
+
+
+# =============================================================================
+# 定数定義
+# =============================================================================
+
+class PortfolioConfig:
+    """ポートフォリオ（複数エンジンの競争）の設定値"""
+    # 同時に実行するエンジン（1エンジンにつき1プロセス。exactはCP-SATが使える場合のみ）
+    ENGINES = [SolverEngine.MULTISTART, SolverEngine.TABU, SolverEngine.EXACT]
+
+
+def portfolio_engines() -> List[str]:
+    """
+    ポートフォリオで実際に実行するエンジン名
+
+    バックトラッキングの厳密解法は平準化を考慮せず、multistartより良い解を返さないため除く。
+    """
+    return [name for name in PortfolioConfig.ENGINES
+            if name != SolverEngine.EXACT or exact_backend() == "cp-sat"]
+
+
+# =============================================================================
+# 登録
+# =============================================================================
+
+_ENGINES: Dict[str, EngineFunc] = {}
+
+
+def register_engine(name: str) -> Callable[[EngineFunc], EngineFunc]:
+    """
+    探索エンジンを登録するデコレータ
+
+    Args:
+        name: エンジン名（ShiftRequest.engine に指定する名前）
+    """
+    def decorator(func: EngineFunc) -> EngineFunc:
+        _ENGINES[name] = func
+        return func
+    return decorator
+
+
+def get_engine(name: str) -> EngineFunc:
+    """
+    登録済みの探索エンジンを取得する
+
+    Raises:
+        ValueError: 登録されていない名前の場合
+    """
+    try:
+        return _ENGINES[name]
+    except KeyError:
+        raise ValueError(f"未知の探索エンジンです: {name}") from None
+
+
+def engine_names() -> List[str]:
+    """登録済みの探索エンジン名のリスト"""
+    return list(_ENGINES)
+
+
+# =============================================================================
+# 標準のエンジン
+# =============================================================================
+
+@register_engine(SolverEngine.MULTISTART)
+def run_multistart(solver: "ShiftSolver", stop_event=None,
+                   progress_callback: Optional[Callable[[Dict], None]] = None,
+                   include_schedule: bool = False,
+                   deadline: Optional[float] = None) -> "SearchResult":
+    """ランダムな構築をmax_attempts回繰り返す（workers > 1 の場合は並列）"""
+    return solver._search_multistart(stop_event, progress_callback, include_schedule, deadline)
+
+
+@register_engine(SolverEngine.TABU)
+def run_tabu(solver: "ShiftSolver", stop_event=None,
+             progress_callback: Optional[Callable[[Dict], None]] = None,
+             include_schedule: bool = False,
+             deadline: Optional[float] = None) -> "SearchResult":
+    """1回構築したスケジュールからタブー探索を行う"""
+    return solver._search_tabu(stop_event, progress_callback, include_schedule, deadline)
+
+
+@register_engine(SolverEngine.EXACT)
+def run_exact(solver: "ShiftSolver", stop_event=None,
+              progress_callback: Optional[Callable[[Dict], None]] = None,
+              include_schedule: bool = False,
+              deadline: Optional[float] = None) -> "SearchResult":
+    """
+    厳密解法で解く
+
+    最適性を証明できなかった場合は、残りの時間で通常の探索を行い、良い方を採用する。
+    """
+    result = solver._search_exact(stop_event, progress_callback, include_schedule, deadline)
+    if solver.exact_status == ExactStatus.OPTIMAL or result.early_exit:
+        return result
+    return solver._merge_results([result, solver._search_multistart(
+        stop_event, progress_callback, include_schedule, deadline)])
+
+
+def _run_exact_alone(solver: "ShiftSolver", stop_event=None,
+                     progress_callback: Optional[Callable[[Dict], None]] = None,
+                     include_schedule: bool = False,
+                     deadline: Optional[float] = None) -> "SearchResult":
+    """厳密解法だけで解く（ポートフォリオ用。multistartへの切り替えを行わない）"""
+    return solver._search_exact(stop_event, progress_callback, include_schedule, deadline)
+
+
+@register_engine(SolverEngine.COLGEN)
+def run_colgen(solver: "ShiftSolver", stop_event=None,
+               progress_callback: Optional[Callable[[Dict], None]] = None,
+               include_schedule: bool = False,
+               deadline: Optional[float] = None) -> "SearchResult":
+    """1回構築したスケジュールの行を最初の候補として列生成を行う"""
+    return solver._search_colgen(stop_event, progress_callback, include_schedule, deadline)
+
+
+@register_engine(SolverEngine.PORTFOLIO)
+def run_portfolio(solver: "ShiftSolver", stop_event=None,
+                  progress_callback: Optional[Callable[[Dict], None]] = None,
+                  include_schedule: bool = False,
+                  deadline: Optional[float] = None) -> "SearchResult":
+    """
+    portfolio_engines() を別々のプロセスで同時に実行する
+
+    いずれかのエンジンが早期終了条件を満たした時点で他のエンジンを停止し、
+    各エンジンの最良解をスコアで比較して最終結果とする。
+    exactはmultistartへの切り替えを行わない（multistartは別のプロセスで実行しているため）。
+    """
+    engines = [_run_exact_alone if name == SolverEngine.EXACT else get_engine(name)
+               for name in portfolio_engines()]
+    return solver._merge_results(solve_portfolio(
+        solver, engines, progress_callback, include_schedule, stop_event, deadline))
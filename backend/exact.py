@@ -0,0 +1,664 @@
+"""
+Exact Engine - 制約モデルによる厳密解法
+Version: 2.1.0
+
+シフトルール（rules.py）と人員配置の目標（早番・遅番・夜勤・日勤帯人数）を制約モデルとして解く。
+
+- OR-Tools（CP-SAT）がインストールされていればそれを使い、ルールを厳守した上で
+  ペナルティ合計（_calc_penalties()と同じ。分散の端数切り捨てのみ除く）を最小化する。
+  時間内に探索を終えれば最適性を証明できる
+- インストールされていなければ純Pythonのバックトラッキング探索（制約伝播付き）で、
+  公休数・夜勤目標・欠員・重複のペナルティがすべて0になるスケジュールを探す
+  （平準化ペナルティは考慮しない。そのようなスケジュールが存在しないことも証明できる）
+
+Phase 0-2 で確定したセル（固定日・希望・パートスタッフの行）は変更しない。
+"""
+import threading
+import time
+from typing import List, Dict, Tuple, Optional, Callable, NamedTuple, TYPE_CHECKING
+
+from .grid import (ShiftCode, ShiftGrid, IS_DAY_SHIFT, IS_WORK_SHIFT, encode_shift)
+from .rules import ShiftRuleChecker, PAIR_LEGAL
+
+try:
+    from ortools.sat.python import cp_model
+except ImportError:  # OR-Tools は任意の依存
+    cp_model = None
+
+if TYPE_CHECKING:
+    from .solver import ShiftSolver
+
+
+# =============================================================================
+# 定数定義
+# =============================================================================
+
+class ExactConfig:
+    """厳密解法の設定値"""
+    DEFAULT_TIME_LIMIT_MS = 10000  # 時間上限の既定値（ミリ秒）
+    MAX_NODES = 2000000            # バックトラッキングの探索ノード数の上限
+    CHECK_INTERVAL = 1024          # 時間・中断判定の間隔（探索ノード数）
+    LINEAR_TIME_RATIO = 0.5        # CP-SATで平準化以外の項だけを解く時間の割合
+    STOP_POLL_SECONDS = 0.1        # CP-SAT実行中の中断判定の間隔（秒）
+    BACKTRACK_TIME_RATIO = 0.25    # バックトラッキングに使う時間の割合（残りは通常の探索に使う）
+    BACKTRACK_MAX_TIME_MS = 2000   # バックトラッキングの時間上限（ミリ秒）
+
+
+class ExactStatus:
+    """厳密解法の結果の状態"""
+    OPTIMAL = "optimal"        # 最適解（CP-SATで証明済み）
+    FEASIBLE = "feasible"      # 解は見つかったが最適性は未証明（時間切れ・バックトラッキング）
+    INFEASIBLE = "infeasible"  # 解が存在しないことを証明した（CP-SAT）
+    NO_PERFECT = "no_perfect"  # 平準化以外のペナルティが0の解がないことを証明した（バックトラッキング）
+    UNKNOWN = "unknown"        # 時間・ノード数の上限で打ち切った
+
+
+class ExactResult(NamedTuple):
+    """厳密解法の結果"""
+    grid: Optional[ShiftGrid]  # 見つかったスケジュール（なければNone）
+    status: str                # ExactStatus
+
+
+# 変数セルの選択肢（休暇・希望休は固定セルにのみ現れる）
+_CHOICES = (ShiftCode.EARLY, ShiftCode.DAY, ShiftCode.LATE,
+            ShiftCode.NIGHT, ShiftCode.NIGHT_REST, ShiftCode.OFF)
+
+_MASK = ShiftCode.KIND_MASK
+_EARLY = ShiftCode.EARLY
+_DAY = ShiftCode.DAY
+_LATE = ShiftCode.LATE
+_NIGHT = ShiftCode.NIGHT
+_NIGHT_REST = ShiftCode.NIGHT_REST
+_OFF = ShiftCode.OFF
+
+_MAX_WORK = ShiftRuleChecker.MAX_CONSECUTIVE_WORK
+_MAX_DAY_STREAK = ShiftRuleChecker.MAX_DAY_SHIFT_STREAK
+
+
+def exact_backend() -> str:
+    """使用するソルバー（OR-Toolsがあれば"cp-sat"、なければ"backtracking"）"""
+    return "cp-sat" if cp_model is not None else "backtracking"
+
+
+class ExactSolver:
+    """
+    制約モデルによる厳密解法
+
+    使い方:
+        exact = ExactSolver(solver, SolverConfig)
+        result = exact.solve(time_limit_ms=5000)
+        if result.grid is not None:
+            ...
+    """
+
+    def __init__(self, solver: "ShiftSolver", config):
+        """
+        Args:
+            solver: 初期状態（Phase 0-2）と設定値を持つソルバー
+            config: ペナルティ係数を持つ設定クラス（SolverConfig）
+        """
+        self.solver = solver
+        self.config = config
+        self.is_regular = set(solver.regular_idx)
+        self.days = solver.days
+        self.seed, _ = solver._get_seed_state()
+
+        self.prev_codes = []
+        self.prev_streaks = []
+        for s in solver.staff_dict_list:
+            self.prev_codes.append(encode_shift(s["prev_shift"].strip()) & _MASK)
+            self.prev_streaks.append(s["prev_streak"])
+
+    @property
+    def backend(self) -> str:
+        """使用するソルバー（"cp-sat" または "backtracking"）"""
+        return exact_backend()
+
+    def solve(self, time_limit_ms: Optional[int] = None, workers: int = 1,
+              should_stop: Optional[Callable[[], bool]] = None,
+              hint: Optional[ShiftGrid] = None) -> ExactResult:
+        """
+        厳密解法を実行する
+
+        Args:
+            time_limit_ms: 時間上限（ミリ秒）。省略時はDEFAULT_TIME_LIMIT_MS。
+                           バックトラッキングは平準化を考慮しないため、その一部
+                           （BACKTRACK_TIME_RATIO倍、BACKTRACK_MAX_TIME_MS以下）だけを使う
+            workers: CP-SATの探索スレッド数
+            should_stop: 探索中に呼ばれる中断判定関数
+            hint: CP-SATの初期解の候補（ルール違反を含んでもよい）
+
+        Returns:
+            厳密解法の結果
+        """
+        if time_limit_ms is None:
+            time_limit_ms = ExactConfig.DEFAULT_TIME_LIMIT_MS
+        if cp_model is not None:
+            return self._solve_cp_sat(time_limit_ms, workers, should_stop, hint)
+        time_limit_ms = min(time_limit_ms * ExactConfig.BACKTRACK_TIME_RATIO,
+                            ExactConfig.BACKTRACK_MAX_TIME_MS)
+        return _Backtracker(self).solve(time.monotonic() + time_limit_ms / 1000, should_stop)
+
+    def _is_variable(self, staff_idx: int, day_idx: int) -> bool:
+        """探索で値を決めるセルか（常勤スタッフの未配置セル）"""
+        return staff_idx in self.is_regular and self.seed.get(staff_idx, day_idx) == ShiftCode.EMPTY
+
+    # =========================================================================
+    # CP-SAT
+    # =========================================================================
+
+    def _solve_cp_sat(self, time_limit_ms: int, workers: int,
+                      should_stop: Optional[Callable[[], bool]],
+                      hint: Optional[ShiftGrid]) -> ExactResult:
+        """CP-SATでペナルティ最小のスケジュールを求める"""
+        solver = self.solver
+        days = self.days
+        seed = self.seed
+        config = self.config
+        model = cp_model.CpModel()
+
+        # cells[i][d]: 変数セルなら {コード: ブール変数}、固定セルならコード
+        cells: List[List] = []
+        for i in range(solver.n_staff):
+            row = []
+            for d in range(days):
+                if self._is_variable(i, d):
+                    choice = {code: model.NewBoolVar(f"x_{i}_{d}_{code}") for code in _CHOICES}
+                    model.AddExactlyOne(choice.values())
+                    row.append(choice)
+                else:
+                    row.append(seed.get(i, d))
+            cells.append(row)
+
+        def terms(i: int, d: int, kinds) -> Tuple[List, int]:
+            """セルが指定種別である式を (変数リスト, 定数) で返す"""
+            cell = cells[i][d]
+            if isinstance(cell, dict):
+                return [cell[k] for k in kinds if k in cell], 0
+            return [], int((cell & _MASK) in kinds)
+
+        work_kinds = ShiftCode.WORK_SHIFTS
+        day_kinds = ShiftCode.DAY_SHIFTS
+
+        for i in solver.regular_idx:
+            prev_kind = self.prev_codes[i]
+            for d in range(days):
+                cur = cells[i][d]
+                before = cells[i][d - 1] if d else prev_kind
+                if not isinstance(cur, dict) and not isinstance(before, dict):
+                    continue  # 固定セル同士は対象外
+
+                # ルール1・2: 隣接する日の組み合わせ
+                for p in (before if isinstance(before, dict) else {before & _MASK: None}):
+                    for n in (cur if isinstance(cur, dict) else {cur & _MASK: None}):
+                        if PAIR_LEGAL[p][n]:
+                            continue
+                        lits = []
+                        if isinstance(before, dict):
+                            lits.append(before[p].Not())
+                        if isinstance(cur, dict):
+                            lits.append(cur[n].Not())
+                        model.AddBoolOr(lits)
+
+                # 夜勤の翌日は明け
+                if d:
+                    night, night_const = terms(i, d - 1, (_NIGHT,))
+                    rest, rest_const = terms(i, d, (_NIGHT_REST,))
+                    if night_const and not rest_const:
+                        model.Add(sum(rest) == 1)
+                    elif night and not rest_const:
+                        model.Add(sum(rest) >= sum(night))
+
+            # ルール3: 連勤は5日まで（前月からの連勤・月末の夜勤明けを含む）
+            prev_streak = self.prev_streaks[i]
+            for end in range(days):
+                variables, const = [], 0
+                for d in range(end - _MAX_WORK, end + 1):
+                    if d < 0:
+                        const += int(d >= -prev_streak)
+                        continue
+                    v, c = terms(i, d, work_kinds)
+                    variables += v
+                    const += c
+                if end == days - 1:
+                    v, c = terms(i, end, (_NIGHT,))
+                    variables += v
+                    const += c
+                if variables and const <= _MAX_WORK:
+                    model.Add(sum(variables) <= _MAX_WORK - const)
+
+            # ルール4: 日勤帯のみの連勤は3日まで
+            day_prefix = prev_streak if IS_DAY_SHIFT[prev_kind] else 0
+            for end in range(days):
+                variables, const = [], 0
+                for d in range(end - _MAX_DAY_STREAK, end + 1):
+                    if d < 0:
+                        const += int(d >= -day_prefix)
+                        continue
+                    v, c = terms(i, d, day_kinds)
+                    variables += v
+                    const += c
+                if variables and const <= _MAX_DAY_STREAK:
+                    model.Add(sum(variables) <= _MAX_DAY_STREAK - const)
+
+        # ペナルティ
+        objective = []
+
+        def count(d: int, kinds) -> Tuple[List, int]:
+            variables, const = [], 0
+            for i in range(solver.n_staff):
+                v, c = terms(i, d, kinds)
+                variables += v
+                const += c
+            return variables, const
+
+        day_staff = []  # 日ごとの日勤帯人数の式
+        for d in range(days):
+            for kinds, missing_weight in (((_EARLY,), config.PENALTY_EARLY_MISSING),
+                                          ((_LATE,), config.PENALTY_LATE_MISSING),
+                                          ((_NIGHT,), config.PENALTY_NIGHT_MISSING)):
+                variables, const = count(d, kinds)
+                if const:
+                    missing = 0
+                else:
+                    missing = model.NewBoolVar("")
+                    model.Add(sum(variables) + missing >= 1)
+                    objective.append(missing_weight * missing)
+                if kinds != (_NIGHT,) and variables:
+                    # 早番・遅番の重複
+                    duplicate = model.NewBoolVar("")
+                    model.Add(sum(variables) + const <= 1 + solver.n_staff * duplicate)
+                    objective.append(config.PENALTY_DUPLICATE * duplicate)
+                elif kinds != (_NIGHT,) and const > 1:
+                    objective.append(config.PENALTY_DUPLICATE)
+
+            variables, const = count(d, day_kinds)
+            day_staff.append(sum(variables) + const)
+            if const < config.MIN_DAY_STAFF:
+                shortage = model.NewBoolVar("")
+                model.Add(sum(variables) + config.MIN_DAY_STAFF * shortage
+                          >= config.MIN_DAY_STAFF - const)
+                objective.append(config.PENALTY_DAY_SHORTAGE * shortage)
+
+        for i in range(solver.n_staff):
+            targets = []
+            if i in self.is_regular:
+                # 公休（希望休を含む）は種別コードでOFF
+                targets.append(((_OFF,), solver.target_off_days, config.PENALTY_OFF_DAYS))
+            if solver.night_targets[i] > 0:
+                targets.append(((_NIGHT,), solver.night_targets[i], config.PENALTY_NIGHT_TARGET))
+            for kinds, target, weight in targets:
+                variables, const = [], 0
+                for d in range(days):
+                    v, c = terms(i, d, kinds)
+                    variables += v
+                    const += c
+                diff = model.NewIntVar(0, days, "")
+                model.Add(diff >= sum(variables) + const - target)
+                model.Add(diff >= target - const - sum(variables))
+                objective.append(weight * diff)
+
+        # 平準化ペナルティを含めると最初の解が見つかりにくいため、先にそれ以外の項だけで解き、
+        # その解をヒントにして全体を最小化する
+        deadline = time.monotonic() + time_limit_ms / 1000
+        if hint is not None:
+            for i, row in enumerate(cells):
+                for d, cell in enumerate(row):
+                    if isinstance(cell, dict):
+                        kind = hint.get(i, d) & _MASK
+                        for code, var in cell.items():
+                            model.AddHint(var, int(code == kind))
+        model.Minimize(sum(objective))
+        linear_limit = time_limit_ms * ExactConfig.LINEAR_TIME_RATIO / 1000
+        status, values = self._run_cp_sat(model, cells, linear_limit, workers, should_stop)
+        if status == cp_model.INFEASIBLE:
+            return ExactResult(None, ExactStatus.INFEASIBLE)
+        if values is None:
+            return ExactResult(None, ExactStatus.UNKNOWN)
+        if should_stop is not None and should_stop():
+            return ExactResult(self._to_grid(cells, values), ExactStatus.FEASIBLE)
+
+        model.ClearHints()
+        for var, value in values.items():
+            model.AddHint(var, value)
+
+        # 平準化ペナルティ（人員差が3人以上）
+        n_staff = solver.n_staff
+        counts = []
+        for expr in day_staff:
+            c = model.NewIntVar(0, n_staff, "")
+            model.Add(c == expr)
+            counts.append(c)
+        max_cnt = model.NewIntVar(0, n_staff, "")
+        min_cnt = model.NewIntVar(0, n_staff, "")
+        model.AddMaxEquality(max_cnt, counts)
+        model.AddMinEquality(min_cnt, counts)
+        wide = model.NewBoolVar("")  # 人員差が3以上
+        model.Add(max_cnt - min_cnt <= 2 + n_staff * wide)
+        spread = model.NewIntVar(0, n_staff, "")
+        model.Add(spread >= max_cnt - min_cnt - n_staff * (1 - wide))
+        objective.append(config.PENALTY_RANGE * spread)
+
+        # 平準化ペナルティ（分散 × PENALTY_VARIANCE）。
+        # 分散 = (n * Σc² - (Σc)²) / n² のため、目的関数全体をn²倍して整数で扱う
+        squares = []
+        for c in counts:
+            sq = model.NewIntVar(0, n_staff * n_staff, "")
+            model.AddMultiplicationEquality(sq, [c, c])
+            squares.append(sq)
+        total = model.NewIntVar(0, n_staff * days, "")
+        model.Add(total == sum(counts))
+        total_sq = model.NewIntVar(0, (n_staff * days) ** 2, "")
+        model.AddMultiplicationEquality(total_sq, [total, total])
+        variance = config.PENALTY_VARIANCE * (days * sum(squares) - total_sq)
+
+        model.Minimize(days * days * sum(objective) + variance)
+        status, full_values = self._run_cp_sat(model, cells, max(deadline - time.monotonic(), 0.1),
+                                               workers, should_stop)
+        if full_values is not None:
+            values = full_values
+        optimal = status == cp_model.OPTIMAL
+        return ExactResult(self._to_grid(cells, values),
+                           ExactStatus.OPTIMAL if optimal else ExactStatus.FEASIBLE)
+
+    def _run_cp_sat(self, model, cells: List[List], time_limit: float, workers: int,
+                    should_stop: Optional[Callable[[], bool]]) -> Tuple[int, Optional[Dict]]:
+        """
+        CP-SATを実行する
+
+        should_stop は別スレッドからSTOP_POLL_SECONDSごとに呼び、Trueなら探索を打ち切る。
+
+        Returns:
+            (ステータス, 解が見つかれば {ブール変数: 値}、見つからなければNone)
+        """
+        cp_solver = cp_model.CpSolver()
+        cp_solver.parameters.max_time_in_seconds = time_limit
+        cp_solver.parameters.num_workers = max(1, workers)
+
+        finished = threading.Event()
+
+        def watch() -> None:
+            while not finished.wait(ExactConfig.STOP_POLL_SECONDS):
+                if should_stop():
+                    cp_solver.StopSearch()
+                    return
+
+        if should_stop is not None:
+            threading.Thread(target=watch, daemon=True).start()
+        try:
+            status = cp_solver.Solve(model)
+        finally:
+            finished.set()
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            return status, None
+        values = {var: cp_solver.Value(var)
+                  for row in cells for cell in row if isinstance(cell, dict)
+                  for var in cell.values()}
+        return status, values
+
+    def _to_grid(self, cells: List[List], values: Dict) -> ShiftGrid:
+        """CP-SATの解をシフト表に変換する"""
+        grid = self.seed.copy()
+        for i, row in enumerate(cells):
+            for d, cell in enumerate(row):
+                if isinstance(cell, dict):
+                    grid.set(i, d, next(k for k, v in cell.items() if values[v]))
+        return grid
+
+
+# =============================================================================
+# バックトラッキング
+# =============================================================================
+
+class _Backtracker:
+    """
+    ペナルティ0のスケジュールを探すバックトラッキング探索
+
+    日ごとに常勤スタッフのセルを順に決める。各セルの候補は、前日からの遷移・連勤数・
+    その日の人数・公休数と夜勤回数の残りで絞り込み、日の終わりに人員配置を確認する。
+    """
+
+    def __init__(self, exact: ExactSolver):
+        solver = exact.solver
+        self.solver = solver
+        self.exact = exact
+        self.days = days = exact.days
+        seed = exact.seed
+        self.staff = list(solver.regular_idx)
+        self.target_off = solver.target_off_days
+        self.night_targets = solver.night_targets
+        self.min_day_staff = exact.config.MIN_DAY_STAFF
+
+        # 日ごとの固定セルの人数（早番, 遅番, 夜勤, 日勤帯）
+        self.base_counts = []
+        for d in range(days):
+            self.base_counts.append([
+                sum(1 for i in range(solver.n_staff) if not exact._is_variable(i, d)
+                    and seed.get(i, d) == code)
+                for code in (_EARLY, _LATE, _NIGHT)
+            ] + [sum(1 for i in range(solver.n_staff) if not exact._is_variable(i, d)
+                     and IS_DAY_SHIFT[seed.get(i, d)])])
+
+        # スタッフごとの「d日目以降」の固定公休数・固定夜勤数・変数セル数と、
+        # d日目から続く固定セルの勤務・日勤帯の連続日数
+        self.fixed_off_after: Dict[int, List[int]] = {}
+        self.fixed_night_after: Dict[int, List[int]] = {}
+        self.free_after: Dict[int, List[int]] = {}
+        self.fixed_work_run: Dict[int, List[int]] = {}
+        self.fixed_day_run: Dict[int, List[int]] = {}
+        for i in self.staff:
+            off = [0] * (days + 1)
+            night = [0] * (days + 1)
+            free = [0] * (days + 1)
+            work_run = [0] * (days + 1)
+            day_run = [0] * (days + 1)
+            for d in range(days - 1, -1, -1):
+                code = seed.get(i, d)
+                variable = exact._is_variable(i, d)
+                off[d] = off[d + 1] + int(not variable and code in ShiftCode.OFF_CODES)
+                night[d] = night[d + 1] + int(not variable and code == _NIGHT)
+                free[d] = free[d + 1] + int(variable)
+                if not variable and IS_WORK_SHIFT[code]:
+                    work_run[d] = work_run[d + 1] + 1
+                if not variable and IS_DAY_SHIFT[code]:
+                    day_run[d] = day_run[d + 1] + 1
+            self.fixed_off_after[i] = off
+            self.fixed_night_after[i] = night
+            self.free_after[i] = free
+            self.fixed_work_run[i] = work_run
+            self.fixed_day_run[i] = day_run
+
+    def solve(self, deadline: float, should_stop: Optional[Callable[[], bool]]) -> ExactResult:
+        """
+        探索を実行する
+
+        平準化ペナルティは考慮しないため、見つかった解の最適性は証明しない（FEASIBLE）。
+        探索し尽くした場合も、ペナルティ0の解がないことしか分からない（NO_PERFECT）。
+        """
+        exact = self.exact
+        days = self.days
+        staff = self.staff
+        order = [(d, i) for d in range(days) for i in staff]
+        grid = exact.seed.copy()
+
+        # スタッフごとの状態: 前日の種別, 連勤数, 日勤帯連勤数, 公休数, 夜勤数
+        state = {}
+        for i in staff:
+            prev = exact.prev_codes[i]
+            streak = exact.prev_streaks[i]
+            state[i] = [prev, streak, streak if IS_DAY_SHIFT[prev] else 0, 0, 0]
+        counts = [list(c) for c in self.base_counts]
+
+        # stack[k]: order[k] の (候補リスト, 次に試す位置, 適用前の状態)
+        stack = []
+        nodes = 0
+        pos = 0
+        candidates = self._candidates(order, 0, grid, state, counts) if order else []
+        stack.append([candidates, 0, None])
+
+        while stack:
+            if pos == len(order):
+                return ExactResult(grid, ExactStatus.FEASIBLE)
+
+            frame = stack[-1]
+            d, i = order[pos]
+            if frame[2] is not None:
+                # 前回の候補を取り消す
+                self._undo(grid, i, d, state, counts, frame[2])
+                frame[2] = None
+            if frame[1] >= len(frame[0]):
+                stack.pop()
+                pos -= 1
+                continue
+
+            code = frame[0][frame[1]]
+            frame[1] += 1
+            frame[2] = self._apply(grid, i, d, code, state, counts)
+
+            nodes += 1
+            if nodes % ExactConfig.CHECK_INTERVAL == 0:
+                if nodes >= ExactConfig.MAX_NODES or time.monotonic() >= deadline:
+                    return ExactResult(None, ExactStatus.UNKNOWN)
+                if should_stop is not None and should_stop():
+                    return ExactResult(None, ExactStatus.UNKNOWN)
+
+            if not self._day_feasible(order, pos, counts):
+                continue
+
+            pos += 1
+            if pos < len(order):
+                stack.append([self._candidates(order, pos, grid, state, counts), 0, None])
+            else:
+                stack.append([[], 0, None])
+
+        return ExactResult(None, ExactStatus.NO_PERFECT)
+
+    def _candidates(self, order, pos: int, grid: ShiftGrid, state, counts) -> List[int]:
+        """order[pos] のセルに置けるコードを優先順に並べる"""
+        d, i = order[pos]
+        days = self.days
+        last, streak, day_streak, off, nights = state[i]
+        seed_code = self.exact.seed.get(i, d)
+        day_counts = counts[d]
+        fixed = not self.exact._is_variable(i, d)
+        next_kind = None
+        if d + 1 < days and not self.exact._is_variable(i, d + 1):
+            next_kind = self.exact.seed.get(i, d + 1) & _MASK
+
+        if fixed:
+            options = [seed_code]
+        elif last == _NIGHT:
+            options = [_NIGHT_REST]
+        elif last == _NIGHT_REST:
+            options = [_OFF]
+        else:
+            options = self._preferred_order(i, d, state[i], day_counts)
+
+        target_night = self.night_targets[i]
+        free_after = self.free_after[i][d + 1]
+        result = []
+        for code in options:
+            kind = code & _MASK
+            if not fixed:
+                if not PAIR_LEGAL[last][kind]:
+                    continue
+                if next_kind is not None and not PAIR_LEGAL[kind][next_kind]:
+                    continue
+                if kind == _NIGHT and next_kind is not None and next_kind != _NIGHT_REST:
+                    continue
+            # 連勤（夜勤は明けの分、翌日以降に続く固定の勤務を含める）
+            if IS_WORK_SHIFT[kind] and not fixed:
+                add = 2 if kind == _NIGHT else 1
+                if streak + add + self.fixed_work_run[i][d + 1] > _MAX_WORK:
+                    continue
+                if (IS_DAY_SHIFT[kind]
+                        and day_streak + 1 + self.fixed_day_run[i][d + 1] > _MAX_DAY_STREAK):
+                    continue
+            # その日の人数
+            if kind == _EARLY and day_counts[0] >= 1 and not fixed:
+                continue
+            if kind == _LATE and day_counts[1] >= 1 and not fixed:
+                continue
+            if kind == _NIGHT and day_counts[2] >= 1 and not fixed:
+                continue
+            # 公休数・夜勤回数の残り
+            new_off = off + int(code in ShiftCode.OFF_CODES) + self.fixed_off_after[i][d + 1]
+            if new_off > self.target_off or self.target_off - new_off > free_after:
+                continue
+            if target_night > 0:
+                new_nights = nights + int(kind == _NIGHT) + self.fixed_night_after[i][d + 1]
+                if new_nights > target_night or target_night - new_nights > (free_after + 2) // 3:
+                    continue
+            result.append(code)
+        return result
+
+    def _preferred_order(self, i: int, d: int, staff_state, day_counts) -> List[int]:
+        """変数セルの候補を試す順（不足している配置を優先）"""
+        _, _, _, off, nights = staff_state
+        order = []
+        if day_counts[2] == 0 and nights < self.night_targets[i]:
+            order.append(_NIGHT)
+        if day_counts[0] == 0:
+            order.append(_EARLY)
+        if day_counts[1] == 0:
+            order.append(_LATE)
+        free_after = self.free_after[i][d]
+        off_needed = self.target_off - off - self.fixed_off_after[i][d]
+        if free_after and off_needed * 3 >= free_after:
+            order += [_OFF, _DAY]
+        else:
+            order += [_DAY, _OFF]
+        for code in (_NIGHT, _EARLY, _LATE):
+            if code not in order:
+                order.append(code)
+        return order
+
+    def _apply(self, grid: ShiftGrid, i: int, d: int, code: int, state, counts):
+        """セルにコードを置いて状態を更新する（取り消し用の情報を返す）"""
+        saved = list(state[i])
+        last, streak, day_streak, off, nights = saved
+        kind = code & _MASK
+        if IS_WORK_SHIFT[kind]:
+            streak += 1
+            day_streak = day_streak + 1 if IS_DAY_SHIFT[kind] else 0
+        else:
+            streak = day_streak = 0
+        state[i] = [kind, streak, day_streak, off + int(code in ShiftCode.OFF_CODES),
+                    nights + int(kind == _NIGHT)]
+        if self.exact._is_variable(i, d):
+            grid.set(i, d, code)
+            self._count(counts[d], code, 1)
+        return saved
+
+    def _undo(self, grid: ShiftGrid, i: int, d: int, state, counts, saved) -> None:
+        """_apply()を取り消す"""
+        state[i] = saved
+        if self.exact._is_variable(i, d):
+            self._count(counts[d], grid.get(i, d), -1)
+            grid.set(i, d, ShiftCode.EMPTY)
+
+    def _count(self, day_counts: List[int], code: int, sign: int) -> None:
+        """日ごとの人数を増減する"""
+        if code == _EARLY:
+            day_counts[0] += sign
+        elif code == _LATE:
+            day_counts[1] += sign
+        elif code == _NIGHT:
+            day_counts[2] += sign
+        if IS_DAY_SHIFT[code]:
+            day_counts[3] += sign
+
+    def _day_feasible(self, order, pos: int, counts) -> bool:
+        """その日の残りのスタッフで人員配置を満たせるか"""
+        d, _ = order[pos]
+        remaining = 0
+        k = pos + 1
+        while k < len(order) and order[k][0] == d:
+            if self.exact._is_variable(order[k][1], d):
+                remaining += 1
+            k += 1
+        early, late, night, day_staff = counts[d]
+        missing = (early == 0) + (late == 0) + (night == 0)
+        # 早番・遅番の補充は日勤帯の人数にも数える
+        day_missing = max(0, self.min_day_staff - day_staff - (early == 0) - (late == 0))
+        return missing + day_missing <= remaining
@@ -0,0 +1,257 @@
+"""
+Solve Executor - ソルバー実行プール
+Version: 2.1.0
+
+CPUバウンドなShiftSolver.solve()をイベントループ外のプロセスプールで実行する。
+同時実行数はセマフォで制限し、上限を超えたリクエストは空きが出るまで待機する。
+ワーカープロセスからの進捗はマネージャー経由の共有辞書・キューで受け取り、
+キャンセルは共有イベントでワーカープロセスに伝える。
+並列探索（workers > 1）・ポートフォリオのリクエストはワーカー内でさらにプロセスを起動するため、
+その数だけ同時実行数の枠を確保し、ホスト全体のソルバーのプロセス数を同時実行数までに抑える。
+"""
+import asyncio
+import calendar
+import contextlib
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, MutableMapping, Callable, Dict, AsyncIterator
+
+from .models import ShiftRequest, ShiftResponse, FeasibilityResponse, SolverEngine
+from .engines import portfolio_engines
+from .solver import ShiftSolver, SolveCancelled
+
+
+def create_solver(request: ShiftRequest) -> ShiftSolver:
+    """シフト作成リクエストからソルバーを作成する"""
+    return ShiftSolver(
+        staff_data=request.staff_data,
+        year=request.year,
+        month=request.month,
+        target_off_days=request.target_off_days,
+        max_attempts=request.max_attempts,
+        workers=request.workers,
+        time_limit_ms=request.time_limit_ms,
+        anneal_iterations=request.anneal_iterations,
+        anneal_time_ms=request.anneal_time_ms,
+        lns_iterations=request.lns_iterations,
+        lns_time_ms=request.lns_time_ms,
+        engine=request.engine,
+        night_assignment=request.night_assignment,
+        early_late_assignment=request.early_late_assignment,
+        off_assignment=request.off_assignment
+    )
+
+
+def solver_slots(request: ShiftRequest) -> int:
+    """
+    リクエストの計算が同時に使うプロセス（CP-SATではスレッド）の数
+
+    ポートフォリオはエンジンごとに1プロセス、逐次実行のエンジン（tabu・colgen）は1、
+    それ以外はworkers。
+    """
+    if request.engine == SolverEngine.PORTFOLIO:
+        return len(portfolio_engines())
+    if request.engine in (SolverEngine.TABU, SolverEngine.COLGEN):
+        return 1
+    return request.workers
+
+
+def analyze_request(request: ShiftRequest) -> FeasibilityResponse:
+    """
+    シフト作成リクエストを解かずに、解消できない欠員を分析する
+
+    Phase 0-2 だけを実行するため、イベントループ内で実行しても短時間で終わる。
+
+    Args:
+        request: シフト作成リクエスト
+
+    Returns:
+        分析結果
+    """
+    solver = create_solver(request)
+    report = solver.analyze()
+    return FeasibilityResponse(
+        feasible=report.feasible,
+        issues=report.issues,
+        infeasible_days=report.infeasible_days,
+        capacity=report.capacity,
+        demand=report.demand,
+        max_nights=report.max_nights,
+        year=request.year,
+        month=request.month,
+        days=solver.days
+    )
+
+
+def solve_request(request: ShiftRequest,
+                  progress_callback: Optional[Callable[[Dict], None]] = None,
+                  include_schedule: bool = False,
+                  cancel_event=None) -> Optional[ShiftResponse]:
+    """
+    シフト作成リクエストを解く（ワーカープロセスで実行される）
+
+    Args:
+        request: シフト作成リクエスト
+        progress_callback: 進捗通知用コールバック（共有辞書のupdateや
+                           共有キューのputなど、プロセス間で渡せるもの）
+        include_schedule: 最良スコア更新時の進捗に最良スケジュールを含めるか
+        cancel_event: キャンセル用の共有イベント
+
+    Returns:
+        シフト作成レスポンス。スケジュールを作成できなかった場合はNone
+
+    Raises:
+        SolveCancelled: cancel_eventがセットされた場合
+    """
+    solver = create_solver(request)
+
+    if progress_callback is not None:
+        # 計算開始を通知
+        progress_callback({"attempts": 0})
+
+    schedule, errors = solver.solve(progress_callback, include_schedule, cancel_event)
+
+    if schedule is None:
+        return None
+
+    _, days = calendar.monthrange(request.year, request.month)
+
+    return ShiftResponse(
+        schedule=schedule,
+        errors=errors,
+        year=request.year,
+        month=request.month,
+        days=days,
+        attempts=solver.attempts_completed,
+        early_exit=solver.early_exit,
+        exact_status=solver.exact_status
+    )
+
+
+class SolveExecutor:
+    """
+    ソルバー実行用のプロセスプール
+
+    使い方:
+        executor = SolveExecutor()
+        executor.start()
+        response = await executor.run(request)
+        executor.shutdown()
+    """
+
+    def __init__(self, max_workers: Optional[int] = None,
+                 max_concurrent: Optional[int] = None):
+        """
+        Args:
+            max_workers: ワーカープロセス数（省略時はCPUコア数）
+            max_concurrent: 同時実行数の上限（省略時はmax_workers）
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_concurrent = max_concurrent or self.max_workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._reserve_lock: Optional[asyncio.Lock] = None
+        self._manager = None
+
+    def start(self) -> None:
+        """プロセスプールを起動する"""
+        if self._pool is not None:
+            return
+        self._manager = multiprocessing.Manager()
+        self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        self._reserve_lock = asyncio.Lock()
+
+    def shutdown(self) -> None:
+        """
+        プロセスプールを停止する
+
+        待機中のジョブは破棄し、実行中のジョブの終了を待つ。
+        実行中のジョブは事前にキャンセルイベントで中断させておくこと。
+        """
+        if self._pool is None:
+            return
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        self._manager.shutdown()
+        self._pool = None
+        self._semaphore = None
+        self._reserve_lock = None
+        self._manager = None
+
+    def create_progress(self) -> MutableMapping:
+        """ワーカープロセスと共有できる進捗用の辞書を作成する"""
+        if self._manager is None:
+            raise RuntimeError("SolveExecutor が起動していません")
+        return self._manager.dict()
+
+    def create_queue(self):
+        """ワーカープロセスと共有できる進捗通知用のキューを作成する"""
+        if self._manager is None:
+            raise RuntimeError("SolveExecutor が起動していません")
+        return self._manager.Queue()
+
+    def create_event(self):
+        """ワーカープロセスと共有できるキャンセル用のイベントを作成する"""
+        if self._manager is None:
+            raise RuntimeError("SolveExecutor が起動していません")
+        return self._manager.Event()
+
+    async def run(self, request: ShiftRequest,
+                  progress_callback: Optional[Callable[[Dict], None]] = None,
+                  include_schedule: bool = False,
+                  cancel_event=None) -> Optional[ShiftResponse]:
+        """
+        リクエストをプロセスプールで解く
+
+        workersは同時実行数を上限に切り詰め、計算が使うプロセスの数（solver_slots()）だけ
+        同時実行数の枠を確保してから実行する。ポートフォリオのエンジン数が同時実行数を
+        超える場合は、multistart（workers=同時実行数）で解く。
+
+        Args:
+            request: シフト作成リクエスト
+            progress_callback: 進捗通知用コールバック（create_progress()の辞書の
+                               updateやcreate_queue()のキューのputを渡す）
+            include_schedule: 最良スコア更新時の進捗に最良スケジュールを含めるか
+            cancel_event: キャンセル用の共有イベント（create_event()で作成）
+
+        Returns:
+            シフト作成レスポンス（作成失敗時はNone）
+
+        Raises:
+            SolveCancelled: cancel_eventがセットされた場合
+        """
+        if self._pool is None:
+            raise RuntimeError("SolveExecutor が起動していません")
+
+        if request.workers > self.max_concurrent:
+            request = request.copy(update={"workers": self.max_concurrent})
+        if solver_slots(request) > self.max_concurrent:
+            # ポートフォリオのエンジン数だけ枠がない場合は、枠の数のワーカーによる並列探索で解く
+            request = request.copy(update={"engine": SolverEngine.MULTISTART,
+                                           "workers": self.max_concurrent})
+
+        async with self._reserve(solver_slots(request)):
+            loop = asyncio.get_running_loop()
+            if cancel_event is not None and cancel_event.is_set():
+                raise SolveCancelled()
+            return await loop.run_in_executor(self._pool, solve_request, request,
+                                              progress_callback, include_schedule, cancel_event)
+
+    @contextlib.asynccontextmanager
+    async def _reserve(self, slots: int) -> AsyncIterator[None]:
+        """
+        同時実行数の枠をslots個確保する
+
+        複数の枠を少しずつ確保し合って待ち続けないよう、確保は1リクエストずつ行う。
+        """
+        acquired = 0
+        try:
+            async with self._reserve_lock:
+                for _ in range(slots):
+                    await self._semaphore.acquire()
+                    acquired += 1
+            yield
+        finally:
+            for _ in range(acquired):
+                self._semaphore.release()
@@ -0,0 +1,162 @@
+"""
+Feasibility Analyzer - 計算前の充足可能性・人員の分析
+Version: 2.1.0
+
+Phase 0-2 の初期状態（前月末・固定シフト・希望・パートスタッフの行）だけから、
+どう配置しても解消できない欠員を求める。
+
+- 夜勤: 当日・翌日（明け）・翌々日（公休）の夜→・→◎が入れられる常勤スタッフがいない日
+- 早番・遅番: ルール上入れられる常勤スタッフがいない日
+- 人数: 空いている常勤スタッフのセルが、日勤帯の最低人員（MIN_DAY_STAFF）・夜勤・
+  前日の夜勤の明けに必要な人数に届かない日
+- 夜勤の合計: 常勤スタッフが夜→・→◎を重ねずに入れられる回数の合計が、夜勤の必要な日数に届かない
+
+いずれも配置が進むほど厳しくなる条件を初期状態で確認するため、見つかった欠員は
+どの探索エンジンでも解消できない（見つからなくても解が存在するとは限らない）。
+"""
+from typing import List, NamedTuple, TYPE_CHECKING
+
+from .grid import ShiftCode
+
+if TYPE_CHECKING:
+    from .solver import ShiftSolver
+
+
+class FeasibilityReport(NamedTuple):
+    """充足可能性の分析結果"""
+    feasible: bool              # 解消できない欠員が見つからなかったか
+    issues: List[str]           # 解消できない欠員の説明
+    infeasible_days: List[int]  # 解消できない欠員がある日（1-indexed）
+    capacity: List[int]         # 日ごとの空いている常勤スタッフのセルの数
+    demand: List[int]           # 日ごとに空いているセルで埋める必要がある人数
+    max_nights: int             # 配置済みの夜勤を除いて、追加で配置できる夜勤の日数の上限
+
+
+# 夜勤と明けの間隔（夜→・→◎の次の日から次の夜勤を入れられる）
+_NIGHT_SPAN = 3
+
+
+class FeasibilityAnalyzer:
+    """
+    計算前の充足可能性・人員の分析
+
+    使い方:
+        report = FeasibilityAnalyzer(solver, SolverConfig).analyze()
+        if not report.feasible:
+            print(report.issues)
+    """
+
+    def __init__(self, solver: "ShiftSolver", config):
+        """
+        Args:
+            solver: 初期状態（Phase 0-2）と設定値を持つソルバー
+            config: 最低人員を持つ設定クラス（SolverConfig）
+        """
+        self.solver = solver
+        self.config = config
+        self.days = solver.days
+        self.rule_checker = solver.rule_checker
+        self.seed, _ = solver._get_seed_state()
+
+    def analyze(self) -> FeasibilityReport:
+        """初期状態から解消できない欠員を求める"""
+        grid = self.seed
+        days = self.days
+        issues: List[str] = []
+        bad_days = set()
+
+        # 夜勤を入れられる常勤スタッフ（日ごと）
+        night_placed = [grid.count_in_column(d, (ShiftCode.NIGHT,)) > 0 for d in range(days)]
+        night_candidates = [
+            [] if night_placed[d] else
+            [i for i in self.solver.regular_idx if self.rule_checker.can_place_night(i, d, grid)]
+            for d in range(days)]
+
+        capacity = []
+        demand = []
+        for d in range(days):
+            if not night_placed[d] and not night_candidates[d]:
+                issues.append(f"{d+1}日: 夜勤に入れる常勤スタッフがいません")
+                bad_days.add(d)
+            for code, label in ((ShiftCode.EARLY, "早番"), (ShiftCode.LATE, "遅番")):
+                if not self._can_cover(d, code):
+                    issues.append(f"{d+1}日: {label}に入れるスタッフがいません")
+                    bad_days.add(d)
+
+            open_cells = self._open_cells(d)
+            need = self._open_demand(d, night_placed, night_candidates)
+            capacity.append(open_cells)
+            demand.append(need)
+            if open_cells < need:
+                issues.append(f"{d+1}日: 出勤できる常勤スタッフが足りません"
+                              f"（必要{need}名・空き{open_cells}名）")
+                bad_days.add(d)
+
+        # 夜勤の合計回数（1日ごとの候補がいても、同じスタッフに集中する場合は足りない）
+        needed_nights = [d for d in range(days) if night_candidates[d]]
+        max_nights = sum(self._max_nights(i, night_candidates) for i in self.solver.regular_idx)
+        if max_nights < len(needed_nights):
+            issues.append(f"夜勤を毎日配置できません（追加で配置できる夜勤は最大{max_nights}日・"
+                          f"必要{len(needed_nights)}日）")
+            bad_days.update(needed_nights)
+
+        return FeasibilityReport(
+            feasible=not issues,
+            issues=issues,
+            infeasible_days=[d + 1 for d in sorted(bad_days)],
+            capacity=capacity,
+            demand=demand,
+            max_nights=max_nights,
+        )
+
+    # =========================================================================
+    # 日ごとの判定
+    # =========================================================================
+
+    def _can_cover(self, day_idx: int, code: int) -> bool:
+        """day_idx日目のcodeが配置済みか、ルール上入れられる常勤スタッフがいるか"""
+        grid = self.seed
+        if grid.count_in_column(day_idx, (code,)) > 0:
+            return True
+        return any(grid.rows[i][day_idx] == ShiftCode.EMPTY
+                   and self.rule_checker.check_rules(i, day_idx, grid, code)
+                   for i in self.solver.regular_idx)
+
+    def _open_cells(self, day_idx: int) -> int:
+        """day_idx日目の空いている常勤スタッフのセルの数"""
+        rows = self.seed.rows
+        return sum(1 for i in self.solver.regular_idx if rows[i][day_idx] == ShiftCode.EMPTY)
+
+    def _open_demand(self, day_idx: int, night_placed: List[bool],
+                     night_candidates: List[List[int]]) -> int:
+        """
+        day_idx日目に空いているセルで埋める必要がある人数
+
+        日勤帯（最低人員・早番・遅番）のうち配置済みのセルで足りない分と、
+        未配置の夜勤・前日の夜勤の明け（入れられる候補がいる場合のみ）の合計。
+        """
+        grid = self.seed
+        day_staff = grid.count_in_column(day_idx, ShiftCode.DAY_SHIFTS)
+        missing_early_late = sum(1 for code in (ShiftCode.EARLY, ShiftCode.LATE)
+                                 if grid.count_in_column(day_idx, (code,)) == 0)
+        need = max(self.config.MIN_DAY_STAFF - day_staff, missing_early_late, 0)
+        if night_candidates[day_idx]:
+            need += 1
+        if day_idx > 0 and not night_placed[day_idx - 1] and night_candidates[day_idx - 1]:
+            need += 1
+        return need
+
+    def _max_nights(self, staff_idx: int, night_candidates: List[List[int]]) -> int:
+        """
+        スタッフが追加で入れられる夜勤の回数の上限
+
+        夜→・→◎が重ならないように、入れられる日を前から順に選ぶ（長さが等しい区間の
+        最大個数は前から選ぶ方法で求まる）。連勤などの他のルールは考慮しない。
+        """
+        count = 0
+        next_day = 0
+        for d in range(self.days):
+            if d >= next_day and staff_idx in night_candidates[d]:
+                count += 1
+                next_day = d + _NIGHT_SPAN
+        return count
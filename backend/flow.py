@@ -0,0 +1,186 @@
+"""
+Min Cost Flow - 最小費用流
+Version: 2.1.0
+
+逐次最短路法による最小費用流。最短路は、最初の1回だけSPFA（負の費用の辺があるため）で求め、
+以降はその距離をポテンシャルとしたDijkstra法で求める。夜勤・早番遅番・公休の配置を
+「スタッフ → 日」の割り当て問題として解くために使う（assignment.py）。
+
+- 費用は整数。負の費用の辺を使える（始点から出る辺を報酬として使う）
+- 増加路の費用が0以上になった時点で打ち切る（流量ではなく費用を最小化する）
+- 増加路ごとに検証関数を呼び、拒否された辺を除いて最短路を探し直せる
+  （フローで表せない制約を割り当てのたびに確認するため）
+"""
+import heapq
+from collections import deque
+from typing import List, Optional, Callable
+
+
+# 到達不能を表す距離
+_INF = float("inf")
+
+
+class MinCostFlow:
+    """
+    最小費用流
+
+    使い方:
+        mcf = MinCostFlow(n_nodes)
+        e = mcf.add_edge(u, v, capacity=1, cost=-10)
+        mcf.solve(source, sink)
+        if mcf.flow_on(e): ...
+    """
+
+    def __init__(self, n_nodes: int):
+        """
+        Args:
+            n_nodes: 頂点数（頂点は0〜n_nodes-1）
+        """
+        self.n_nodes = n_nodes
+        # 辺は (e, e ^ 1) が順方向・逆方向の組になるように格納する
+        self.to: List[int] = []
+        self.cap: List[int] = []
+        self.cost: List[int] = []
+        self.adj: List[List[int]] = [[] for _ in range(n_nodes)]
+
+    def add_edge(self, u: int, v: int, capacity: int, cost: int) -> int:
+        """
+        辺を追加する
+
+        Returns:
+            辺の番号（flow_on()・remove_edge()に使う）
+        """
+        e = len(self.to)
+        self.to += [v, u]
+        self.cap += [capacity, 0]
+        self.cost += [cost, -cost]
+        self.adj[u].append(e)
+        self.adj[v].append(e + 1)
+        return e
+
+    def flow_on(self, e: int) -> int:
+        """辺eを流れている流量"""
+        return self.cap[e ^ 1]
+
+    def remove_edge(self, e: int) -> None:
+        """辺eの残り容量を0にする（流れている分はそのまま）"""
+        self.cap[e] = 0
+
+    def solve(self, source: int, sink: int, max_flow: Optional[int] = None,
+              accept_path: Optional[Callable[[List[int]], Optional[int]]] = None) -> int:
+        """
+        費用が負の増加路がなくなるまで（またはmax_flowに達するまで）流す
+
+        Args:
+            source: 始点
+            sink: 終点
+            max_flow: 流量の上限
+            accept_path: 増加路（辺の番号のリスト、始点側から順）を受け取り、
+                         受け入れるならNone、拒否するなら取り除く辺の番号を返す関数
+
+        Returns:
+            総費用
+        """
+        total_cost = 0
+        flow = 0
+        potential = None
+        while max_flow is None or flow < max_flow:
+            if potential is None:
+                dist, prev_edge = self._bellman_ford(source)
+            else:
+                dist, prev_edge = self._dijkstra(source, potential, sink)
+            if dist[sink] == _INF:
+                break
+            # ポテンシャルを更新する（残余グラフの辺の被約費用は0以上に保たれる）
+            if potential is None:
+                potential = [d if d != _INF else 0 for d in dist]
+            else:
+                # Dijkstra法は終点で打ち切るため、終点より遠い頂点は終点までの距離で更新する
+                dist_sink = dist[sink]
+                potential = [p + (d if d < dist_sink else dist_sink)
+                             for p, d in zip(potential, dist)]
+            path = self._trace(source, sink, prev_edge)
+            path_cost = sum(self.cost[e] for e in path)
+            if path_cost >= 0:
+                break
+
+            if accept_path is not None:
+                rejected = accept_path(path)
+                if rejected is not None:
+                    self.remove_edge(rejected)
+                    continue
+
+            amount = min(self.cap[e] for e in path)
+            if max_flow is not None:
+                amount = min(amount, max_flow - flow)
+            for e in path:
+                self.cap[e] -= amount
+                self.cap[e ^ 1] += amount
+            flow += amount
+            total_cost += amount * path_cost
+        return total_cost
+
+    def _bellman_ford(self, source: int):
+        """残余グラフ上の始点からの最短距離（負の費用の辺を含んでよい。SPFA）"""
+        dist = [_INF] * self.n_nodes
+        prev_edge = [-1] * self.n_nodes
+        in_queue = [False] * self.n_nodes
+        dist[source] = 0
+        queue = deque([source])
+        to, cap, cost, adj = self.to, self.cap, self.cost, self.adj
+        while queue:
+            u = queue.popleft()
+            in_queue[u] = False
+            du = dist[u]
+            for e in adj[u]:
+                if cap[e] <= 0:
+                    continue
+                v = to[e]
+                dv = du + cost[e]
+                if dv < dist[v]:
+                    dist[v] = dv
+                    prev_edge[v] = e
+                    if not in_queue[v]:
+                        in_queue[v] = True
+                        queue.append(v)
+        return dist, prev_edge
+
+    def _dijkstra(self, source: int, potential: List[int], sink: int):
+        """
+        残余グラフ上の始点からの被約費用での最短距離（Dijkstra法）
+
+        終点の距離が確定した時点で打ち切る（それより遠い頂点の距離は確定しない）。
+        """
+        dist = [_INF] * self.n_nodes
+        prev_edge = [-1] * self.n_nodes
+        dist[source] = 0
+        heap = [(0, source)]
+        to, cap, cost, adj = self.to, self.cap, self.cost, self.adj
+        while heap:
+            du, u = heapq.heappop(heap)
+            if du > dist[u]:
+                continue
+            if u == sink:
+                break
+            pu = potential[u]
+            for e in adj[u]:
+                if cap[e] <= 0:
+                    continue
+                v = to[e]
+                dv = du + cost[e] + pu - potential[v]
+                if dv < dist[v]:
+                    dist[v] = dv
+                    prev_edge[v] = e
+                    heapq.heappush(heap, (dv, v))
+        return dist, prev_edge
+
+    def _trace(self, source: int, sink: int, prev_edge: List[int]) -> List[int]:
+        """最短路木から始点→終点の経路（辺の番号のリスト）を取り出す"""
+        path = []
+        v = sink
+        while v != source:
+            e = prev_edge[v]
+            path.append(e)
+            v = self.to[e ^ 1]
+        path.reverse()
+        return path
@@ -0,0 +1,352 @@
+"""
+Shift Grid - ソルバー内部のシフト表表現
+Version: 2.1.0
+
+スタッフ×日のシフト表を1本のbytearrayで保持する。
+各セルは小さな整数のシフトコードで、希望休は公休コードにHOPEビットを立てて
+区別する（文字列表現の "◎ " と "◎" の区別に相当）。
+固定セル・希望セルの由来はセルごとのフラグとして別の配列に保持する。
+
+文字列の辞書表現 {スタッフ名: [日1, 日2, ...]} との変換は
+ソルバーの入出力（API境界）でのみ行う。
+"""
+from typing import List, Dict, Optional, Tuple
+
+from .models import ShiftTypes
+
+
+# =============================================================================
+# シフトコード
+# =============================================================================
+
+class ShiftCode:
+    """
+    シフト種別の整数コード
+
+    下位4ビットがシフト種別、HOPEビットが希望休の由来を表す。
+    `code & KIND_MASK` が文字列表現の `.strip()` に相当する。
+    """
+    EMPTY = 0              # 未配置
+    EARLY = 1              # 早番
+    DAY = 2                # 日勤
+    LATE = 3               # 遅番
+    NIGHT = 4              # 夜勤
+    NIGHT_REST = 5         # 明け
+    OFF = 6                # 公休
+    PAID = 7               # 有休
+    REFRESH = 8            # リフレッシュ休暇
+
+    KIND_MASK = 0x0F       # シフト種別部分
+    HOPE = 0x10            # 希望休ビット
+    HOPE_OFF = OFF | HOPE  # 希望休
+
+    # コードの総数（ルックアップテーブルのサイズ）
+    SIZE = 0x20
+
+    # グループ定義（種別コード）
+    DAY_SHIFTS = (EARLY, DAY, LATE)
+    WORK_SHIFTS = (EARLY, DAY, LATE, NIGHT, NIGHT_REST)
+    REST_SHIFTS = (OFF, PAID, REFRESH)
+    NIGHT_SHIFTS = (NIGHT, NIGHT_REST)
+
+    # 集計用のグループ（HOPEビット付きのコードを含む）
+    OFF_CODES = (OFF, HOPE_OFF)                  # 公休（希望休含む）
+    REQUIRED_OFF_CODES = (HOPE_OFF, PAID, REFRESH)  # 希望休・有休・リ休
+
+
+# 文字列との対応表
+_STR_TO_CODE = {
+    "": ShiftCode.EMPTY,
+    ShiftTypes.EARLY: ShiftCode.EARLY,
+    ShiftTypes.DAY: ShiftCode.DAY,
+    ShiftTypes.LATE: ShiftCode.LATE,
+    ShiftTypes.NIGHT: ShiftCode.NIGHT,
+    ShiftTypes.NIGHT_REST: ShiftCode.NIGHT_REST,
+    ShiftTypes.OFF: ShiftCode.OFF,
+    ShiftTypes.HOPE_OFF: ShiftCode.HOPE_OFF,
+    ShiftTypes.PAID: ShiftCode.PAID,
+    ShiftTypes.REFRESH: ShiftCode.REFRESH,
+}
+_CODE_TO_STR = {code: s for s, code in _STR_TO_CODE.items()}
+
+
+def _lookup(kinds) -> tuple:
+    """種別コードの集合から、全コード（HOPEビット込み）を引けるテーブルを作る"""
+    return tuple((code & ShiftCode.KIND_MASK) in kinds for code in range(ShiftCode.SIZE))
+
+
+# コードで直接引ける判定テーブル（HOPEビットの有無を問わない）
+IS_DAY_SHIFT = _lookup(ShiftCode.DAY_SHIFTS)
+IS_WORK_SHIFT = _lookup(ShiftCode.WORK_SHIFTS)
+IS_REST_SHIFT = _lookup(ShiftCode.REST_SHIFTS)
+
+
+def encode_shift(value: str) -> int:
+    """
+    シフト文字列をコードに変換
+
+    未知の文字列は未配置（EMPTY）として扱う。
+    """
+    return _STR_TO_CODE.get(value, ShiftCode.EMPTY)
+
+
+def decode_shift(code: int) -> str:
+    """コードをシフト文字列に変換"""
+    return _CODE_TO_STR[code]
+
+
+# =============================================================================
+# セルフラグ
+# =============================================================================
+
+class CellFlag:
+    """セルの由来フラグ"""
+    FIXED = 0x01       # 固定（後のフェーズで変更しない）
+    REQUESTED = 0x02   # スタッフの希望による配置
+
+
+# =============================================================================
+# 連勤インデックス
+# =============================================================================
+
+_NIGHT_CODES = (ShiftCode.NIGHT, ShiftCode.NIGHT_REST)
+
+# 連勤インデックス上の分類（bit0: 勤務, bit1: 日勤帯, bit2: 夜勤・明け）。
+# 分類が同じコード間の書き換えではインデックスの更新は不要
+RUN_CLASS = tuple(IS_WORK_SHIFT[c] | IS_DAY_SHIFT[c] << 1 | (c in _NIGHT_CODES) << 2
+                  for c in range(ShiftCode.SIZE))
+
+# 連続区間の状態は1つの整数にまとめる
+#   bit0-4: 勤務シフトの連続日数, bit5-9: 日勤帯シフトの連続日数, bit10: 夜勤・明けを含む
+# 日数はRUN_MAX_LENで頭打ちにする（ルール判定に必要なのは数日分のみ）
+RUN_MAX_LEN = 31
+RUN_DAY_SHIFT = 5
+RUN_NIGHT_SHIFT = 10
+_RUN_STATES = 1 << 11
+
+
+def pack_run(work: int, day: int, night: bool) -> int:
+    """連続区間の状態を整数にまとめる"""
+    return (min(work, RUN_MAX_LEN) | min(day, RUN_MAX_LEN) << RUN_DAY_SHIFT
+            | int(night) << RUN_NIGHT_SHIFT)
+
+
+def _run_step(run_class: int, state: int) -> int:
+    """区間を1日延ばしたときの状態（区間の端の日の分類から計算）"""
+    work = state & RUN_MAX_LEN
+    day = state >> RUN_DAY_SHIFT & RUN_MAX_LEN
+    night = state >> RUN_NIGHT_SHIFT
+    if run_class & 1:
+        work, night = work + 1, bool(run_class & 4 or night)
+    else:
+        work, night = 0, False
+    day = day + 1 if run_class & 2 else 0
+    return pack_run(work, day, night)
+
+
+# 状態遷移表: _RUN_STEP[_RUN_STEP_OFFSET[code] + state]
+_RUN_STEP = [_run_step(c, st) for c in range(8) for st in range(_RUN_STATES)]
+_RUN_STEP_OFFSET = tuple(RUN_CLASS[c] * _RUN_STATES for c in range(ShiftCode.SIZE))
+
+
+class RunIndex:
+    """
+    1スタッフ分の連勤インデックス
+
+    2つの配列（長さ days + 1）に連続区間の状態（pack_run()形式）を保持する。
+    - back[d]: d日目の前日で終わる連続区間（[0]は前月末時点の状態）
+    - fwd[d]: d日目から始まる連続区間（[days]は月末の外側で空）
+
+    勤務シフトの区間は前月からの連勤数を含み、日勤帯の区間は前月末が日勤帯の場合のみ含む。
+    セル更新時はupdate()で値が変わる範囲だけを更新する。
+    連続区間は短いため、1回の更新は区間長程度の手間で済む。
+    """
+    __slots__ = ("back", "fwd")
+
+    def __init__(self, back: List[int], fwd: List[int]):
+        self.back = back
+        self.fwd = fwd
+
+    @classmethod
+    def build(cls, row, prev_code: int, prev_streak: int) -> "RunIndex":
+        """
+        行全体からインデックスを作成
+
+        Args:
+            row: スタッフの行（シフトコードの列）
+            prev_code: 前月末シフトの種別コード
+            prev_streak: 前月末時点の連勤数
+        """
+        days = len(row)
+        back = [0] * (days + 1)
+        back[0] = pack_run(prev_streak, prev_streak if IS_DAY_SHIFT[prev_code] else 0,
+                           prev_code in _NIGHT_CODES)
+        index = cls(back, [0] * (days + 1))
+        index.update(row, 0, days - 1)
+        return index
+
+    def copy(self) -> "RunIndex":
+        """インデックスを複製する"""
+        return RunIndex(self.back[:], self.fwd[:])
+
+    def update(self, row, first: int, last: Optional[int] = None) -> None:
+        """
+        first〜last日目のセルが変わった後にインデックスを更新する
+
+        状態が変わらなくなった時点で伝播を打ち切る。
+        """
+        if last is None:
+            last = first
+        step, offset = _RUN_STEP, _RUN_STEP_OFFSET
+
+        # 前日までの区間は翌日以降へ伝播する
+        back = self.back
+        for j in range(first, len(row)):
+            state = step[offset[row[j]] + back[j]]
+            if j > last and state == back[j + 1]:
+                break
+            back[j + 1] = state
+
+        # 当日からの区間は前日以前へ伝播する
+        fwd = self.fwd
+        for j in range(last, -1, -1):
+            state = step[offset[row[j]] + fwd[j + 1]]
+            if j < first and state == fwd[j]:
+                break
+            fwd[j] = state
+
+
+# =============================================================================
+# シフト表
+# =============================================================================
+
+class ShiftGrid:
+    """
+    スタッフ×日のシフト表
+
+    Attributes:
+        n_staff: スタッフ数
+        days: 月の日数
+        cells: シフトコードの配列（staff_idx * days + day_idx）
+        flags: セルフラグの配列（cellsと同じ並び）
+        rows: スタッフごとの読み取り専用ビュー（rows[staff_idx][day_idx]）
+        day_counts: 日ごと・コードごとの人数（day_idx * ShiftCode.SIZE + code）
+        runs: スタッフごとの連勤インデックス（ShiftRuleCheckerが作成。未作成ならNone）
+
+    書き込みは必ずset()を通すこと（day_counts・runsをセルと同期させるため）。
+    """
+    __slots__ = ("n_staff", "days", "cells", "flags", "rows", "day_counts", "runs")
+
+    def __init__(self, n_staff: int, days: int, cells: Optional[bytearray] = None,
+                 flags: Optional[bytearray] = None, day_counts: Optional[List[int]] = None):
+        """
+        Args:
+            n_staff: スタッフ数
+            days: 月の日数
+            cells: シフトコードの配列（省略時は全て未配置）
+            flags: セルフラグの配列（省略時は全てフラグなし）
+            day_counts: cellsと整合する日別人数（省略時はcellsから集計）
+        """
+        self.n_staff = n_staff
+        self.days = days
+        self.cells = cells if cells is not None else bytearray(n_staff * days)
+        self.flags = flags if flags is not None else bytearray(n_staff * days)
+        view = memoryview(self.cells).toreadonly()
+        self.rows = [view[i * days:(i + 1) * days] for i in range(n_staff)]
+        self.day_counts = day_counts if day_counts is not None else self._count_days()
+        self.runs: Optional[List[RunIndex]] = None
+
+    def _count_days(self) -> List[int]:
+        """セルから日別人数を集計する"""
+        counts = [0] * (self.days * ShiftCode.SIZE)
+        for k, code in enumerate(self.cells):
+            counts[(k % self.days) * ShiftCode.SIZE + code] += 1
+        return counts
+
+    def __reduce__(self):
+        # memoryviewはpickleできないため、配列から作り直す（連勤インデックスは再作成させる）
+        return (ShiftGrid, (self.n_staff, self.days, self.cells, self.flags, self.day_counts))
+
+    def copy(self) -> "ShiftGrid":
+        """
+        シフト表を複製する
+
+        フラグはPhase 2（固定・希望の設定）以降変更しないため、複製せず共有する。
+        """
+        grid = ShiftGrid(self.n_staff, self.days, bytearray(self.cells), self.flags,
+                         self.day_counts[:])
+        if self.runs is not None:
+            grid.runs = [r.copy() for r in self.runs]
+        return grid
+
+    # -------------------------------------------------------------------------
+    # セル操作
+    # -------------------------------------------------------------------------
+
+    def get(self, staff_idx: int, day_idx: int) -> int:
+        """セルのコードを取得"""
+        return self.cells[staff_idx * self.days + day_idx]
+
+    def set(self, staff_idx: int, day_idx: int, code: int) -> None:
+        """セルのコードを設定（日別人数も更新する）"""
+        k = staff_idx * self.days + day_idx
+        old = self.cells[k]
+        if old == code:
+            return
+        self.cells[k] = code
+        base = day_idx * ShiftCode.SIZE
+        counts = self.day_counts
+        counts[base + old] -= 1
+        counts[base + code] += 1
+        if self.runs is not None and RUN_CLASS[old] != RUN_CLASS[code]:
+            self.runs[staff_idx].update(self.rows[staff_idx], day_idx)
+
+    def has_flag(self, staff_idx: int, day_idx: int, flag: int) -> bool:
+        """セルにフラグが立っているか"""
+        return bool(self.flags[staff_idx * self.days + day_idx] & flag)
+
+    def add_flag(self, staff_idx: int, day_idx: int, flag: int) -> None:
+        """セルにフラグを立てる"""
+        self.flags[staff_idx * self.days + day_idx] |= flag
+
+    def is_fixed(self, staff_idx: int, day_idx: int) -> bool:
+        """固定セルかどうか"""
+        return bool(self.flags[staff_idx * self.days + day_idx] & CellFlag.FIXED)
+
+    # -------------------------------------------------------------------------
+    # 集計
+    # -------------------------------------------------------------------------
+
+    def count_in_row(self, staff_idx: int, codes: Tuple[int, ...]) -> int:
+        """スタッフの行に含まれる指定コード（いずれか）の数"""
+        start = staff_idx * self.days
+        end = start + self.days
+        cells = self.cells
+        return sum(cells.count(code, start, end) for code in codes)
+
+    def count_in_column(self, day_idx: int, codes: Tuple[int, ...]) -> int:
+        """指定日に指定コード（いずれか）が入っているスタッフの数（O(1)）"""
+        base = day_idx * ShiftCode.SIZE
+        counts = self.day_counts
+        total = 0
+        for code in codes:
+            total += counts[base + code]
+        return total
+
+    # -------------------------------------------------------------------------
+    # 文字列表現との変換
+    # -------------------------------------------------------------------------
+
+    def to_dict(self, names: List[str]) -> Dict[str, List[str]]:
+        """{スタッフ名: [日1, 日2, ...]} 形式に変換"""
+        return {name: [_CODE_TO_STR[c] for c in self.rows[i]] for i, name in enumerate(names)}
+
+    @classmethod
+    def from_dict(cls, schedule: Dict[str, List[str]], names: List[str],
+                  days: int) -> "ShiftGrid":
+        """{スタッフ名: [日1, 日2, ...]} 形式から作成（フラグなし）"""
+        grid = cls(len(names), days)
+        for i, name in enumerate(names):
+            for d, value in enumerate(schedule[name][:days]):
+                grid.set(i, d, encode_shift(value))
+        return grid
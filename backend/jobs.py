@@ -0,0 +1,182 @@
+"""
+Solve Jobs - 非同期シフト作成ジョブ管理
+Version: 2.1.0
+
+シフト作成リクエストをジョブとして受け付け、SolveExecutorのプロセスプールで
+バックグラウンド実行する。終了したジョブの結果は保持期間が過ぎるまで残し、
+ポーリングで取得できるようにする。
+"""
+import asyncio
+import time
+import uuid
+from typing import Dict, Optional
+
+from .models import ShiftRequest, ShiftResponse, JobStatus, SolveJobResponse
+from .executor import SolveExecutor
+from .solver import SolveCancelled
+
+
+class SolveJob:
+    """
+    1件のシフト作成ジョブ
+
+    Attributes:
+        job_id: ジョブID
+        request: シフト作成リクエスト
+        status: ジョブ状態（JobStatus）
+        progress: ワーカープロセスと共有する進捗辞書
+        cancel_event: ワーカープロセスと共有するキャンセル用イベント
+        result: 完了時のレスポンス
+        error: 失敗時のエラーメッセージ
+    """
+
+    def __init__(self, job_id: str, request: ShiftRequest, progress, cancel_event):
+        self.job_id = job_id
+        self.request = request
+        self.status = JobStatus.QUEUED
+        self.progress = progress
+        self.cancel_event = cancel_event
+        self.result: Optional[ShiftResponse] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def is_finished(self) -> bool:
+        """終了状態かどうか"""
+        return self.status in JobStatus.FINISHED
+
+    def _progress_snapshot(self) -> Dict:
+        """進捗辞書の内容を取得"""
+        return dict(self.progress) if self.progress is not None else {}
+
+    def finish(self, status: str) -> None:
+        """ジョブを終了状態にし、進捗を確定させる"""
+        self.status = status
+        self.finished_at = time.time()
+        # 共有辞書はマネージャーのリソースを使うため、通常の辞書に置き換える
+        self.progress = self._progress_snapshot()
+
+    def to_response(self) -> SolveJobResponse:
+        """APIレスポンス形式に変換"""
+        progress = self._progress_snapshot()
+        status = self.status
+        # ワーカーが進捗を書き込んでいれば実行中
+        if status == JobStatus.QUEUED and progress:
+            status = JobStatus.RUNNING
+
+        return SolveJobResponse(
+            job_id=self.job_id,
+            status=status,
+            attempts=progress.get("attempts", 0),
+            max_attempts=self.request.max_attempts,
+            best_score=progress.get("best_score"),
+            penalties=progress.get("penalties", {}),
+            result=self.result,
+            error=self.error,
+            created_at=self.created_at,
+            finished_at=self.finished_at
+        )
+
+
+class JobManager:
+    """
+    シフト作成ジョブの管理
+
+    終了したジョブはretention_seconds経過後、次回の操作時に破棄される。
+    """
+
+    def __init__(self, executor: SolveExecutor, retention_seconds: float = 3600):
+        """
+        Args:
+            executor: ジョブを実行するSolveExecutor
+            retention_seconds: 終了したジョブの結果を保持する秒数
+        """
+        self.executor = executor
+        self.retention_seconds = retention_seconds
+        self._jobs: Dict[str, SolveJob] = {}
+
+    def submit(self, request: ShiftRequest) -> SolveJob:
+        """
+        ジョブを登録してバックグラウンド実行を開始する
+
+        Args:
+            request: シフト作成リクエスト
+
+        Returns:
+            登録したジョブ
+        """
+        self.purge_expired()
+
+        job = SolveJob(uuid.uuid4().hex, request, self.executor.create_progress(),
+                       self.executor.create_event())
+        job.task = asyncio.create_task(self._run(job))
+        self._jobs[job.job_id] = job
+        return job
+
+    async def _run(self, job: SolveJob) -> None:
+        """ジョブを実行して結果を記録する"""
+        try:
+            result = await self.executor.run(job.request, job.progress.update,
+                                             cancel_event=job.cancel_event)
+        except (asyncio.CancelledError, SolveCancelled):
+            if not job.is_finished:
+                job.finish(JobStatus.CANCELLED)
+            return
+        except Exception as e:
+            if not job.is_finished:
+                job.error = f"エラーが発生しました: {str(e)}"
+                job.finish(JobStatus.FAILED)
+            return
+
+        if job.is_finished:
+            # 計算完了と同時にキャンセルされた場合
+            return
+        if result is None:
+            job.error = "シフトの作成に失敗しました"
+            job.finish(JobStatus.FAILED)
+        else:
+            job.result = result
+            job.finish(JobStatus.DONE)
+
+    def get(self, job_id: str) -> Optional[SolveJob]:
+        """ジョブを取得（存在しない・期限切れの場合はNone）"""
+        self.purge_expired()
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[SolveJob]:
+        """
+        ジョブをキャンセルする
+
+        実行待ち・実行中のジョブはキャンセル状態にしてソルバーに中断を通知し、
+        終了済みのジョブは結果を破棄する。
+
+        Returns:
+            対象のジョブ（存在しない場合はNone）
+        """
+        job = self.get(job_id)
+        if job is None:
+            return None
+
+        if job.is_finished:
+            del self._jobs[job_id]
+        else:
+            # ソルバーは次の試行・フェーズの区切りで中断し、プールの枠を解放する
+            job.cancel_event.set()
+            job.finish(JobStatus.CANCELLED)
+        return job
+
+    def cancel_all(self) -> None:
+        """実行待ち・実行中の全ジョブをキャンセルする（終了処理用）"""
+        for job_id, job in list(self._jobs.items()):
+            if not job.is_finished:
+                self.cancel(job_id)
+
+    def purge_expired(self) -> None:
+        """保持期間を過ぎた終了済みジョブを破棄する"""
+        now = time.time()
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.is_finished and now - job.finished_at > self.retention_seconds]
+        for job_id in expired:
+            del self._jobs[job_id]
@@ -0,0 +1,139 @@
+"""
+Large Neighbourhood Search - 破壊と再構築による改善
+Version: 2.1.0
+
+最良のスケジュールの一部（連続した数日分、または数人分の行）を空に戻し、
+ShiftSolverの構築フェーズ（夜勤・早番遅番・日勤・公休の配置）で埋め直す。
+構築フェーズは空のセルだけを埋めるため、再構築は空に戻した範囲にしか及ばない。
+スコアが下がらなければ置き換える。固定セルとパートスタッフの行は空に戻さない。
+"""
+import random
+import time
+from typing import List, Tuple, Optional, Callable, TYPE_CHECKING
+
+from .grid import ShiftCode, ShiftGrid
+
+if TYPE_CHECKING:
+    from .solver import ShiftSolver
+
+
+# =============================================================================
+# 定数定義
+# =============================================================================
+
+class LNSConfig:
+    """破壊と再構築の設定値"""
+    WINDOW_MIN_DAYS = 3       # 空に戻す期間の最短日数
+    WINDOW_MAX_DAYS = 7       # 空に戻す期間の最長日数
+    STAFF_DESTROY_RATIO = 0.3  # 期間ではなくスタッフの行を空に戻す割合
+    MAX_DESTROY_STAFF = 3     # 一度に空に戻すスタッフの最大人数
+
+
+class LargeNeighbourhoodSearch:
+    """
+    破壊と再構築による局所探索
+
+    使い方:
+        lns = LargeNeighbourhoodSearch(solver)
+        best_grid, best_score = lns.run(grid, score, iterations=200)
+    """
+
+    def __init__(self, solver: "ShiftSolver"):
+        """
+        Args:
+            solver: 構築フェーズとスコア計算に使うソルバー
+        """
+        self.solver = solver
+
+    def run(self, grid: ShiftGrid, score: int, iterations: Optional[int] = None,
+            deadline: Optional[float] = None,
+            should_stop: Optional[Callable[[], bool]] = None) -> Tuple[ShiftGrid, int]:
+        """
+        破壊と再構築を繰り返す
+
+        Args:
+            grid: 改善対象のシフト表（変更しない）
+            score: gridのスコア
+            iterations: 再構築の回数の上限
+            deadline: 終了時刻（time.monotonic()基準）
+            should_stop: 反復ごとに呼ばれる中断判定関数
+
+        Returns:
+            (best_grid, best_score)
+        """
+        solver = self.solver
+        if not solver.regular_idx or (iterations is None and deadline is None):
+            return grid, score
+
+        iteration = 0
+        while iterations is None or iteration < iterations:
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            if should_stop is not None and should_stop():
+                break
+            if score == 0:
+                break  # これ以上改善できない
+            iteration += 1
+
+            candidate = grid.copy()
+            if random.random() < LNSConfig.STAFF_DESTROY_RATIO:
+                count = min(LNSConfig.MAX_DESTROY_STAFF, len(solver.regular_idx))
+                self._destroy_staff(candidate, random.sample(solver.regular_idx, count))
+            else:
+                length = min(random.randint(LNSConfig.WINDOW_MIN_DAYS, LNSConfig.WINDOW_MAX_DAYS),
+                             solver.days)
+                first = random.randrange(solver.days - length + 1)
+                self._destroy_days(candidate, first, first + length - 1)
+            self._repair(candidate)
+
+            # 同点も受け入れて探索範囲を広げる
+            candidate_score = solver._calc_score(candidate)
+            if candidate_score >= score:
+                grid, score = candidate, candidate_score
+
+        return grid, score
+
+    # -------------------------------------------------------------------------
+    # 破壊
+    # -------------------------------------------------------------------------
+
+    def _clear(self, grid: ShiftGrid, staff_idx: int, day_idx: int) -> None:
+        """固定されていないセルを空に戻す"""
+        if not grid.is_fixed(staff_idx, day_idx):
+            grid.set(staff_idx, day_idx, ShiftCode.EMPTY)
+
+    def _destroy_days(self, grid: ShiftGrid, first: int, last: int) -> None:
+        """全常勤スタッフのfirst〜last日目を空に戻す"""
+        days = grid.days
+        for i in self.solver.regular_idx:
+            row = grid.rows[i]
+            # 期間の境目で夜勤と明けが分かれないように広げる
+            start = first
+            if row[start] == ShiftCode.NIGHT_REST and start > 0 and row[start - 1] == ShiftCode.NIGHT:
+                start -= 1
+            end = last
+            if row[end] == ShiftCode.NIGHT and end + 1 < days and row[end + 1] == ShiftCode.NIGHT_REST:
+                end += 1
+            for d in range(start, end + 1):
+                self._clear(grid, i, d)
+
+    def _destroy_staff(self, grid: ShiftGrid, staff: List[int]) -> None:
+        """指定スタッフの行全体を空に戻す"""
+        for i in staff:
+            for d in range(grid.days):
+                self._clear(grid, i, d)
+
+    # -------------------------------------------------------------------------
+    # 再構築
+    # -------------------------------------------------------------------------
+
+    def _repair(self, grid: ShiftGrid) -> None:
+        """空のセルを構築フェーズで埋める"""
+        solver = self.solver
+        night_counts = [grid.count_in_row(i, (ShiftCode.NIGHT,)) for i in range(grid.n_staff)]
+        solver._phase3_daily_night(grid, night_counts)
+        solver._phase4_early_late(grid)
+        solver._phase5_fill_day(grid)
+        solver._phase6_fill_off(grid)
+        solver._phase6b_fill_remaining_with_day(grid)
+        solver._phase_final_cleanup(grid)
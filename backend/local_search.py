@@ -0,0 +1,313 @@
+"""
+Local Search - 焼きなまし法・タブー探索による改善
+Version: 2.1.0
+
+構築フェーズで得たスケジュールを、ルールを守る小さな変更の繰り返しで改善する。
+
+変更の種類:
+- 行内の入れ替え: 同じスタッフの日勤(日)と公休(◎)を入れ替える
+- 1セルの書き換え: 日勤と公休を入れ替えずに書き換える（公休数の過不足を直す）
+- 列内の入れ替え: 同じ日の2人のスタッフで早番・遅番と他の日勤帯シフトを入れ替える
+
+変更のスコア増分はScoreEvaluatorで差分評価する。適用した変更はShiftRuleCheckerで検証し、
+ルール違反なら取り消す。固定セルとパートスタッフの行は変更しない。
+
+- SimulatedAnnealing: 悪化する変更も温度に応じた確率で受理する
+- TabuSearch: 変更候補の中で最良のものを適用し、最近変更したセルの再変更を禁止する
+"""
+import math
+import random
+import time
+from typing import List, Tuple, Optional, Callable
+
+from .grid import ShiftCode, ShiftGrid, IS_DAY_SHIFT
+from .rules import ShiftRuleChecker
+from .scoring import ScoreEvaluator, Change
+
+
+# =============================================================================
+# 定数定義
+# =============================================================================
+
+class AnnealConfig:
+    """焼きなまし設定値"""
+    INITIAL_TEMPERATURE = 200.0  # 開始温度（公休1日分の差異ペナルティ程度）
+    FINAL_TEMPERATURE = 1.0      # 終了温度
+    FLIP_MOVE_RATIO = 0.2        # 変更候補のうち1セルの書き換えの割合
+    ROW_MOVE_RATIO = 0.4         # 変更候補のうち行内の入れ替えの割合
+    CHECK_INTERVAL = 64          # 時間・中断判定と温度更新の間隔（反復回数）
+
+
+class TabuConfig:
+    """タブー探索設定値"""
+    SAMPLE_SIZE = 60             # 1反復で評価する変更候補の数
+    TENURE_MIN = 7               # 変更したセルを禁止する反復回数（最小）
+    TENURE_MAX = 15              # 変更したセルを禁止する反復回数（最大）
+    PROGRESS_INTERVAL = 50       # 進捗通知の間隔（反復回数）
+
+
+_DAY = ShiftCode.DAY
+_OFF = ShiftCode.OFF
+_EARLY_LATE = (ShiftCode.EARLY, ShiftCode.LATE)
+
+# 変更の種類
+_MOVE_FLIP = 0
+_MOVE_ROW = 1
+_MOVE_COLUMN = 2
+
+
+# =============================================================================
+# 変更候補の生成
+# =============================================================================
+
+class _MoveSearch:
+    """変更候補の生成と検証（各探索法の共通部分）"""
+
+    def __init__(self, rule_checker: ShiftRuleChecker, regular_idx: List[int]):
+        """
+        Args:
+            rule_checker: ルールチェッカー
+            regular_idx: 変更対象とする常勤スタッフのインデックス
+        """
+        self.rule_checker = rule_checker
+        self.regular_idx = regular_idx
+
+    def _propose(self, grid: ShiftGrid, kind: int) -> Optional[Tuple[Change, ...]]:
+        """指定した種類の変更候補を1つ作る（見つからなければNone）"""
+        if kind == _MOVE_FLIP:
+            return self._propose_flip(grid)
+        if kind == _MOVE_ROW:
+            return self._propose_row_swap(grid)
+        return self._propose_column_swap(grid)
+
+    def _propose_flip(self, grid: ShiftGrid) -> Optional[Tuple[Change]]:
+        """日勤を公休に、または公休を日勤に書き換える候補（見つからなければNone）"""
+        staff_idx = random.choice(self.regular_idx)
+        day_idx = random.randrange(grid.days)
+        code = grid.rows[staff_idx][day_idx]
+        if code != _DAY and code != _OFF:
+            return None
+        if grid.is_fixed(staff_idx, day_idx):
+            return None
+        return ((staff_idx, day_idx, _OFF if code == _DAY else _DAY),)
+
+    def _propose_row_swap(self, grid: ShiftGrid) -> Optional[Tuple[Change, Change]]:
+        """同じスタッフの日勤と公休を入れ替える候補（見つからなければNone）"""
+        staff_idx = random.choice(self.regular_idx)
+        day1 = random.randrange(grid.days)
+        day2 = random.randrange(grid.days)
+        row = grid.rows[staff_idx]
+        pair = (row[day1], row[day2])
+        if pair != (_DAY, _OFF) and pair != (_OFF, _DAY):
+            return None
+        if grid.is_fixed(staff_idx, day1) or grid.is_fixed(staff_idx, day2):
+            return None
+        return (staff_idx, day1, pair[1]), (staff_idx, day2, pair[0])
+
+    def _propose_column_swap(self, grid: ShiftGrid) -> Optional[Tuple[Change, Change]]:
+        """同じ日の早番・遅番と他の日勤帯シフトを2人で入れ替える候補"""
+        day_idx = random.randrange(grid.days)
+        holders = [i for i in self.regular_idx
+                   if grid.rows[i][day_idx] in _EARLY_LATE and not grid.is_fixed(i, day_idx)]
+        if not holders:
+            return None
+        staff1 = random.choice(holders)
+        staff2 = random.choice(self.regular_idx)
+        code1 = grid.rows[staff1][day_idx]
+        code2 = grid.rows[staff2][day_idx]
+        if code1 == code2 or not IS_DAY_SHIFT[code2] or grid.is_fixed(staff2, day_idx):
+            return None
+        return (staff1, day_idx, code2), (staff2, day_idx, code1)
+
+    def _try_apply(self, evaluator: ScoreEvaluator, move: Tuple[Change, ...]) -> bool:
+        """
+        変更を適用し、ルール違反なら取り消す
+
+        Returns:
+            適用したかどうか
+        """
+        grid = evaluator.grid
+        undo = tuple((staff_idx, day_idx, grid.get(staff_idx, day_idx))
+                     for staff_idx, day_idx, _ in move)
+        evaluator.apply(move)
+        for staff_idx, day_idx, code in move:
+            if not self.rule_checker.check_rules(staff_idx, day_idx, grid, code):
+                evaluator.apply(undo)
+                return False
+        return True
+
+
+# =============================================================================
+# 焼きなまし法
+# =============================================================================
+
+class SimulatedAnnealing(_MoveSearch):
+    """
+    焼きなまし法による局所探索
+
+    使い方:
+        annealer = SimulatedAnnealing(rule_checker, regular_idx)
+        best_grid, best_score = annealer.run(evaluator, iterations=100000)
+    """
+
+    def run(self, evaluator: ScoreEvaluator, iterations: Optional[int] = None,
+            deadline: Optional[float] = None,
+            should_stop: Optional[Callable[[], bool]] = None) -> Tuple[ShiftGrid, int]:
+        """
+        焼きなましを実行する
+
+        evaluator.gridを直接書き換える。反復回数・時刻のどちらかに達した時点で終了し、
+        途中で見つかった最良のスケジュールを返す。
+
+        Args:
+            evaluator: 改善対象のシフト表を持つ差分評価オブジェクト
+            iterations: 変更候補の評価回数の上限
+            deadline: 終了時刻（time.monotonic()基準）
+            should_stop: CHECK_INTERVAL回ごとに呼ばれる中断判定関数
+
+        Returns:
+            (best_grid, best_score)
+        """
+        grid = evaluator.grid
+        best_grid = grid.copy()
+        best_score = evaluator.score
+        if not self.regular_idx or (iterations is None and deadline is None):
+            return best_grid, best_score
+
+        start = time.monotonic()
+        duration = deadline - start if deadline is not None else None
+        temperature = AnnealConfig.INITIAL_TEMPERATURE
+        cooling = AnnealConfig.FINAL_TEMPERATURE / AnnealConfig.INITIAL_TEMPERATURE
+
+        iteration = 0
+        while iterations is None or iteration < iterations:
+            if iteration % AnnealConfig.CHECK_INTERVAL == 0:
+                # 進み具合（反復回数・経過時間の大きい方）に応じて温度を下げる
+                progress = iteration / iterations if iterations else 0.0
+                if duration is not None:
+                    now = time.monotonic()
+                    if now >= deadline:
+                        break
+                    progress = max(progress, (now - start) / duration if duration > 0 else 1.0)
+                if should_stop is not None and should_stop():
+                    break
+                temperature = AnnealConfig.INITIAL_TEMPERATURE * cooling ** min(progress, 1.0)
+            iteration += 1
+
+            r = random.random()
+            if r < AnnealConfig.FLIP_MOVE_RATIO:
+                move = self._propose_flip(grid)
+            elif r < AnnealConfig.FLIP_MOVE_RATIO + AnnealConfig.ROW_MOVE_RATIO:
+                move = self._propose_row_swap(grid)
+            else:
+                move = self._propose_column_swap(grid)
+            if move is None:
+                continue
+
+            delta = evaluator.delta(move)
+            if delta < 0 and random.random() >= math.exp(delta / temperature):
+                continue
+
+            if not self._try_apply(evaluator, move):
+                continue
+
+            if evaluator.score > best_score:
+                best_score = evaluator.score
+                best_grid = grid.copy()
+                if best_score == 0:
+                    break  # これ以上改善できない
+
+        return best_grid, best_score
+
+
+# =============================================================================
+# タブー探索
+# =============================================================================
+
+class TabuSearch(_MoveSearch):
+    """
+    タブー探索
+
+    各反復で変更候補をSAMPLE_SIZE個作り、スコア増分の大きい順に適用を試みる
+    （悪化する変更でも最良のものを適用する）。変更したセルはTENURE_MIN〜TENURE_MAX反復の間
+    タブー（再変更禁止）とする。ただし、これまでの最良スコアを上回る変更はタブーでも適用する
+    （アスピレーション基準）。
+
+    使い方:
+        tabu = TabuSearch(rule_checker, regular_idx)
+        best_grid, best_score = tabu.run(evaluator, iterations=2500)
+    """
+
+    def run(self, evaluator: ScoreEvaluator, iterations: Optional[int] = None,
+            deadline: Optional[float] = None,
+            should_stop: Optional[Callable[[], bool]] = None,
+            progress_callback: Optional[Callable[[int, ShiftGrid, int, bool], None]] = None
+            ) -> Tuple[ShiftGrid, int, int]:
+        """
+        タブー探索を実行する
+
+        evaluator.gridを直接書き換える。
+
+        Args:
+            evaluator: 改善対象のシフト表を持つ差分評価オブジェクト
+            iterations: 反復回数の上限
+            deadline: 終了時刻（time.monotonic()基準）
+            should_stop: 反復ごとに呼ばれる中断判定関数
+            progress_callback: 最良スコア更新時とPROGRESS_INTERVAL反復ごとに
+                               (反復回数, 最良スケジュール, 最良スコア, 更新したか) で呼ばれる
+
+        Returns:
+            (best_grid, best_score, 完了した反復回数)
+        """
+        grid = evaluator.grid
+        best_grid = grid.copy()
+        best_score = evaluator.score
+        if not self.regular_idx or (iterations is None and deadline is None):
+            return best_grid, best_score, 0
+
+        days = grid.days
+        tabu_until = [0] * (grid.n_staff * days)
+
+        iteration = 0
+        while iterations is None or iteration < iterations:
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            if should_stop is not None and should_stop():
+                break
+            if best_score == 0:
+                break  # これ以上改善できない
+            iteration += 1
+
+            # 変更候補を作り、スコア増分の大きい順に並べる
+            candidates = []
+            for _ in range(TabuConfig.SAMPLE_SIZE):
+                move = self._propose(grid, random.randrange(3))
+                if move is not None:
+                    candidates.append((evaluator.delta(move), move))
+            candidates.sort(key=lambda c: -c[0])
+
+            improved = False
+            for delta, move in candidates:
+                is_tabu = any(tabu_until[staff_idx * days + day_idx] >= iteration
+                              for staff_idx, day_idx, _ in move)
+                aspiration = evaluator.score + delta > best_score
+                if is_tabu and not aspiration:
+                    continue
+                if not self._try_apply(evaluator, move):
+                    continue
+
+                tenure = iteration + random.randint(TabuConfig.TENURE_MIN, TabuConfig.TENURE_MAX)
+                for staff_idx, day_idx, _ in move:
+                    tabu_until[staff_idx * days + day_idx] = tenure
+
+                if evaluator.score > best_score:
+                    best_score = evaluator.score
+                    best_grid = grid.copy()
+                    improved = True
+                break
+
+            if progress_callback is not None and (
+                    improved or iteration % TabuConfig.PROGRESS_INTERVAL == 0):
+                progress_callback(iteration, best_grid, best_score, improved)
+
+        return best_grid, best_score, iteration
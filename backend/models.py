@@ -5,8 +5,8 @@ Version: 2.1.0
 このモジュールはAPIのリクエスト/レスポンスモデルと
 シフト種別の定数を定義します。
 """
-from pydantic import BaseModel, Field
-from typing import List, Dict
+from pydantic import BaseModel, Field, field_validator
+from typing import List, Dict, Optional, Literal
 
 
 # =============================================================================
@@ -73,6 +73,57 @@ class ShiftTypes:
         return shift.strip() in cls.REST_SHIFTS
 
 
+# =============================================================================
+# ジョブ状態定数
+# =============================================================================
+
+class JobStatus:
+    """非同期ジョブの状態"""
+    QUEUED = "queued"          # 実行待ち
+    RUNNING = "running"        # 実行中
+    DONE = "done"              # 完了
+    FAILED = "failed"          # 失敗
+    CANCELLED = "cancelled"    # キャンセル済み
+    
+    # 終了状態
+    FINISHED = [DONE, FAILED, CANCELLED]
+
+
+class NightAssignment:
+    """夜勤の配置方法（Phase 3）"""
+    GREEDY = "greedy"  # 日ごとに目標との差が大きいスタッフを選ぶ（既定）
+    FLOW = "flow"      # 最小費用流による割り当て
+    
+    ALL = [GREEDY, FLOW]
+
+
+class EarlyLateAssignment:
+    """早番・遅番の配置方法（Phase 4）"""
+    GREEDY = "greedy"  # 日ごとにランダムな候補を選ぶ（既定）
+    FLOW = "flow"      # 月全体の最小費用流による割り当て
+    
+    ALL = [GREEDY, FLOW]
+
+
+class OffAssignment:
+    """公休の配置方法（Phase 6）"""
+    GREEDY = "greedy"  # スタッフごとに優先度の高い日から選ぶ（既定）
+    FLOW = "flow"      # 日勤帯人数を平準化する最小費用流による割り当て（日勤埋めの前に行う）
+    
+    ALL = [GREEDY, FLOW]
+
+
+class SolverEngine:
+    """探索エンジン"""
+    MULTISTART = "multistart"  # ランダムな構築の繰り返し（既定）
+    TABU = "tabu"              # タブー探索
+    EXACT = "exact"            # 制約モデルによる厳密解法
+    PORTFOLIO = "portfolio"    # 複数エンジンの同時実行
+    COLGEN = "colgen"          # 行の候補の組み合わせによる列生成
+    
+    ALL = [MULTISTART, TABU, EXACT, PORTFOLIO, COLGEN]
+
+
 # =============================================================================
 # Pydantic Models
 # =============================================================================
@@ -134,12 +185,63 @@ class ShiftRequest(BaseModel):
         target_off_days: 常勤スタッフの目標公休日数
         staff_data: スタッフ設定リスト
         max_attempts: 最大試行回数（最適解探索用）
+        workers: 並列ワーカープロセス数（1=逐次実行。APIでは実行プールの同時実行数が上限）
+        time_limit_ms: 計算時間の上限（ミリ秒）。超過時点の最良解を返す
+        anneal_iterations: 焼きなましによる改善の反復回数（0=行わない）
+        anneal_time_ms: 焼きなましによる改善の時間（ミリ秒）
+        lns_iterations: 破壊と再構築による改善の反復回数（0=行わない）
+        lns_time_ms: 破壊と再構築による改善の時間（ミリ秒）
+        engine: 探索エンジン（multistart=構築の繰り返し, tabu=タブー探索, exact=厳密解法,
+                portfolio=複数エンジンの同時実行, colgen=列生成。
+                register_engineで登録したエンジンの名前も指定できる）
+        night_assignment: 夜勤の配置方法（greedy=貪欲法, flow=最小費用流）
+        early_late_assignment: 早番・遅番の配置方法（greedy=貪欲法, flow=最小費用流）
+        off_assignment: 公休の配置方法（greedy=貪欲法, flow=最小費用流）
     """
     year: int = Field(ge=2025, le=2030, description="年")
     month: int = Field(ge=1, le=12, description="月")
     target_off_days: int = Field(ge=1, le=15, description="常勤スタッフの目標公休日数")
     staff_data: List[StaffData] = Field(description="スタッフ設定リスト")
     max_attempts: int = Field(default=2500, ge=1, le=10000, description="最大試行回数")
+    workers: int = Field(default=1, ge=1, le=64, description="並列ワーカープロセス数")
+    time_limit_ms: Optional[int] = Field(
+        default=None, ge=100, le=600000, description="計算時間の上限（ミリ秒）"
+    )
+    anneal_iterations: int = Field(
+        default=0, ge=0, le=10000000, description="焼きなましによる改善の反復回数"
+    )
+    anneal_time_ms: Optional[int] = Field(
+        default=None, ge=10, le=600000, description="焼きなましによる改善の時間（ミリ秒）"
+    )
+    lns_iterations: int = Field(
+        default=0, ge=0, le=100000, description="破壊と再構築による改善の反復回数"
+    )
+    lns_time_ms: Optional[int] = Field(
+        default=None, ge=10, le=600000, description="破壊と再構築による改善の時間（ミリ秒）"
+    )
+    engine: str = Field(
+        default=SolverEngine.MULTISTART,
+        description="探索エンジン: multistart / tabu / exact / portfolio / colgen（登録済みの名前）"
+    )
+    night_assignment: Literal["greedy", "flow"] = Field(
+        default=NightAssignment.GREEDY, description="夜勤の配置方法: greedy / flow"
+    )
+    early_late_assignment: Literal["greedy", "flow"] = Field(
+        default=EarlyLateAssignment.GREEDY, description="早番・遅番の配置方法: greedy / flow"
+    )
+    off_assignment: Literal["greedy", "flow"] = Field(
+        default=OffAssignment.GREEDY, description="公休の配置方法: greedy / flow"
+    )
+    
+    @field_validator("engine")
+    @classmethod
+    def check_engine(cls, value: str) -> str:
+        """登録済みの探索エンジン名か確認する（register_engineで追加したエンジンも指定できる）"""
+        # engines.py は models.py を参照するため、検証時に読み込む
+        from .engines import engine_names
+        if value not in engine_names():
+            raise ValueError(f"未知の探索エンジンです: {value}（{' / '.join(engine_names())}）")
+        return value
 
 
 class ShiftResponse(BaseModel):
@@ -152,9 +254,76 @@ class ShiftResponse(BaseModel):
         year: 対象年
         month: 対象月
         days: 月の日数
+        attempts: 完了した試行回数
+        early_exit: 早期終了条件（欠員なし・十分なスコア）を満たしたか
+        exact_status: 厳密解法の結果（engine=exact の場合のみ。
+                      optimal / feasible / infeasible / no_perfect / unknown）
     """
     schedule: Dict[str, List[str]] = Field(description="シフト表 {スタッフ名: [日1, 日2, ...]}")
     errors: List[str] = Field(default_factory=list, description="エラーメッセージのリスト")
     year: int = Field(description="対象年")
     month: int = Field(description="対象月")
     days: int = Field(description="月の日数")
+    attempts: int = Field(default=0, description="完了した試行回数")
+    early_exit: bool = Field(default=False, description="早期終了条件を満たしたか")
+    exact_status: Optional[str] = Field(default=None, description="厳密解法の結果（engine=exactの場合）")
+
+
+class FeasibilityResponse(BaseModel):
+    """
+    計算前の充足可能性の分析結果
+    
+    Attributes:
+        feasible: 解消できない欠員が見つからなかったか（Trueでも欠員のない解があるとは限らない）
+        issues: 解消できない欠員の説明
+        infeasible_days: 解消できない欠員がある日（1-indexed）
+        capacity: 日ごとの空いている常勤スタッフのセルの数
+        demand: 日ごとに空いているセルで埋める必要がある人数
+        max_nights: 追加で配置できる夜勤の日数の上限
+        year: 対象年
+        month: 対象月
+        days: 月の日数
+    """
+    feasible: bool = Field(description="解消できない欠員が見つからなかったか")
+    issues: List[str] = Field(default_factory=list, description="解消できない欠員の説明")
+    infeasible_days: List[int] = Field(
+        default_factory=list, description="解消できない欠員がある日（1-indexed）"
+    )
+    capacity: List[int] = Field(
+        default_factory=list, description="日ごとの空いている常勤スタッフのセルの数"
+    )
+    demand: List[int] = Field(
+        default_factory=list, description="日ごとに空いているセルで埋める必要がある人数"
+    )
+    max_nights: int = Field(default=0, description="追加で配置できる夜勤の日数の上限")
+    year: int = Field(description="対象年")
+    month: int = Field(description="対象月")
+    days: int = Field(description="月の日数")
+
+
+class SolveJobResponse(BaseModel):
+    """
+    非同期シフト作成ジョブの状態
+    
+    Attributes:
+        job_id: ジョブID
+        status: ジョブ状態（queued/running/done/failed/cancelled）
+        attempts: 完了した試行回数
+        max_attempts: 最大試行回数
+        best_score: 現在の最良スコア
+        penalties: 最良スコアのペナルティ内訳
+        result: 完了時のシフト作成結果
+        error: 失敗時のエラーメッセージ
+        created_at: 受付日時（UNIX時刻）
+        finished_at: 終了日時（UNIX時刻）
+    """
+    job_id: str = Field(description="ジョブID")
+    status: str = Field(description="ジョブ状態")
+    attempts: int = Field(default=0, description="完了した試行回数")
+    max_attempts: int = Field(description="最大試行回数")
+    best_score: Optional[int] = Field(default=None, description="現在の最良スコア")
+    penalties: Dict[str, int] = Field(default_factory=dict, description="最良スコアのペナルティ内訳")
+    result: Optional[ShiftResponse] = Field(default=None, description="シフト作成結果（完了時）")
+    error: Optional[str] = Field(default=None, description="エラーメッセージ（失敗時）")
+    created_at: float = Field(description="受付日時（UNIX時刻）")
+    finished_at: Optional[float] = Field(default=None, description="終了日時（UNIX時刻）")
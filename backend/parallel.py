@@ -0,0 +1,215 @@
+"""
+Parallel Search - 複数プロセスによる並列探索
+Version: 2.1.0
+
+ShiftSolverの各試行は互いに独立しているため、試行回数を
+ワーカープロセスに分割して並列に実行する。
+また、ポートフォリオでは異なる探索エンジンをそれぞれ別のプロセスで同時に実行する。
+いずれかのワーカーが早期終了条件を満たした時点で全ワーカーを停止する。
+各ワーカーの最良解はShiftSolver側でスコアを比較して最終結果とする。
+"""
+import multiprocessing
+import queue
+import random
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Dict, Optional, Callable, Tuple
+
+
+# 進捗キューの確認間隔（秒）
+PROGRESS_POLL_SECONDS = 0.1
+
+# ワーカープロセス内で共有されるオブジェクト（initializerで設定）
+_stop_event = None
+_progress_queue = None
+
+
+def _init_worker(stop_event, progress_queue) -> None:
+    """ワーカープロセスの初期化"""
+    global _stop_event, _progress_queue
+    _stop_event = stop_event
+    _progress_queue = progress_queue
+    # fork直後は親と同じ乱数状態になるため再シードする
+    random.seed()
+
+
+def _worker_progress_callback(worker_id: int) -> Optional[Callable[[Dict], None]]:
+    """ワーカーの進捗を親プロセスに送るコールバック"""
+    if _progress_queue is None:
+        return None
+
+    def progress_callback(progress: Dict) -> None:
+        _progress_queue.put((worker_id, progress))
+    return progress_callback
+
+
+def _run_chunk(solver, attempts: int, worker_id: int, include_schedule: bool,
+               deadline: Optional[float]):
+    """ワーカープロセスで試行を実行する"""
+    result = solver._search(attempts, _stop_event, _worker_progress_callback(worker_id),
+                            include_schedule, deadline)
+    if result.early_exit:
+        # 他のワーカーも停止させる
+        _stop_event.set()
+    return result
+
+
+def _run_engine(solver, engine: Callable, worker_id: int, include_schedule: bool,
+                deadline: Optional[float]):
+    """ワーカープロセスで探索エンジンを実行する"""
+    # 各エンジンは1プロセス内で逐次実行する
+    solver.workers = 1
+    result = engine(solver, _stop_event, _worker_progress_callback(worker_id),
+                    include_schedule, deadline)
+    if result.early_exit:
+        # 他のエンジンも停止させる
+        _stop_event.set()
+    return result
+
+
+def split_attempts(total: int, workers: int) -> List[int]:
+    """
+    試行回数をワーカー数で分割する
+
+    Args:
+        total: 総試行回数
+        workers: ワーカー数
+
+    Returns:
+        各ワーカーの試行回数リスト（合計はtotal）
+    """
+    base, extra = divmod(total, workers)
+    return [base + (1 if i < extra else 0) for i in range(workers)]
+
+
+def _drain_progress(progress_queue, worker_progress: Dict[int, Dict]) -> Optional[Dict]:
+    """
+    キューに溜まった進捗を取り出し、全体の進捗にまとめる
+
+    Returns:
+        全体の進捗（更新がなければNone）
+    """
+    best_before = _best_worker_score(worker_progress)
+    updated = False
+    while True:
+        try:
+            worker_id, progress = progress_queue.get_nowait()
+        except queue.Empty:
+            break
+        # スケジュールは更新時にしか送られないため、前回の内容に上書きする
+        worker_progress[worker_id] = {**worker_progress.get(worker_id, {}), **progress}
+        updated = True
+
+    if not updated:
+        return None
+
+    best = max(worker_progress.values(), key=lambda p: p["best_score"])
+    merged = {
+        "attempts": sum(p["attempts"] for p in worker_progress.values()),
+        "best_score": best["best_score"],
+        "penalties": best["penalties"],
+        "improved": best_before is None or best["best_score"] > best_before,
+    }
+    if merged["improved"] and "schedule" in best:
+        merged["schedule"] = best["schedule"]
+    return merged
+
+
+def _best_worker_score(worker_progress: Dict[int, Dict]) -> Optional[int]:
+    """全ワーカー中の最良スコア"""
+    if not worker_progress:
+        return None
+    return max(p["best_score"] for p in worker_progress.values())
+
+
+def _notify_progress(progress_queue, worker_progress: Dict[int, Dict],
+                     progress_callback: Optional[Callable[[Dict], None]]) -> None:
+    """ワーカーの進捗を取り出してコールバックに通知する"""
+    if progress_queue is None:
+        return
+    progress = _drain_progress(progress_queue, worker_progress)
+    if progress is not None:
+        progress_callback(progress)
+
+
+def solve_parallel(solver, workers: int,
+                   progress_callback: Optional[Callable[[Dict], None]] = None,
+                   include_schedule: bool = False, cancel_event=None,
+                   deadline: Optional[float] = None):
+    """
+    試行回数を複数プロセスに分割して探索する
+
+    Args:
+        solver: ShiftSolverインスタンス
+        workers: ワーカープロセス数
+        progress_callback: 進捗通知用コールバック（全ワーカー合算の進捗を渡す）
+        include_schedule: 最良スコア更新時の進捗に最良スケジュールを含めるか
+        cancel_event: キャンセル用イベント。セットされると全ワーカーを停止する
+        deadline: 打ち切り時刻（time.monotonic()基準。同一ホストのプロセス間で共通）
+
+    Returns:
+        各ワーカーの探索結果（SearchResult）のリスト
+    """
+    workers = max(1, min(workers, solver.max_attempts))
+    tasks = [(_run_chunk, (solver, n, i, include_schedule, deadline))
+             for i, n in enumerate(split_attempts(solver.max_attempts, workers))]
+    return _run_workers(tasks, progress_callback, cancel_event)
+
+
+def solve_portfolio(solver, engines: List[Callable],
+                    progress_callback: Optional[Callable[[Dict], None]] = None,
+                    include_schedule: bool = False, cancel_event=None,
+                    deadline: Optional[float] = None):
+    """
+    複数の探索エンジンをそれぞれ別のプロセスで同時に実行する
+
+    いずれかのエンジンが早期終了条件を満たすと全エンジンを停止する。
+
+    Args:
+        solver: ShiftSolverインスタンス
+        engines: 探索エンジン関数のリスト（engines.pyで登録したもの）
+        progress_callback: 進捗通知用コールバック（全エンジン合算の進捗を渡す）
+        include_schedule: 最良スコア更新時の進捗に最良スケジュールを含めるか
+        cancel_event: キャンセル用イベント。セットされると全エンジンを停止する
+        deadline: 打ち切り時刻（time.monotonic()基準。同一ホストのプロセス間で共通）
+
+    Returns:
+        各エンジンの探索結果（SearchResult）のリスト
+    """
+    tasks = [(_run_engine, (solver, engine, i, include_schedule, deadline))
+             for i, engine in enumerate(engines)]
+    return _run_workers(tasks, progress_callback, cancel_event)
+
+
+def _run_workers(tasks: List[Tuple[Callable, tuple]],
+                 progress_callback: Optional[Callable[[Dict], None]],
+                 cancel_event) -> List:
+    """
+    タスクをそれぞれ別のワーカープロセスで実行し、全タスクの結果を返す
+
+    Args:
+        tasks: (ワーカー関数, 引数) のリスト
+        progress_callback: 進捗通知用コールバック
+        cancel_event: キャンセル用イベント
+    """
+    ctx = multiprocessing.get_context()
+    stop_event = ctx.Event()
+    progress_queue = ctx.Queue() if progress_callback is not None else None
+    worker_progress: Dict[int, Dict] = {}
+
+    with ProcessPoolExecutor(max_workers=len(tasks), mp_context=ctx, initializer=_init_worker,
+                             initargs=(stop_event, progress_queue)) as pool:
+        futures = [pool.submit(func, *args) for func, args in tasks]
+
+        pending = set(futures)
+        while pending:
+            _, pending = wait(pending, timeout=PROGRESS_POLL_SECONDS, return_when=FIRST_COMPLETED)
+            if cancel_event is not None and cancel_event.is_set():
+                stop_event.set()
+            _notify_progress(progress_queue, worker_progress, progress_callback)
+
+        results = [f.result() for f in futures]
+
+    # 終了間際に送られた進捗を反映
+    _notify_progress(progress_queue, worker_progress, progress_callback)
+
+    return results
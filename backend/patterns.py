@@ -0,0 +1,183 @@
+"""
+Row Patterns - ルールを満たす1か月分の行の数え上げと一様サンプリング
+Version: 2.1.0
+
+ルールのオートマトン（automaton.py）上の動的計画法で、1スタッフの行のうち
+- シフトルールをすべて満たし
+- 各日に許されたシフト（固定・希望のセルは1種類）だけを使い
+- 勤務日数が上限以下で
+- 夜勤の回数が指定どおりの
+ものを数え上げ、その中から一様に1つを選ぶ。
+日・シフトごとに整数の重みを与えた場合は、行の重み（各日の重みの積）に比例して選ぶ
+（列生成（colgen.py）で、不足している日・シフトを含む行を選びやすくするために使う）。
+
+動的計画法の値は「d日目からオートマトンの状態sで始めたとき、残りの夜勤回数n・勤務日数の残りr
+（r日以下）で作れる行の数」で、(n, r) の表を1つの整数に詰めて持つ（1マスslot_bitsビット）。
+勤務・夜勤を1日加える遷移は表全体のビットシフト1回になるため、日×状態ごとに数回の整数演算で済む。
+"""
+import random
+from typing import List, Optional, Sequence, Dict
+
+from .automaton import RuleAutomaton, DEAD
+from .grid import ShiftCode, IS_WORK_SHIFT
+
+
+_NIGHT = ShiftCode.NIGHT
+
+
+class RowPatternSampler:
+    """
+    ルールを満たす行の数え上げと一様サンプリング
+
+    使い方:
+        automaton, start = rule_checker.row_automaton(staff_idx)
+        sampler = RowPatternSampler(automaton, start, allowed, work_limit=22, nights=4)
+        sampler.count()     # 条件を満たす行の数（重みを与えた場合は重みの合計）
+        sampler.sample()    # 一様に選んだ行（シフトコードのリスト）。1つもなければNone
+    """
+
+    def __init__(self, automaton: RuleAutomaton, start: int,
+                 allowed: Sequence[Sequence[int]], work_limit: int, nights: int,
+                 weights: Optional[Sequence[Sequence[int]]] = None, exact_work: bool = False):
+        """
+        Args:
+            automaton: スタッフのルールのオートマトン
+            start: 前月末からの初期状態
+            allowed: 日ごとに使えるシフトコード（固定・希望のセルは1種類だけ）
+            work_limit: 勤務シフト（明けを含む）の日数の上限
+            nights: 夜勤の回数（ちょうどこの回数）
+            weights: allowedと同じ形の正の整数の重み（省略時はすべて1）
+            exact_work: 勤務日数をちょうどwork_limitにする
+        """
+        self.automaton = automaton
+        self.start = start
+        self.allowed = [tuple(codes) for codes in allowed]
+        self.days = len(self.allowed)
+        self.work_limit = max(0, min(work_limit, self.days))
+        self.nights = nights
+        self.exact_work = exact_work
+        if weights is None:
+            self.weights = [(1,) * len(codes) for codes in self.allowed]
+        else:
+            self.weights = [tuple(w) for w in weights]
+
+        # 表の1マスのビット数（行の重みの合計 = 各日の重みの合計の積 を表せる幅）
+        self.slot_bits = sum(sum(w).bit_length() for w in self.weights) + 1
+        # 表の並び: 添字 n * block + r（勤務の遷移で隣の夜勤回数のマスにはみ出さないよう1マス空ける）
+        self.block = self.work_limit + 2
+        self._mask = self._build_mask()
+        self._tables = self._build_tables()
+
+    # =========================================================================
+    # 表の作成
+    # =========================================================================
+
+    def _slot(self, n: int, r: int) -> int:
+        """(n, r) のマスの位置（ビット）"""
+        return (n * self.block + r) * self.slot_bits
+
+    def _build_mask(self) -> int:
+        """有効なマス（n ≤ nights, r ≤ work_limit）だけを1にしたマスク"""
+        row = sum(((1 << self.slot_bits) - 1) << (r * self.slot_bits)
+                  for r in range(self.work_limit + 1))
+        return sum(row << self._slot(n, 0) for n in range(self.nights + 1))
+
+    def _build_tables(self) -> List[Dict[int, int]]:
+        """
+        日ごと・状態ごとの表（d日目以降の行の数）を後ろから作る
+
+        tables[d][s]: d日目を状態sで迎えたときの (残りの夜勤回数, 勤務日数の残り) ごとの行の数
+        """
+        automaton = self.automaton
+        days = self.days
+
+        # 月初から到達できる状態
+        reachable = [{self.start}]
+        for d in range(days):
+            reachable.append({automaton.step(s, code) for s in reachable[d]
+                              for code in self.allowed[d]} - {DEAD})
+
+        # 月末: 夜勤を使い切っていれば、勤務日数の残りによらず1通り
+        end = sum(1 << self._slot(0, r) for r in range(self.work_limit + 1))
+        tables: List[Dict[int, int]] = [{} for _ in range(days + 1)]
+        tables[days] = {s: end for s in reachable[days] if automaton.accepts(s)}
+
+        mask = self._mask
+        for d in range(days - 1, -1, -1):
+            shifts = [(code, self._shift_of(code), weight)
+                      for code, weight in zip(self.allowed[d], self.weights[d])]
+            following = tables[d + 1]
+            table = tables[d]
+            for s in reachable[d]:
+                total = 0
+                for code, shift, weight in shifts:
+                    value = following.get(automaton.step(s, code))
+                    if value:
+                        total += (value << shift) * weight if weight != 1 else value << shift
+                if total:
+                    table[s] = total & mask
+        return tables
+
+    def _shift_of(self, code: int) -> int:
+        """codeの日を加えたときの表のずらし幅（ビット）"""
+        n = 1 if code & ShiftCode.KIND_MASK == _NIGHT else 0
+        r = 1 if IS_WORK_SHIFT[code] else 0
+        return self._slot(n, r)
+
+    def _value(self, table: Dict[int, int], state: int, n: int, r: int) -> int:
+        """表の (n, r) のマスの値"""
+        if n < 0 or r < 0 or state == DEAD:
+            return 0
+        value = table.get(state, 0)
+        return value >> self._slot(n, r) & ((1 << self.slot_bits) - 1)
+
+    def _completions(self, table: Dict[int, int], state: int, n: int, r: int) -> int:
+        """状態stateから、残りの夜勤n回・勤務日数の残りr日で作れる行の数"""
+        value = self._value(table, state, n, r)
+        if self.exact_work:
+            # 表はr日以下の数なので、r-1日以下の数を引いてちょうどr日の数にする
+            value -= self._value(table, state, n, r - 1)
+        return value
+
+    # =========================================================================
+    # 数え上げ・サンプリング
+    # =========================================================================
+
+    def count(self) -> int:
+        """条件を満たす行の数（重みを与えた場合は行の重みの合計）"""
+        return self._completions(self._tables[0], self.start, self.nights, self.work_limit)
+
+    def sample(self, rng: Optional[random.Random] = None) -> Optional[List[int]]:
+        """
+        条件を満たす行を一様に（重みを与えた場合は行の重みに比例して）1つ選ぶ
+
+        Args:
+            rng: 乱数生成器（省略時はrandomモジュール）
+
+        Returns:
+            シフトコードのリスト。条件を満たす行がなければNone
+        """
+        if self.count() == 0:
+            return None
+        rng = rng or random
+        automaton = self.automaton
+        state, n, r = self.start, self.nights, self.work_limit
+        row = []
+        for d in range(self.days):
+            following = self._tables[d + 1]
+            weights = []
+            for code, weight in zip(self.allowed[d], self.weights[d]):
+                dn = 1 if code & ShiftCode.KIND_MASK == _NIGHT else 0
+                dr = 1 if IS_WORK_SHIFT[code] else 0
+                weights.append(weight * self._completions(following, automaton.step(state, code),
+                                                          n - dn, r - dr))
+            pick = rng.randrange(sum(weights))
+            for code, weight in zip(self.allowed[d], weights):
+                if pick < weight:
+                    break
+                pick -= weight
+            row.append(code)
+            state = automaton.step(state, code)
+            n -= 1 if code & ShiftCode.KIND_MASK == _NIGHT else 0
+            r -= 1 if IS_WORK_SHIFT[code] else 0
+        return row
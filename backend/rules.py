@@ -9,9 +9,74 @@ Version: 2.1.0
 2. 逆行禁止（日→早、遅→早、遅→日）
 3. 6連勤以上禁止（5連勤まで）
 4. 常勤の日勤帯のみ連勤は3連勤まで（5連勤は必ず夜勤・明けを含む）
+
+スケジュールはShiftGrid、スタッフはインデックス、シフトはShiftCodeで受け取る。
+連勤数はシフト表ごとの連勤インデックス（RunIndex）から定数時間で求める。
+隣接する日同士のルール（1・2）は遷移表PAIR_LEGAL / PLACE_LEGALにまとめてある。
+行全体の検証には、これらのルールをコンパイルした有限オートマトン（automaton.py）を使う。
 """
-from typing import List, Dict
-from .models import ShiftTypes
+from functools import lru_cache
+from typing import List, Dict, Optional, Tuple
+
+from .grid import (ShiftCode, ShiftGrid, RunIndex, IS_DAY_SHIFT, IS_WORK_SHIFT, IS_REST_SHIFT,
+                   RUN_MAX_LEN, RUN_DAY_SHIFT, RUN_NIGHT_SHIFT, encode_shift)
+from .automaton import RuleAutomaton
+
+
+# 種別コードの別名（ホットパスでの属性参照を減らす）
+_MASK = ShiftCode.KIND_MASK
+_EMPTY = ShiftCode.EMPTY
+_EARLY = ShiftCode.EARLY
+_DAY = ShiftCode.DAY
+_LATE = ShiftCode.LATE
+_NIGHT = ShiftCode.NIGHT
+_NIGHT_REST = ShiftCode.NIGHT_REST
+_OFF = ShiftCode.OFF
+_HOPE_OFF = ShiftCode.HOPE_OFF
+
+# 逆行となる（前のシフト, 次のシフト）の組
+_REVERSE_PAIRS = frozenset({(_DAY, _EARLY), (_LATE, _EARLY), (_LATE, _DAY)})
+
+
+# =============================================================================
+# シフト遷移表
+# =============================================================================
+
+# 種別コードの数（遷移表の各次元のサイズ）
+_KINDS = ShiftCode.KIND_MASK + 1
+
+
+def _is_legal_pair(prev: int, next_shift: int) -> bool:
+    """連続する2日のシフト（種別コード）の組が許されるか"""
+    # ルール1: 明け(・)の翌日は公休(◎)のみ
+    if prev == _NIGHT_REST and next_shift != _OFF:
+        return False
+    # ルール2: 逆行禁止
+    if (prev, next_shift) in _REVERSE_PAIRS:
+        return False
+    # 明け(・)は夜勤の翌日のみ
+    if next_shift == _NIGHT_REST and prev != _NIGHT:
+        return False
+    return True
+
+
+# PAIR_LEGAL[prev][next]: 前日prevの翌日にnextを置けるか（種別コードで引く）
+# シフト表全体の検証や、隣接する2日を同時に書き換える処理で使う
+PAIR_LEGAL = tuple(tuple(_is_legal_pair(p, n) for n in range(_KINDS)) for p in range(_KINDS))
+
+# PLACE_LEGAL[prev][shift][next]: 前日prev・翌日nextの間にshiftを置けるか（check_rulesの2日間ルール）
+# 翌日側は逆行のみを確認する（翌日が明けでも、翌日のルールは翌日を置いた時点で確認済みのため）
+PLACE_LEGAL = tuple(
+    tuple(
+        tuple(PAIR_LEGAL[p][s] and (s, n) not in _REVERSE_PAIRS for n in range(_KINDS))
+        for s in range(_KINDS))
+    for p in range(_KINDS))
+
+
+@lru_cache(maxsize=None)
+def _compile_automaton(max_work: int, max_day_streak: Optional[int]) -> RuleAutomaton:
+    """ルールのオートマトン（連勤の上限ごとに1回だけコンパイルする）"""
+    return RuleAutomaton(PAIR_LEGAL, max_work, max_day_streak)
 
 
 class ShiftRuleChecker:
@@ -32,42 +97,54 @@ class ShiftRuleChecker:
     def __init__(self, staff_dict_list: List[Dict], days: int):
         """
         Args:
-            staff_dict_list: スタッフ情報の辞書リスト
+            staff_dict_list: スタッフ情報の辞書リスト（並びがスタッフインデックス）
             days: 月の日数
         """
         self.staff_dict_list = staff_dict_list
         self.days = days
-        self._staff_cache = {s["name"]: s for s in staff_dict_list}
+        
+        # スタッフごとの前月情報（種別コード）と雇用形態
+        self._prev_codes = [encode_shift(s["prev_shift"].strip()) & _MASK for s in staff_dict_list]
+        self._prev_streaks = [s["prev_streak"] for s in staff_dict_list]
+        self._is_regular = [s["type"] == 0 for s in staff_dict_list]
+        
+        # 行全体の検証用のオートマトンと初期状態（日勤帯の連勤の上限は常勤のみ）
+        self._automata = [
+            _compile_automaton(self.MAX_CONSECUTIVE_WORK,
+                               self.MAX_DAY_SHIFT_STREAK if regular else None)
+            for regular in self._is_regular]
+        self._start_states = [
+            automaton.start_state(prev_code, prev_streak)
+            for automaton, prev_code, prev_streak
+            in zip(self._automata, self._prev_codes, self._prev_streaks)]
     
     # =========================================================================
     # 基本判定メソッド
     # =========================================================================
     
-    def is_work_shift(self, val: str) -> bool:
+    def is_work_shift(self, code: int) -> bool:
         """勤務シフトかどうか（連勤カウント用）"""
-        v = val.strip() if val else ""
-        return v in ShiftTypes.WORK_SHIFTS
+        return IS_WORK_SHIFT[code]
     
-    def is_rest_shift(self, val: str) -> bool:
-        """休みシフトかどうか"""
-        v = val.strip() if val else ""
-        return v in ShiftTypes.REST_SHIFTS or v == ""
+    def is_rest_shift(self, code: int) -> bool:
+        """休みシフトかどうか（未配置を含む）"""
+        return IS_REST_SHIFT[code] or code == _EMPTY
     
-    def get_staff_info(self, name: str) -> Dict:
-        """スタッフ情報を取得（キャッシュ使用）"""
-        return self._staff_cache[name]
+    def get_staff_info(self, staff_idx: int) -> Dict:
+        """スタッフ情報を取得"""
+        return self.staff_dict_list[staff_idx]
     
-    def get_prev_shift(self, name: str, day_idx: int, schedule: Dict) -> str:
-        """前日のシフトを取得"""
+    def get_prev_shift(self, staff_idx: int, day_idx: int, grid: ShiftGrid) -> int:
+        """前日のシフト（種別コード）を取得"""
         if day_idx == 0:
-            return self.get_staff_info(name)["prev_shift"].strip()
-        return schedule[name][day_idx - 1].strip()
+            return self._prev_codes[staff_idx]
+        return grid.rows[staff_idx][day_idx - 1] & _MASK
     
     # =========================================================================
     # 逆行チェック
     # =========================================================================
     
-    def check_reverse(self, prev: str, next_shift: str) -> bool:
+    def check_reverse(self, prev: int, next_shift: int) -> bool:
         """
         逆行チェック
         
@@ -77,233 +154,171 @@ class ShiftRuleChecker:
         - 遅 → 日
         
         Args:
-            prev: 前のシフト
-            next_shift: 次のシフト
-            
+            prev: 前のシフト（種別コード）
+            next_shift: 次のシフト（種別コード）
+        
         Returns:
             True=逆行あり（禁止）, False=逆行なし（OK）
         """
-        if prev == ShiftTypes.DAY and next_shift == ShiftTypes.EARLY:
-            return True
-        if prev == ShiftTypes.LATE and next_shift in [ShiftTypes.EARLY, ShiftTypes.DAY]:
-            return True
-        return False
+        return (prev, next_shift) in _REVERSE_PAIRS
+    
+    # =========================================================================
+    # 連勤インデックス
+    # =========================================================================
+    
+    def attach(self, grid: ShiftGrid) -> List[RunIndex]:
+        """
+        シフト表に連勤インデックスを作成する
+        
+        以降はShiftGrid.set()のたびに変更箇所だけが更新される。
+        未作成のシフト表は最初のルールチェック時に自動で作成する。
+        """
+        grid.runs = [RunIndex.build(grid.rows[i], self._prev_codes[i], self._prev_streaks[i])
+                     for i in range(grid.n_staff)]
+        return grid.runs
+    
+    def _get_runs(self, staff_idx: int, grid: ShiftGrid) -> RunIndex:
+        """スタッフの連勤インデックスを取得"""
+        runs = grid.runs
+        if runs is None:
+            runs = self.attach(grid)
+        return runs[staff_idx]
     
     # =========================================================================
     # 連勤カウント
     # =========================================================================
     
-    def count_consecutive_work(self, name: str, day_idx: int, schedule: Dict) -> int:
+    def count_consecutive_work(self, staff_idx: int, day_idx: int, grid: ShiftGrid) -> int:
         """
         day_idxの前までの連勤数をカウント（前月からの連勤を含む）
         
         Args:
-            name: スタッフ名
+            staff_idx: スタッフインデックス
             day_idx: 対象日（0-indexed）
-            schedule: 現在のスケジュール
-            
+            grid: 現在のスケジュール
+        
         Returns:
             連勤日数
         """
-        staff_info = self.get_staff_info(name)
-        streak = 0
-        d = day_idx - 1
-        
-        while d >= 0:
-            val = schedule[name][d].strip()
-            if self.is_work_shift(val):
-                streak += 1
-                d -= 1
-            else:
-                break
-        
-        # 前月からの連勤を加算
-        if d < 0:
-            streak += staff_info["prev_streak"]
-        
-        return streak
+        return self._get_runs(staff_idx, grid).back[day_idx] & RUN_MAX_LEN
     
-    def has_night_in_streak(self, name: str, day_idx: int, schedule: Dict) -> bool:
+    def has_night_in_streak(self, staff_idx: int, day_idx: int, grid: ShiftGrid) -> bool:
         """
         連勤中に夜勤があるかチェック
         
         Args:
-            name: スタッフ名
+            staff_idx: スタッフインデックス
             day_idx: 対象日（0-indexed）
-            schedule: 現在のスケジュール
-            
+            grid: 現在のスケジュール
+        
         Returns:
             夜勤が含まれる場合True
         """
-        staff_info = self.get_staff_info(name)
-        d = day_idx - 1
-        
-        while d >= 0:
-            val = schedule[name][d].strip()
-            if self.is_work_shift(val):
-                if val in [ShiftTypes.NIGHT, ShiftTypes.NIGHT_REST]:
-                    return True
-                d -= 1
-            else:
-                break
-        
-        # 前月の夜勤チェック
-        if d < 0 and staff_info["prev_shift"].strip() in [ShiftTypes.NIGHT, ShiftTypes.NIGHT_REST]:
-            return True
-        
-        return False
+        return bool(self._get_runs(staff_idx, grid).back[day_idx] >> RUN_NIGHT_SHIFT)
     
-    def _count_day_shift_streak(self, name: str, day_idx: int, schedule: Dict) -> int:
-        """日勤帯のみの連勤数をカウント"""
-        staff_info = self.get_staff_info(name)
-        day_streak = 0
-        
-        # 前方の日勤帯連勤
-        d = day_idx - 1
-        while d >= 0:
-            val = schedule[name][d].strip()
-            if val in ShiftTypes.DAY_SHIFTS:
-                day_streak += 1
-                d -= 1
-            elif val in [ShiftTypes.NIGHT, ShiftTypes.NIGHT_REST]:
-                break
-            else:
-                break
-        
-        # 前月からの日勤帯連勤を加算
-        if d < 0:
-            prev_shift_val = staff_info["prev_shift"].strip()
-            if prev_shift_val in ShiftTypes.DAY_SHIFTS:
-                day_streak += staff_info["prev_streak"]
-        
-        day_streak += 1  # 現在のシフト分
-        
-        # 後方の日勤帯連勤
-        d = day_idx + 1
-        while d < self.days:
-            val = schedule[name][d].strip()
-            if val in ShiftTypes.DAY_SHIFTS:
-                day_streak += 1
-                d += 1
-            elif val in [ShiftTypes.NIGHT, ShiftTypes.NIGHT_REST]:
-                break
-            else:
-                break
-        
-        return day_streak
+    def _count_day_shift_streak(self, staff_idx: int, day_idx: int, grid: ShiftGrid) -> int:
+        """日勤帯のみの連勤数をカウント（前方・当日・後方の合計）"""
+        runs = self._get_runs(staff_idx, grid)
+        before = runs.back[day_idx] >> RUN_DAY_SHIFT & RUN_MAX_LEN
+        after = runs.fwd[day_idx + 1] >> RUN_DAY_SHIFT & RUN_MAX_LEN
+        return before + 1 + after
     
-    def _has_night_in_future_streak(self, name: str, day_idx: int, schedule: Dict) -> bool:
+    def _has_night_in_future_streak(self, staff_idx: int, day_idx: int, grid: ShiftGrid) -> bool:
         """翌日以降の連勤中に夜勤があるか"""
-        d = day_idx + 1
-        while d < self.days:
-            val = schedule[name][d].strip()
-            if self.is_work_shift(val):
-                if val in [ShiftTypes.NIGHT, ShiftTypes.NIGHT_REST]:
-                    return True
-                d += 1
-            else:
-                break
-        return False
+        return bool(self._get_runs(staff_idx, grid).fwd[day_idx + 1] >> RUN_NIGHT_SHIFT)
     
     # =========================================================================
     # メインルールチェック
     # =========================================================================
     
-    def check_rules(self, name: str, day_idx: int, schedule: Dict, shift_type: str) -> bool:
+    def check_rules(self, staff_idx: int, day_idx: int, grid: ShiftGrid, shift_type: int) -> bool:
         """
         シフトルールをチェック（前後両方向）
         
         Args:
-            name: スタッフ名
+            staff_idx: スタッフインデックス
             day_idx: 対象日（0-indexed）
-            schedule: 現在のスケジュール
-            shift_type: 配置しようとしているシフト種別
+            grid: 現在のスケジュール
+            shift_type: 配置しようとしているシフト（ShiftCode）
             
         Returns:
             配置可能な場合True
         """
-        staff_info = self.get_staff_info(name)
-        shift_clean = shift_type.strip()
-        prev = self.get_prev_shift(name, day_idx, schedule)
+        shift_clean = shift_type & _MASK
+        row = grid.rows[staff_idx]
+        prev = row[day_idx - 1] & _MASK if day_idx else self._prev_codes[staff_idx]
         
-        # ルール1: 明け(・)の翌日は公休(◎)のみ
-        if prev == ShiftTypes.NIGHT_REST and shift_clean != ShiftTypes.OFF:
-            return False
+        next_shift = row[day_idx + 1] & _MASK if day_idx + 1 < self.days else _EMPTY
         
-        # ルール2a: 前日との逆行禁止
-        if shift_clean in ShiftTypes.DAY_SHIFTS:
-            if self.check_reverse(prev, shift_clean):
-                return False
-        
-        # ルール2b: 翌日との逆行禁止（翌日が既に決まっている場合）
-        if day_idx + 1 < self.days:
-            next_shift = schedule[name][day_idx + 1].strip()
-            if next_shift in ShiftTypes.DAY_SHIFTS:
-                if self.check_reverse(shift_clean, next_shift):
-                    return False
+        # ルール1・2: 明けの翌日は公休のみ、前日・翌日との逆行禁止、明けは夜勤の翌日のみ
+        if not PLACE_LEGAL[prev][shift_clean][next_shift]:
+            return False
         
         # 休みタイプはここまででOK
-        if shift_clean in ShiftTypes.REST_SHIFTS:
+        if IS_REST_SHIFT[shift_clean]:
             return True
         
-        # 明け(・)は夜勤の翌日のみ
-        if shift_clean == ShiftTypes.NIGHT_REST and prev != ShiftTypes.NIGHT:
+        runs = grid.runs
+        if runs is None:
+            runs = self.attach(grid)
+        run = runs[staff_idx]
+        before = run.back[day_idx]
+        after = run.fwd[day_idx + 1]
+        
+        # ルール3: 連勤チェック（夜勤は夜勤+明けの2日分としてカウント）
+        current_add = 2 if shift_clean == _NIGHT else 1
+        after_len = after & RUN_MAX_LEN
+        if after_len and day_idx + 1 + after_len == self.days and row[-1] & _MASK == _NIGHT:
+            # 月末まで続く連勤の最後が夜勤なら、翌月1日の明けも数える
+            after_len += 1
+        if (before & RUN_MAX_LEN) + current_add + after_len > self.MAX_CONSECUTIVE_WORK:
             return False
         
-        # ルール3: 連勤チェック
-        if not self._check_consecutive_work_limit(name, day_idx, schedule, shift_clean):
-            return False
-        
-        # ルール4: 常勤の日勤帯のみ連勤は3連勤まで
-        if not self._check_day_shift_streak_limit(name, day_idx, schedule, shift_clean, staff_info):
-            return False
+        # ルール4: 常勤の日勤帯のみ連勤は3連勤まで（4連勤以上は夜勤・明けを含む場合のみ可）
+        if self._is_regular[staff_idx] and IS_DAY_SHIFT[shift_clean]:
+            day_streak = ((before >> RUN_DAY_SHIFT & RUN_MAX_LEN) + 1
+                          + (after >> RUN_DAY_SHIFT & RUN_MAX_LEN))
+            if day_streak > self.MAX_DAY_SHIFT_STREAK and not (before | after) >> RUN_NIGHT_SHIFT:
+                return False
         
         return True
     
-    def _check_consecutive_work_limit(self, name: str, day_idx: int, 
-                                       schedule: Dict, shift_clean: str) -> bool:
-        """連勤上限チェック"""
-        streak_before = self.count_consecutive_work(name, day_idx, schedule)
-        
-        streak_after = 0
-        d = day_idx + 1
-        while d < self.days:
-            val = schedule[name][d].strip()
-            if self.is_work_shift(val):
-                streak_after += 1
-                d += 1
-            else:
-                break
-        
-        # 夜勤は2日分としてカウント（夜勤+明け）
-        current_add = 2 if shift_clean == ShiftTypes.NIGHT else 1
-        total_streak = streak_before + current_add + streak_after
-        
-        return total_streak <= self.MAX_CONSECUTIVE_WORK
+    # =========================================================================
+    # 行全体のチェック
+    # =========================================================================
     
-    def _check_day_shift_streak_limit(self, name: str, day_idx: int, 
-                                       schedule: Dict, shift_clean: str, 
-                                       staff_info: Dict) -> bool:
-        """日勤帯のみ連勤制限チェック"""
-        if staff_info["type"] != 0 or shift_clean not in ShiftTypes.DAY_SHIFTS:
-            return True
-        
-        has_night = self.has_night_in_streak(name, day_idx, schedule)
-        has_night = has_night or self._has_night_in_future_streak(name, day_idx, schedule)
+    def validate_row(self, staff_idx: int, grid: ShiftGrid) -> Optional[int]:
+        """
+        スタッフの行全体がルールを満たすか確認する（前月末からの連勤を含む）
         
-        day_streak = self._count_day_shift_streak(name, day_idx, schedule)
+        check_rules()と異なり、夜勤の翌日が明けであることも確認する。
+        未配置のセルは休みとして扱う。
         
-        # 4連勤以上の日勤帯のみは禁止
-        if day_streak >= 4 and not has_night:
-            return False
+        Returns:
+            最初に違反した日（0-indexed）。違反がなければNone
+        """
+        return self._automata[staff_idx].validate_row(grid.rows[staff_idx],
+                                                      self._start_states[staff_idx])
+    
+    def can_place(self, staff_idx: int, day_idx: int, grid: ShiftGrid, shift_type: int) -> bool:
+        """
+        セルをshift_typeにしても行全体がルールを満たすか
         
-        return True
+        前日までの状態と翌日以降の状態をつないで判定する。
+        行の他の部分で既に違反している場合はFalse。
+        """
+        return self._automata[staff_idx].can_place(grid.rows[staff_idx], day_idx, shift_type,
+                                                   self._start_states[staff_idx])
+    
+    def row_automaton(self, staff_idx: int) -> Tuple[RuleAutomaton, int]:
+        """スタッフの行のオートマトンと前月末からの初期状態（patterns.pyの数え上げに使う）"""
+        return self._automata[staff_idx], self._start_states[staff_idx]
     
     # =========================================================================
     # 夜勤配置チェック
     # =========================================================================
     
-    def can_place_night(self, name: str, day_idx: int, schedule: Dict) -> bool:
+    def can_place_night(self, staff_idx: int, day_idx: int, grid: ShiftGrid) -> bool:
         """
         夜勤を配置できるかチェック
         
@@ -315,61 +330,45 @@ class ShiftRuleChecker:
         - 基本ルールを満たす
         
         Args:
-            name: スタッフ名
+            staff_idx: スタッフインデックス
             day_idx: 対象日（0-indexed）
-            schedule: 現在のスケジュール
-            
+            grid: 現在のスケジュール
+        
         Returns:
             配置可能な場合True
         """
-        staff_info = self.get_staff_info(name)
-        
         # 常勤のみ夜勤可能
-        if staff_info["type"] != 0:
+        if not self._is_regular[staff_idx]:
             return False
         
         # 既にシフトが入っている場合は不可
-        if schedule[name][day_idx] != "":
+        if grid.rows[staff_idx][day_idx] != _EMPTY:
             return False
         
         # 翌日のチェック（明けが入れられるか）
-        if not self._can_place_night_rest(name, day_idx + 1, schedule):
+        if not self._can_place_night_rest(staff_idx, day_idx + 1, grid):
             return False
         
         # 翌々日のチェック（公休が入れられるか）
-        if not self._can_place_off_after_night(name, day_idx + 2, schedule):
+        if not self._can_place_off_after_night(staff_idx, day_idx + 2, grid):
             return False
         
-        return self.check_rules(name, day_idx, schedule, ShiftTypes.NIGHT)
+        return self.check_rules(staff_idx, day_idx, grid, _NIGHT)
     
-    def _can_place_night_rest(self, name: str, day_idx: int, schedule: Dict) -> bool:
+    def _can_place_night_rest(self, staff_idx: int, day_idx: int, grid: ShiftGrid) -> bool:
         """翌日に明けが入れられるかチェック"""
         if day_idx >= self.days:
             return True
         
-        next_val = schedule[name][day_idx]
-        next_val_stripped = next_val.strip()
-        
-        # 希望休（スペース付き）の場合は上書き不可
-        if next_val == ShiftTypes.HOPE_OFF:
-            return False
-        
-        return next_val_stripped in ["", ShiftTypes.NIGHT_REST]
+        # 希望休は上書き不可（空きまたは明けのみ可）
+        next_val = grid.rows[staff_idx][day_idx]
+        return next_val == _EMPTY or next_val == _NIGHT_REST
     
-    def _can_place_off_after_night(self, name: str, day_idx: int, schedule: Dict) -> bool:
+    def _can_place_off_after_night(self, staff_idx: int, day_idx: int, grid: ShiftGrid) -> bool:
         """翌々日に公休が入れられるかチェック"""
         if day_idx >= self.days:
             return True
         
-        next2_val = schedule[name][day_idx]
-        next2_val_stripped = next2_val.strip()
-        
-        # 有休・リ休の場合は不可
-        if next2_val_stripped in [ShiftTypes.PAID, ShiftTypes.REFRESH]:
-            return False
-        
-        # 希望休は許可（上書きしない）
-        if next2_val == ShiftTypes.HOPE_OFF:
-            return True
-        
-        return next2_val_stripped in ["", ShiftTypes.OFF]
+        # 希望休は許可（上書きしない）、有休・リ休は不可
+        next2_val = grid.rows[staff_idx][day_idx]
+        return next2_val == _EMPTY or next2_val == _OFF or next2_val == _HOPE_OFF
@@ -0,0 +1,321 @@
+"""
+Score Evaluator - スコアの差分評価
+Version: 2.1.0
+
+ShiftSolver._calc_penalties() と同じスコアを、セル変更の差分だけで更新する。
+スタッフ別（公休数・夜勤数）と日別（早番・遅番・夜勤・日勤帯の人数）の集計を保持し、
+変更候補（1セルの書き換え、2セルの入れ替え）のスコア差分を
+影響するスタッフ・日の集計だけから求める。
+局所探索や修復のように大量の変更候補を評価する処理で使う。
+"""
+from typing import List, Dict, Tuple, Sequence
+
+from .grid import ShiftCode, ShiftGrid, IS_DAY_SHIFT
+
+
+# 変更1件: (staff_idx, day_idx, 新しいコード)
+Change = Tuple[int, int, int]
+
+# コードごとの集計対象かどうか（HOPEビット込みのコードで引く）
+_IS_OFF = tuple(c in ShiftCode.OFF_CODES for c in range(ShiftCode.SIZE))
+_IS_EARLY = tuple(c == ShiftCode.EARLY for c in range(ShiftCode.SIZE))
+_IS_LATE = tuple(c == ShiftCode.LATE for c in range(ShiftCode.SIZE))
+_IS_NIGHT = tuple(c == ShiftCode.NIGHT for c in range(ShiftCode.SIZE))
+
+
+def calc_variance_penalty(counts: Sequence[int], config) -> int:
+    """
+    日別の日勤帯人数から平準化ペナルティを計算
+
+    分散 × PENALTY_VARIANCE の切り捨てを整数演算で求める
+    （差分評価と全体計算で丸めがずれないようにするため）。
+    """
+    if not counts:
+        return 0
+    total = sum(counts)
+    sq_total = sum(c * c for c in counts)
+    return _variance_penalty(len(counts), total, sq_total, max(counts), min(counts), config)
+
+
+def _variance_penalty(n: int, total: int, sq_total: int,
+                      max_cnt: int, min_cnt: int, config) -> int:
+    """人数の合計・二乗和・最大・最小から平準化ペナルティを計算"""
+    # 分散 = (n * Σc² - (Σc)²) / n²
+    penalty = config.PENALTY_VARIANCE * (n * sq_total - total * total) // (n * n)
+    if max_cnt - min_cnt >= 3:
+        penalty += (max_cnt - min_cnt) * config.PENALTY_RANGE
+    return penalty
+
+
+class ScoreEvaluator:
+    """
+    シフト表のスコアを差分で評価する
+
+    使い方:
+        evaluator = ScoreEvaluator(grid, regular_idx, target_off_days, night_targets, SolverConfig)
+        delta = evaluator.delta_swap(staff_idx, day1, staff_idx, day2)
+        if delta > 0:
+            evaluator.apply_swap(staff_idx, day1, staff_idx, day2)
+
+    評価中のシフト表への書き込みはapply_*()を通すこと（集計をセルと同期させるため）。
+    スコアは大きいほど良い（ペナルティ合計の符号反転）。
+    """
+
+    def __init__(self, grid: ShiftGrid, regular_idx: List[int], target_off_days: int,
+                 night_targets: List[int], config):
+        """
+        Args:
+            grid: 評価するシフト表
+            regular_idx: 常勤スタッフのインデックス
+            target_off_days: 常勤スタッフの目標公休日数
+            night_targets: スタッフごとの夜勤目標回数（0は対象外）
+            config: ペナルティ係数を持つ設定クラス（SolverConfig）
+        """
+        self.grid = grid
+        self.config = config
+        self.target_off_days = target_off_days
+        self.night_targets = night_targets
+        self.is_regular = [False] * grid.n_staff
+        for i in regular_idx:
+            self.is_regular[i] = True
+
+        # スタッフ別の集計
+        self.off_counts = [grid.count_in_row(i, ShiftCode.OFF_CODES) for i in range(grid.n_staff)]
+        self.night_counts = [grid.count_in_row(i, (ShiftCode.NIGHT,)) for i in range(grid.n_staff)]
+
+        # 日別の集計（早番, 遅番, 夜勤, 日勤帯）
+        self.day_stats = [
+            [grid.count_in_column(d, (ShiftCode.EARLY,)),
+             grid.count_in_column(d, (ShiftCode.LATE,)),
+             grid.count_in_column(d, (ShiftCode.NIGHT,)),
+             grid.count_in_column(d, ShiftCode.DAY_SHIFTS)]
+            for d in range(grid.days)
+        ]
+
+        # 日勤帯人数の合計・二乗和・人数ごとの日数（最大・最小を求めるため）
+        day_staff = [stats[3] for stats in self.day_stats]
+        self.total = sum(day_staff)
+        self.sq_total = sum(c * c for c in day_staff)
+        self.histogram = [0] * (grid.n_staff + 1)
+        for c in day_staff:
+            self.histogram[c] += 1
+        self.max_cnt = max(day_staff, default=0)
+        self.min_cnt = min(day_staff, default=0)
+
+        self.penalties = self._calc_penalties()
+        self.score = -sum(self.penalties.values())
+
+    # -------------------------------------------------------------------------
+    # ペナルティ計算
+    # -------------------------------------------------------------------------
+
+    def _staff_penalty(self, staff_idx: int, off_cnt: int, night_cnt: int) -> Tuple[int, int]:
+        """スタッフ1人分の (公休数, 夜勤目標) ペナルティ"""
+        off_penalty = 0
+        if self.is_regular[staff_idx]:
+            off_penalty = abs(off_cnt - self.target_off_days) * self.config.PENALTY_OFF_DAYS
+        night_penalty = 0
+        target = self.night_targets[staff_idx]
+        if target > 0:
+            night_penalty = abs(night_cnt - target) * self.config.PENALTY_NIGHT_TARGET
+        return off_penalty, night_penalty
+
+    def _day_penalty(self, early: int, late: int, night: int, day_staff: int) -> Tuple[int, int]:
+        """1日分の (欠員, 重複) ペナルティ"""
+        config = self.config
+        missing = 0
+        if early == 0:
+            missing += config.PENALTY_EARLY_MISSING
+        if late == 0:
+            missing += config.PENALTY_LATE_MISSING
+        if night == 0:
+            missing += config.PENALTY_NIGHT_MISSING
+        if day_staff < config.MIN_DAY_STAFF:
+            missing += config.PENALTY_DAY_SHORTAGE
+        duplicate = 0
+        if early > 1:
+            duplicate += config.PENALTY_DUPLICATE
+        if late > 1:
+            duplicate += config.PENALTY_DUPLICATE
+        return missing, duplicate
+
+    def _calc_penalties(self) -> Dict[str, int]:
+        """集計からスコアの内訳を計算（ShiftSolver._calc_penalties()と同じ形式）"""
+        off_penalty = night_penalty = 0
+        for i in range(self.grid.n_staff):
+            off, night = self._staff_penalty(i, self.off_counts[i], self.night_counts[i])
+            off_penalty += off
+            night_penalty += night
+
+        missing = duplicate = 0
+        for stats in self.day_stats:
+            m, dup = self._day_penalty(*stats)
+            missing += m
+            duplicate += dup
+
+        return {
+            "off_days": off_penalty,
+            "night_target": night_penalty,
+            "missing": missing,
+            "duplicate": duplicate,
+            "variance": _variance_penalty(self.grid.days, self.total, self.sq_total,
+                                          self.max_cnt, self.min_cnt, self.config),
+        }
+
+    # -------------------------------------------------------------------------
+    # 差分評価
+    # -------------------------------------------------------------------------
+
+    def _collect(self, changes: Sequence[Change]) -> Tuple[Dict[int, List[int]], Dict[int, List[int]]]:
+        """変更をスタッフ別・日別の集計の増減にまとめる"""
+        cells = self.grid.cells
+        days = self.grid.days
+        staff_diff: Dict[int, List[int]] = {}
+        day_diff: Dict[int, List[int]] = {}
+        for staff_idx, day_idx, code in changes:
+            old = cells[staff_idx * days + day_idx]
+            if old == code:
+                continue
+            sd = staff_diff.get(staff_idx)
+            if sd is None:
+                sd = staff_diff[staff_idx] = [0, 0]
+            sd[0] += _IS_OFF[code] - _IS_OFF[old]
+            sd[1] += _IS_NIGHT[code] - _IS_NIGHT[old]
+            dd = day_diff.get(day_idx)
+            if dd is None:
+                dd = day_diff[day_idx] = [0, 0, 0, 0]
+            dd[0] += _IS_EARLY[code] - _IS_EARLY[old]
+            dd[1] += _IS_LATE[code] - _IS_LATE[old]
+            dd[2] += _IS_NIGHT[code] - _IS_NIGHT[old]
+            dd[3] += IS_DAY_SHIFT[code] - IS_DAY_SHIFT[old]
+        return staff_diff, day_diff
+
+    def _evaluate(self, staff_diff: Dict[int, List[int]],
+                  day_diff: Dict[int, List[int]]) -> Tuple[Dict[str, int], Tuple[int, int, int, int]]:
+        """
+        集計の増減を適用した場合のペナルティ内訳の増減を求める（集計は変更しない）
+
+        Returns:
+            (ペナルティ内訳の増減, 変更後の (合計, 二乗和, 最大, 最小))
+        """
+        off_delta = night_delta = 0
+        for staff_idx, (d_off, d_night) in staff_diff.items():
+            off_cnt = self.off_counts[staff_idx]
+            night_cnt = self.night_counts[staff_idx]
+            old_off, old_night = self._staff_penalty(staff_idx, off_cnt, night_cnt)
+            new_off, new_night = self._staff_penalty(staff_idx, off_cnt + d_off, night_cnt + d_night)
+            off_delta += new_off - old_off
+            night_delta += new_night - old_night
+
+        missing_delta = duplicate_delta = 0
+        total, sq_total = self.total, self.sq_total
+        histogram = self.histogram
+        max_cnt, min_cnt = self.max_cnt, self.min_cnt
+        moved = []
+        for day_idx, (d_early, d_late, d_night, d_staff) in day_diff.items():
+            early, late, night, day_staff = self.day_stats[day_idx]
+            old_missing, old_duplicate = self._day_penalty(early, late, night, day_staff)
+            new_staff = day_staff + d_staff
+            new_missing, new_duplicate = self._day_penalty(
+                early + d_early, late + d_late, night + d_night, new_staff)
+            missing_delta += new_missing - old_missing
+            duplicate_delta += new_duplicate - old_duplicate
+            if d_staff:
+                total += d_staff
+                sq_total += new_staff * new_staff - day_staff * day_staff
+                histogram[day_staff] -= 1
+                histogram[new_staff] += 1
+                moved.append((day_staff, new_staff))
+                max_cnt = max(max_cnt, new_staff)
+                min_cnt = min(min_cnt, new_staff)
+
+        variance_delta = 0
+        if moved:
+            # 最大・最小の日が減った場合は人数ごとの日数から探し直す
+            while histogram[max_cnt] == 0:
+                max_cnt -= 1
+            while histogram[min_cnt] == 0:
+                min_cnt += 1
+            for old_staff, new_staff in moved:
+                histogram[new_staff] -= 1
+                histogram[old_staff] += 1
+            variance_delta = _variance_penalty(self.grid.days, total, sq_total,
+                                               max_cnt, min_cnt, self.config)
+            variance_delta -= self.penalties["variance"]
+
+        delta = {
+            "off_days": off_delta,
+            "night_target": night_delta,
+            "missing": missing_delta,
+            "duplicate": duplicate_delta,
+            "variance": variance_delta,
+        }
+        return delta, (total, sq_total, max_cnt, min_cnt)
+
+    def delta(self, changes: Sequence[Change]) -> int:
+        """
+        変更を適用した場合のスコアの増分（正なら改善）
+
+        Args:
+            changes: (staff_idx, day_idx, 新しいコード) のリスト。同じセルは1回まで
+        """
+        delta, _ = self._evaluate(*self._collect(changes))
+        return -sum(delta.values())
+
+    def delta_set(self, staff_idx: int, day_idx: int, code: int) -> int:
+        """1セルを書き換えた場合のスコアの増分"""
+        return self.delta(((staff_idx, day_idx, code),))
+
+    def delta_swap(self, staff1: int, day1: int, staff2: int, day2: int) -> int:
+        """2セルの内容を入れ替えた場合のスコアの増分"""
+        return self.delta(self._swap_changes(staff1, day1, staff2, day2))
+
+    def _swap_changes(self, staff1: int, day1: int, staff2: int, day2: int) -> Tuple[Change, ...]:
+        """2セルの入れ替えを変更のリストにする"""
+        if staff1 == staff2 and day1 == day2:
+            return ()
+        grid = self.grid
+        return ((staff1, day1, grid.get(staff2, day2)), (staff2, day2, grid.get(staff1, day1)))
+
+    # -------------------------------------------------------------------------
+    # 変更の適用
+    # -------------------------------------------------------------------------
+
+    def apply(self, changes: Sequence[Change]) -> int:
+        """
+        変更をシフト表に書き込み、集計とスコアを更新する
+
+        Returns:
+            スコアの増分
+        """
+        staff_diff, day_diff = self._collect(changes)
+        delta, (total, sq_total, max_cnt, min_cnt) = self._evaluate(staff_diff, day_diff)
+
+        for staff_idx, day_idx, code in changes:
+            self.grid.set(staff_idx, day_idx, code)
+        for staff_idx, (d_off, d_night) in staff_diff.items():
+            self.off_counts[staff_idx] += d_off
+            self.night_counts[staff_idx] += d_night
+        for day_idx, diff in day_diff.items():
+            stats = self.day_stats[day_idx]
+            if diff[3]:
+                self.histogram[stats[3]] -= 1
+                self.histogram[stats[3] + diff[3]] += 1
+            for k in range(4):
+                stats[k] += diff[k]
+        self.total, self.sq_total = total, sq_total
+        self.max_cnt, self.min_cnt = max_cnt, min_cnt
+
+        for key, value in delta.items():
+            self.penalties[key] += value
+        score_delta = -sum(delta.values())
+        self.score += score_delta
+        return score_delta
+
+    def apply_set(self, staff_idx: int, day_idx: int, code: int) -> int:
+        """1セルを書き換える（スコアの増分を返す）"""
+        return self.apply(((staff_idx, day_idx, code),))
+
+    def apply_swap(self, staff1: int, day1: int, staff2: int, day2: int) -> int:
+        """2セルの内容を入れ替える（スコアの増分を返す）"""
+        return self.apply(self._swap_changes(staff1, day1, staff2, day2))
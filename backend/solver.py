@@ -7,14 +7,28 @@ Version: 2.1.0
 - ルール準拠チェック
 - スコアリングによる最適解探索
 - 平準化とバランス調整
+
+内部ではスケジュールをShiftGrid（整数コードの配列）、スタッフをインデックスで扱い、
+{スタッフ名: [日1, 日2, ...]} 形式への変換は結果・進捗の出力時にのみ行う。
 """
 import random
 import calendar
-import copy
-from typing import List, Dict, Tuple, Set
+import time
+from typing import List, Dict, Tuple, Optional, Callable, NamedTuple
 
-from .models import StaffData, ShiftTypes
-from .rules import ShiftRuleChecker
+from .models import StaffData, SolverEngine, NightAssignment, EarlyLateAssignment, OffAssignment
+from .grid import ShiftCode, CellFlag, ShiftGrid, IS_DAY_SHIFT, encode_shift
+from .rules import ShiftRuleChecker, PLACE_LEGAL
+from .scoring import ScoreEvaluator, calc_variance_penalty
+from .local_search import SimulatedAnnealing, TabuSearch
+from .lns import LargeNeighbourhoodSearch
+from .exact import ExactSolver
+from .colgen import ColumnGeneration, ColumnGenerationConfig
+from .feasibility import FeasibilityAnalyzer, FeasibilityReport
+from .assignment import NightFlowAssigner, EarlyLateFlowAssigner, OffFlowAssigner
+from .patterns import RowPatternSampler
+from .parallel import solve_parallel
+from .engines import get_engine
 
 
 # =============================================================================
@@ -44,6 +58,40 @@ class SolverConfig:
     
     # 早期終了スコア閾値
     EARLY_EXIT_SCORE = -100
+    
+    # 初期スコア（どのスケジュールよりも低い値）
+    INITIAL_BEST_SCORE = -999999
+    
+    # 進捗通知の間隔（試行回数）
+    PROGRESS_INTERVAL = 50
+    
+    # 解消できない欠員がある場合の試行回数の上限（計算前の分析で判明した場合）
+    INFEASIBLE_MAX_ATTEMPTS = 300
+
+
+# 集計用のシフトコードグループ
+_EARLY = (ShiftCode.EARLY,)
+_LATE = (ShiftCode.LATE,)
+_NIGHT = (ShiftCode.NIGHT,)
+_NIGHT_AND_REST = (ShiftCode.NIGHT, ShiftCode.NIGHT_REST)
+# 最終クリーンアップで空きを埋めるシフト（明けは夜勤の翌日の空きのみ）
+_CLEANUP_CODES = (ShiftCode.DAY, ShiftCode.OFF, ShiftCode.NIGHT_REST)
+
+
+# =============================================================================
+# 探索結果・例外
+# =============================================================================
+
+class SearchResult(NamedTuple):
+    """試行ループの結果"""
+    schedule: Optional[ShiftGrid]  # 最良スケジュール
+    score: int                     # 最良スコア
+    attempts: int                  # 完了した試行回数
+    early_exit: bool               # 早期終了条件を満たしたか
+
+
+class SolveCancelled(Exception):
+    """シフト計算がキャンセルされた"""
 
 
 # =============================================================================
@@ -69,8 +117,14 @@ class ShiftSolver:
     12. Final: 最終クリーンアップ
     """
     
-    def __init__(self, staff_data: List[StaffData], year: int, month: int, 
-                 target_off_days: int, max_attempts: int = 2500):
+    def __init__(self, staff_data: List[StaffData], year: int, month: int,
+                 target_off_days: int, max_attempts: int = 2500, workers: int = 1,
+                 time_limit_ms: Optional[int] = None, anneal_iterations: int = 0,
+                 anneal_time_ms: Optional[int] = None, lns_iterations: int = 0,
+                 lns_time_ms: Optional[int] = None, engine: str = SolverEngine.MULTISTART,
+                 night_assignment: str = NightAssignment.GREEDY,
+                 early_late_assignment: str = EarlyLateAssignment.GREEDY,
+                 off_assignment: str = OffAssignment.GREEDY):
         """
         Args:
             staff_data: スタッフデータリスト
@@ -78,15 +132,56 @@ class ShiftSolver:
             month: 月
             target_off_days: 常勤スタッフの目標公休日数
             max_attempts: 最大試行回数
+            workers: 並列ワーカープロセス数（1=逐次実行）
+            time_limit_ms: 計算時間の上限（ミリ秒）。超過時点の最良解を返す
+            anneal_iterations: 焼きなましによる改善の反復回数（0=行わない）
+            anneal_time_ms: 焼きなましによる改善の時間（ミリ秒）
+            lns_iterations: 破壊と再構築による改善の反復回数（0=行わない）
+            lns_time_ms: 破壊と再構築による改善の時間（ミリ秒）
+            engine: 探索エンジン名（SolverEngine、またはengines.pyで登録した名前）。
+                    tabuの場合はmax_attemptsをタブー探索の反復回数として扱う。
+                    exactの場合はtime_limit_msを厳密解法の時間上限として扱う。
+                    portfolioの場合は複数のエンジンを別々のプロセスで同時に実行する
+            night_assignment: Phase 3 の夜勤の配置方法（NightAssignment）
+            early_late_assignment: Phase 4 の早番・遅番の配置方法（EarlyLateAssignment）
+            off_assignment: Phase 6 の公休の配置方法（OffAssignment）。
+                            flowの場合は Phase 5 の日勤埋めの前に公休を配置する
         """
         self.year = year
         self.month = month
         self.target_off_days = target_off_days
         self.max_attempts = max_attempts
+        self.workers = workers
+        self.time_limit_ms = time_limit_ms
+        self.anneal_iterations = anneal_iterations
+        self.anneal_time_ms = anneal_time_ms
+        self.lns_iterations = lns_iterations
+        self.lns_time_ms = lns_time_ms
+        self.engine = engine
+        self.night_assignment = night_assignment
+        self.early_late_assignment = early_late_assignment
+        self.off_assignment = off_assignment
+        
+        # 直近のsolve()の実行結果
+        self.attempts_completed = 0
+        self.early_exit = False
+        self.exact_status: Optional[str] = None
+        self.feasibility: Optional[FeasibilityReport] = None
+        
+        # Phase 0-2 の結果（乱数を使わないため1回だけ計算して各試行で複製する）
+        self._seed_state: Optional[Tuple[ShiftGrid, List[int]]] = None
+        # 分枝限定法で使う日ごとの人数（_get_capacity_base()）
+        self._capacity_base: Optional[List[int]] = None
         
         _, self.days = calendar.monthrange(year, month)
         self.staff_dict_list = [s.dict() for s in staff_data]
-        self.regulars = [s for s in self.staff_dict_list if s["type"] == 0]
+        
+        # スタッフはstaff_dict_listの並び順のインデックスで扱う
+        self.names = [s["name"] for s in self.staff_dict_list]
+        self.n_staff = len(self.staff_dict_list)
+        self.regular_idx = [i for i, s in enumerate(self.staff_dict_list) if s["type"] == 0]
+        self._regular_set = set(self.regular_idx)
+        self.night_targets = [s["night_target"] for s in self.staff_dict_list]
         
         self.work_limits = self._calc_work_limits()
         self.rule_checker = ShiftRuleChecker(self.staff_dict_list, self.days)
@@ -95,271 +190,256 @@ class ShiftSolver:
     # ユーティリティメソッド
     # =========================================================================
     
-    def _calc_work_limits(self) -> Dict[str, int]:
+    def _calc_work_limits(self) -> List[int]:
         """各スタッフの勤務日数上限を計算"""
-        limits = {}
+        limits = []
         for s in self.staff_dict_list:
             if s["type"] != 0:
-                limits[s["name"]] = 99  # パートは制限なし
+                limits.append(99)  # パートは制限なし
             else:
                 extra_off = len(s["refresh_days"]) + len(s["paid_leave_days"])
-                limits[s["name"]] = self.days - (self.target_off_days + extra_off)
+                limits.append(self.days - (self.target_off_days + extra_off))
         return limits
     
-    def _count_day_staff(self, schedule: Dict, day_idx: int, shift_types: List[str]) -> int:
+    def _count_day_staff(self, grid: ShiftGrid, day_idx: int, codes: Tuple[int, ...]) -> int:
         """特定の日の特定シフトの人数をカウント"""
-        return sum(1 for s in self.staff_dict_list 
-                   if schedule[s["name"]][day_idx].strip() in shift_types)
+        return grid.count_in_column(day_idx, codes)
     
-    def _count_required_off(self, day_idx: int, schedule: Dict) -> int:
+    def _count_required_off(self, day_idx: int, grid: ShiftGrid) -> int:
         """その日の希望休・有休・リ休の数"""
-        cnt = 0
-        for s in self.staff_dict_list:
-            val = schedule[s["name"]][day_idx]
-            if val == ShiftTypes.HOPE_OFF or val.strip() in [ShiftTypes.PAID, ShiftTypes.REFRESH]:
-                cnt += 1
-        return cnt
+        return grid.count_in_column(day_idx, ShiftCode.REQUIRED_OFF_CODES)
     
-    def _get_daily_counts(self, schedule: Dict) -> List[int]:
+    def _get_daily_counts(self, grid: ShiftGrid) -> List[int]:
         """各日の日勤帯人員数を取得"""
-        return [self._count_day_staff(schedule, d, ShiftTypes.DAY_SHIFTS) 
+        return [self._count_day_staff(grid, d, ShiftCode.DAY_SHIFTS)
                 for d in range(self.days)]
     
-    def _calc_variance(self, counts: List[int]) -> float:
-        """人員数の分散を計算"""
-        if not counts:
-            return 0
-        avg = sum(counts) / len(counts)
-        return sum((c - avg) ** 2 for c in counts) / len(counts)
-    
-    def _count_current_off(self, name: str, schedule: Dict) -> int:
+    def _count_current_off(self, staff_idx: int, grid: ShiftGrid) -> int:
         """現在の公休数をカウント（希望休含む）"""
-        return sum(1 for x in schedule[name] if x.strip() == ShiftTypes.OFF)
+        return grid.count_in_row(staff_idx, ShiftCode.OFF_CODES)
     
-    def _place_night_shift(self, name: str, day_idx: int, schedule: Dict, 
-                           night_counts: Dict[str, int]) -> None:
+    def _place_night_shift(self, staff_idx: int, day_idx: int, grid: ShiftGrid,
+                           night_counts: List[int]) -> None:
         """夜勤とそれに伴う明け・公休を配置"""
-        schedule[name][day_idx] = ShiftTypes.NIGHT
-        night_counts[name] += 1
+        row = grid.rows[staff_idx]
+        grid.set(staff_idx, day_idx, ShiftCode.NIGHT)
+        night_counts[staff_idx] += 1
         
         # 明けの配置
         if day_idx + 1 < self.days:
-            if schedule[name][day_idx + 1] != ShiftTypes.HOPE_OFF:
-                schedule[name][day_idx + 1] = ShiftTypes.NIGHT_REST
+            if row[day_idx + 1] != ShiftCode.HOPE_OFF:
+                grid.set(staff_idx, day_idx + 1, ShiftCode.NIGHT_REST)
         
         # 公休の配置（空の場合のみ）
-        if day_idx + 2 < self.days and schedule[name][day_idx + 2] == "":
-            schedule[name][day_idx + 2] = ShiftTypes.OFF
+        if day_idx + 2 < self.days and row[day_idx + 2] == ShiftCode.EMPTY:
+            grid.set(staff_idx, day_idx + 2, ShiftCode.OFF)
     
-    def _try_convert_to_shift(self, name: str, day_idx: int, schedule: Dict,
-                               target_shift: str, fallback_shifts: List[str] = None) -> bool:
+    def _try_convert_to_shift(self, staff_idx: int, day_idx: int, grid: ShiftGrid,
+                               target_shift: int, fallback_shifts: List[int] = None) -> bool:
         """
         シフトを変換を試みる
         
         Returns:
             変換成功したかどうか
         """
-        original = schedule[name][day_idx]
-        schedule[name][day_idx] = ""
+        original = grid.rows[staff_idx][day_idx]
+        grid.set(staff_idx, day_idx, ShiftCode.EMPTY)
         
         # メインのシフトを試す
-        if self.rule_checker.check_rules(name, day_idx, schedule, target_shift):
-            schedule[name][day_idx] = target_shift
+        if self.rule_checker.check_rules(staff_idx, day_idx, grid, target_shift):
+            grid.set(staff_idx, day_idx, target_shift)
             return True
         
         # フォールバックシフトを試す
         if fallback_shifts:
             for shift in fallback_shifts:
-                if self.rule_checker.check_rules(name, day_idx, schedule, shift):
-                    schedule[name][day_idx] = shift
+                if self.rule_checker.check_rules(staff_idx, day_idx, grid, shift):
+                    grid.set(staff_idx, day_idx, shift)
                     return True
         
         # 失敗時は元に戻す
-        schedule[name][day_idx] = original
+        grid.set(staff_idx, day_idx, original)
         return False
     
     # =========================================================================
     # Phase 0: 前月末シフト処理
     # =========================================================================
     
-    def _phase0_prev_month(self, schedule: Dict, fixed_days: Dict[str, Set[int]]) -> None:
+    def _phase0_prev_month(self, grid: ShiftGrid) -> None:
         """前月末シフトに基づく1日目の強制設定"""
-        for s in self.staff_dict_list:
-            name = s["name"]
-            prev = s["prev_shift"].strip()
+        for i, s in enumerate(self.staff_dict_list):
+            prev = encode_shift(s["prev_shift"].strip())
             
-            if prev == ShiftTypes.NIGHT_REST:
+            if prev == ShiftCode.NIGHT_REST:
                 # 前月末が明けなら1日目は公休
-                schedule[name][0] = ShiftTypes.OFF
-                fixed_days[name].add(0)
-            elif prev == ShiftTypes.NIGHT:
+                grid.set(i, 0, ShiftCode.OFF)
+                grid.add_flag(i, 0, CellFlag.FIXED)
+            elif prev == ShiftCode.NIGHT:
                 # 前月末が夜勤なら1日目は明け、2日目は公休
-                schedule[name][0] = ShiftTypes.NIGHT_REST
-                fixed_days[name].add(0)
+                grid.set(i, 0, ShiftCode.NIGHT_REST)
+                grid.add_flag(i, 0, CellFlag.FIXED)
                 if self.days > 1:
-                    schedule[name][1] = ShiftTypes.OFF
-                    fixed_days[name].add(1)
+                    grid.set(i, 1, ShiftCode.OFF)
+                    grid.add_flag(i, 1, CellFlag.FIXED)
     
     # =========================================================================
     # Phase 1: 固定シフトと希望の設定
     # =========================================================================
     
-    def _phase1_fixed_and_requests(self, schedule: Dict, fixed_days: Dict[str, Set[int]], 
-                                    night_counts: Dict[str, int]) -> None:
+    def _phase1_fixed_and_requests(self, grid: ShiftGrid, night_counts: List[int]) -> None:
         """固定シフトと希望の設定"""
-        for s in self.staff_dict_list:
-            name = s["name"]
-            
+        for i, s in enumerate(self.staff_dict_list):
             # 年始固定シフト（1-3日）
-            self._set_fixed_shifts(s, schedule, fixed_days, night_counts)
+            self._set_fixed_shifts(i, s, grid, night_counts)
             
             # 休暇設定
-            self._set_vacation_requests(s, schedule, fixed_days)
+            self._set_vacation_requests(i, s, grid)
             
             # 希望シフト
-            self._set_shift_requests(s, schedule, fixed_days)
+            self._set_shift_requests(i, s, grid)
             
             # パート設定
-            self._set_part_time_shifts(s, schedule)
+            self._set_part_time_shifts(i, s, grid)
     
-    def _set_fixed_shifts(self, staff: Dict, schedule: Dict, 
-                          fixed_days: Dict[str, Set[int]], night_counts: Dict[str, int]) -> None:
-        """年始固定シフトを設定"""
-        name = staff["name"]
+    def _set_fixed_shifts(self, staff_idx: int, staff: Dict, grid: ShiftGrid,
+                          night_counts: List[int]) -> None:
+        """年始固定シフトを設定（未知のシフト記号は無視する）"""
+        row = grid.rows[staff_idx]
+        fixed = CellFlag.FIXED
         for i in range(min(3, self.days)):
-            if i in fixed_days[name]:
+            if grid.is_fixed(staff_idx, i):
                 continue
             if len(staff["fixed_shifts"]) > i and staff["fixed_shifts"][i]:
-                fs = staff["fixed_shifts"][i]
-                schedule[name][i] = fs
-                fixed_days[name].add(i)
+                fs = encode_shift(staff["fixed_shifts"][i])
+                if fs == ShiftCode.EMPTY:
+                    continue
+                grid.set(staff_idx, i, fs)
+                grid.add_flag(staff_idx, i, fixed)
                 
-                if fs == ShiftTypes.NIGHT:
-                    night_counts[name] += 1
-                    if i + 1 < self.days and schedule[name][i+1] == "":
-                        schedule[name][i+1] = ShiftTypes.NIGHT_REST
-                        fixed_days[name].add(i+1)
+                if fs == ShiftCode.NIGHT:
+                    night_counts[staff_idx] += 1
+                    if i + 1 < self.days and row[i+1] == ShiftCode.EMPTY:
+                        grid.set(staff_idx, i+1, ShiftCode.NIGHT_REST)
+                        grid.add_flag(staff_idx, i+1, fixed)
                     if i + 2 < self.days:
-                        if schedule[name][i+2] == "":
-                            schedule[name][i+2] = ShiftTypes.OFF
-                            fixed_days[name].add(i+2)
-                        elif schedule[name][i+2] == ShiftTypes.HOPE_OFF:
-                            fixed_days[name].add(i+2)
-    
-    def _set_vacation_requests(self, staff: Dict, schedule: Dict, 
-                                fixed_days: Dict[str, Set[int]]) -> None:
+                        if row[i+2] == ShiftCode.EMPTY:
+                            grid.set(staff_idx, i+2, ShiftCode.OFF)
+                            grid.add_flag(staff_idx, i+2, fixed)
+                        elif row[i+2] == ShiftCode.HOPE_OFF:
+                            grid.add_flag(staff_idx, i+2, fixed)
+    
+    def _set_vacation_requests(self, staff_idx: int, staff: Dict, grid: ShiftGrid) -> None:
         """休暇リクエストを設定"""
-        name = staff["name"]
-        
-        # 希望休
-        for d in staff["req_off"]:
-            if 0 < d <= self.days and schedule[name][d-1] == "":
-                schedule[name][d-1] = ShiftTypes.HOPE_OFF
-                fixed_days[name].add(d-1)
-        
-        # リフレッシュ休暇
-        for d in staff["refresh_days"]:
-            if 0 < d <= self.days and schedule[name][d-1] == "":
-                schedule[name][d-1] = ShiftTypes.REFRESH
-                fixed_days[name].add(d-1)
-        
-        # 有給休暇
-        for d in staff["paid_leave_days"]:
-            if 0 < d <= self.days and schedule[name][d-1] == "":
-                schedule[name][d-1] = ShiftTypes.PAID
-                fixed_days[name].add(d-1)
-    
-    def _set_shift_requests(self, staff: Dict, schedule: Dict, 
-                            fixed_days: Dict[str, Set[int]]) -> None:
+        row = grid.rows[staff_idx]
+        requested = CellFlag.FIXED | CellFlag.REQUESTED
+        
+        request_types = [
+            ("req_off", ShiftCode.HOPE_OFF),         # 希望休
+            ("refresh_days", ShiftCode.REFRESH),     # リフレッシュ休暇
+            ("paid_leave_days", ShiftCode.PAID),     # 有給休暇
+        ]
+        
+        for req_key, code in request_types:
+            for d in staff[req_key]:
+                if 0 < d <= self.days and row[d-1] == ShiftCode.EMPTY:
+                    grid.set(staff_idx, d-1, code)
+                    grid.add_flag(staff_idx, d-1, requested)
+    
+    def _set_shift_requests(self, staff_idx: int, staff: Dict, grid: ShiftGrid) -> None:
         """シフト希望を設定"""
-        name = staff["name"]
+        row = grid.rows[staff_idx]
+        requested = CellFlag.FIXED | CellFlag.REQUESTED
         
         request_types = [
-            ("req_early", ShiftTypes.EARLY),
-            ("req_late", ShiftTypes.LATE),
-            ("req_day", ShiftTypes.DAY),
+            ("req_early", ShiftCode.EARLY),
+            ("req_late", ShiftCode.LATE),
+            ("req_day", ShiftCode.DAY),
         ]
         
         for req_key, shift_type in request_types:
             for d in staff[req_key]:
-                if 0 < d <= self.days and schedule[name][d-1] == "":
-                    if self.rule_checker.check_rules(name, d-1, schedule, shift_type):
-                        schedule[name][d-1] = shift_type
-                        fixed_days[name].add(d-1)
+                if 0 < d <= self.days and row[d-1] == ShiftCode.EMPTY:
+                    if self.rule_checker.check_rules(staff_idx, d-1, grid, shift_type):
+                        grid.set(staff_idx, d-1, shift_type)
+                        grid.add_flag(staff_idx, d-1, requested)
     
-    def _set_part_time_shifts(self, staff: Dict, schedule: Dict) -> None:
+    def _set_part_time_shifts(self, staff_idx: int, staff: Dict, grid: ShiftGrid) -> None:
         """パートスタッフのシフトを設定"""
-        name = staff["name"]
+        row = grid.rows[staff_idx]
         
         if staff["type"] == 1:  # 日勤パート
             for d in range(self.days):
-                if schedule[name][d] == "":
-                    schedule[name][d] = ShiftTypes.DAY
-                    
+                if row[d] == ShiftCode.EMPTY:
+                    grid.set(staff_idx, d, ShiftCode.DAY)
+        
         elif staff["type"] == 2:  # 早番パート
             for d in range(self.days):
-                if schedule[name][d] == "":
+                if row[d] == ShiftCode.EMPTY:
                     # 早番が不足している日のみ早番、それ以外は日勤
-                    if self._count_day_staff(schedule, d, [ShiftTypes.EARLY]) == 0:
-                        schedule[name][d] = ShiftTypes.EARLY
+                    if self._count_day_staff(grid, d, _EARLY) == 0:
+                        grid.set(staff_idx, d, ShiftCode.EARLY)
                     else:
-                        schedule[name][d] = ShiftTypes.DAY
+                        grid.set(staff_idx, d, ShiftCode.DAY)
     
     # =========================================================================
     # Phase 2: 夜勤希望の配置
     # =========================================================================
     
-    def _phase2_night_requests(self, schedule: Dict, fixed_days: Dict[str, Set[int]], 
-                                night_counts: Dict[str, int]) -> None:
+    def _phase2_night_requests(self, grid: ShiftGrid, night_counts: List[int]) -> None:
         """夜勤希望の配置"""
-        for s in self.staff_dict_list:
-            name = s["name"]
+        for i, s in enumerate(self.staff_dict_list):
             if "req_night" not in s or s["type"] != 0:
                 continue
-                
+            
             for d_idx in s["req_night"]:
                 d = d_idx - 1
-                if 0 <= d < self.days and d not in fixed_days[name]:
-                    if self.rule_checker.can_place_night(name, d, schedule):
-                        self._place_night_with_fixed(name, d, schedule, fixed_days, night_counts)
-    
-    def _place_night_with_fixed(self, name: str, day_idx: int, schedule: Dict,
-                                 fixed_days: Dict[str, Set[int]], 
-                                 night_counts: Dict[str, int]) -> None:
-        """夜勤を配置し、関連日をfixed_daysに追加"""
-        schedule[name][day_idx] = ShiftTypes.NIGHT
-        night_counts[name] += 1
-        fixed_days[name].add(day_idx)
-        
-        if day_idx + 1 < self.days and (day_idx + 1) not in fixed_days[name]:
-            if schedule[name][day_idx + 1] != ShiftTypes.HOPE_OFF:
-                schedule[name][day_idx + 1] = ShiftTypes.NIGHT_REST
-            fixed_days[name].add(day_idx + 1)
-        
-        if day_idx + 2 < self.days and (day_idx + 2) not in fixed_days[name]:
-            if schedule[name][day_idx + 2] == "":
-                schedule[name][day_idx + 2] = ShiftTypes.OFF
-                fixed_days[name].add(day_idx + 2)
-            elif schedule[name][day_idx + 2] == ShiftTypes.HOPE_OFF:
-                fixed_days[name].add(day_idx + 2)
+                if 0 <= d < self.days and not grid.is_fixed(i, d):
+                    if self.rule_checker.can_place_night(i, d, grid):
+                        self._place_night_with_fixed(i, d, grid, night_counts)
+    
+    def _place_night_with_fixed(self, staff_idx: int, day_idx: int, grid: ShiftGrid,
+                                 night_counts: List[int]) -> None:
+        """夜勤を配置し、関連日を固定セルにする"""
+        row = grid.rows[staff_idx]
+        grid.set(staff_idx, day_idx, ShiftCode.NIGHT)
+        night_counts[staff_idx] += 1
+        grid.add_flag(staff_idx, day_idx, CellFlag.FIXED | CellFlag.REQUESTED)
+        
+        if day_idx + 1 < self.days and not grid.is_fixed(staff_idx, day_idx + 1):
+            if row[day_idx + 1] != ShiftCode.HOPE_OFF:
+                grid.set(staff_idx, day_idx + 1, ShiftCode.NIGHT_REST)
+            grid.add_flag(staff_idx, day_idx + 1, CellFlag.FIXED)
+        
+        if day_idx + 2 < self.days and not grid.is_fixed(staff_idx, day_idx + 2):
+            if row[day_idx + 2] == ShiftCode.EMPTY:
+                grid.set(staff_idx, day_idx + 2, ShiftCode.OFF)
+                grid.add_flag(staff_idx, day_idx + 2, CellFlag.FIXED)
+            elif row[day_idx + 2] == ShiftCode.HOPE_OFF:
+                grid.add_flag(staff_idx, day_idx + 2, CellFlag.FIXED)
     
     # =========================================================================
     # Phase 3: 毎日の夜勤配置
     # =========================================================================
     
-    def _phase3_daily_night(self, schedule: Dict, night_counts: Dict[str, int]) -> None:
+    def _phase3_daily_night(self, grid: ShiftGrid, night_counts: List[int]) -> None:
         """毎日の夜勤配置（希望休に合わせて最適化）"""
+        if self.night_assignment == NightAssignment.FLOW:
+            # 最小費用流で割り当て、割り当てられなかった日は貪欲法で埋める
+            NightFlowAssigner(self, SolverConfig).assign(grid, night_counts)
+            self._fill_remaining_nights(grid, night_counts)
+            return
+        
         # 希望休の2日前に夜勤を優先配置
-        self._align_nights_with_off_days(schedule, night_counts)
+        self._align_nights_with_off_days(grid, night_counts)
         
         # 残りの日に夜勤配置
-        self._fill_remaining_nights(schedule, night_counts)
+        self._fill_remaining_nights(grid, night_counts)
     
-    def _align_nights_with_off_days(self, schedule: Dict, night_counts: Dict[str, int]) -> None:
+    def _align_nights_with_off_days(self, grid: ShiftGrid, night_counts: List[int]) -> None:
         """希望休に合わせて夜勤を配置"""
-        for s in self.regulars:
-            name = s["name"]
-            if night_counts[name] >= s["night_target"]:
+        for i in self.regular_idx:
+            s = self.staff_dict_list[i]
+            if night_counts[i] >= s["night_target"]:
                 continue
             
             off_days = set(s["req_off"] + s["refresh_days"] + s["paid_leave_days"])
@@ -369,42 +449,41 @@ class ShiftSolver:
                 if night_day < 0 or night_day >= self.days:
                     continue
                 
-                if self._count_day_staff(schedule, night_day, [ShiftTypes.NIGHT]) > 0:
+                if self._count_day_staff(grid, night_day, _NIGHT) > 0:
                     continue
                 
-                if self.rule_checker.can_place_night(name, night_day, schedule):
-                    self._place_night_shift(name, night_day, schedule, night_counts)
+                if self.rule_checker.can_place_night(i, night_day, grid):
+                    self._place_night_shift(i, night_day, grid, night_counts)
                     
-                    if night_counts[name] >= s["night_target"]:
+                    if night_counts[i] >= s["night_target"]:
                         break
     
-    def _fill_remaining_nights(self, schedule: Dict, night_counts: Dict[str, int]) -> None:
+    def _fill_remaining_nights(self, grid: ShiftGrid, night_counts: List[int]) -> None:
         """残りの日に夜勤を配置"""
         days_order = list(range(self.days))
         random.shuffle(days_order)
         
         for d in days_order:
-            if self._count_day_staff(schedule, d, [ShiftTypes.NIGHT]) > 0:
+            if self._count_day_staff(grid, d, _NIGHT) > 0:
                 continue
             
-            candidates = self._get_night_candidates(d, schedule, night_counts)
+            candidates = self._get_night_candidates(d, grid, night_counts)
             
             if candidates:
                 chosen = self._select_best_candidate(candidates)
-                self._place_night_shift(chosen["name"], d, schedule, night_counts)
+                self._place_night_shift(chosen, d, grid, night_counts)
     
-    def _get_night_candidates(self, day_idx: int, schedule: Dict, 
-                               night_counts: Dict[str, int]) -> List[Tuple[Dict, int]]:
-        """夜勤配置可能な候補者とその優先度を取得"""
+    def _get_night_candidates(self, day_idx: int, grid: ShiftGrid,
+                               night_counts: List[int]) -> List[Tuple[int, int]]:
+        """夜勤配置可能な候補者（スタッフインデックス）とその優先度を取得"""
         candidates = []
-        for s in self.regulars:
-            name = s["name"]
-            if self.rule_checker.can_place_night(name, day_idx, schedule):
-                priority = s["night_target"] - night_counts[name]
-                candidates.append((s, priority))
+        for i in self.regular_idx:
+            if self.rule_checker.can_place_night(i, day_idx, grid):
+                priority = self.night_targets[i] - night_counts[i]
+                candidates.append((i, priority))
         return candidates
     
-    def _select_best_candidate(self, candidates: List[Tuple[Dict, int]]) -> Dict:
+    def _select_best_candidate(self, candidates: List[Tuple[int, int]]) -> int:
         """最も優先度の高い候補者を選択"""
         candidates.sort(key=lambda x: -x[1])
         top_priority = candidates[0][1]
@@ -416,127 +495,144 @@ class ShiftSolver:
     # Phase 4: 早番・遅番の配置
     # =========================================================================
     
-    def _phase4_early_late(self, schedule: Dict) -> None:
+    def _phase4_early_late(self, grid: ShiftGrid) -> None:
         """早番・遅番の配置（毎日各1名）"""
+        if self.early_late_assignment == EarlyLateAssignment.FLOW:
+            # 月全体を最小費用流で割り当て、割り当てられなかった日は日ごとに埋める
+            EarlyLateFlowAssigner(self, SolverConfig).assign(grid)
+        
         for d in range(self.days):
-            self._place_late_shift(d, schedule)
-            self._place_early_shift(d, schedule)
+            self._place_late_shift(d, grid)
+            self._place_early_shift(d, grid)
     
-    def _place_late_shift(self, day_idx: int, schedule: Dict) -> None:
+    def _place_late_shift(self, day_idx: int, grid: ShiftGrid) -> None:
         """遅番を配置"""
-        if self._count_day_staff(schedule, day_idx, [ShiftTypes.LATE]) > 0:
+        if self._count_day_staff(grid, day_idx, _LATE) > 0:
             return
-            
-        candidates = [s for s in self.regulars 
-                      if schedule[s["name"]][day_idx] == "" 
-                      and self.rule_checker.check_rules(s["name"], day_idx, schedule, ShiftTypes.LATE)]
+        
+        candidates = [i for i in self.regular_idx
+                      if grid.rows[i][day_idx] == ShiftCode.EMPTY
+                      and self.rule_checker.check_rules(i, day_idx, grid, ShiftCode.LATE)]
         
         if candidates:
             random.shuffle(candidates)
-            schedule[candidates[0]["name"]][day_idx] = ShiftTypes.LATE
+            grid.set(candidates[0], day_idx, ShiftCode.LATE)
     
-    def _place_early_shift(self, day_idx: int, schedule: Dict) -> None:
+    def _place_early_shift(self, day_idx: int, grid: ShiftGrid) -> None:
         """早番を配置"""
-        if self._count_day_staff(schedule, day_idx, [ShiftTypes.EARLY]) > 0:
+        if self._count_day_staff(grid, day_idx, _EARLY) > 0:
             return
-            
-        candidates = [s for s in self.regulars 
-                      if schedule[s["name"]][day_idx] == "" 
-                      and self.rule_checker.check_rules(s["name"], day_idx, schedule, ShiftTypes.EARLY)]
+        
+        candidates = [i for i in self.regular_idx
+                      if grid.rows[i][day_idx] == ShiftCode.EMPTY
+                      and self.rule_checker.check_rules(i, day_idx, grid, ShiftCode.EARLY)]
         
         # 早番パートも候補に追加
-        for s in self.staff_dict_list:
-            if s["type"] == 2 and schedule[s["name"]][day_idx] == "":
-                candidates.append(s)
+        for i, s in enumerate(self.staff_dict_list):
+            if s["type"] == 2 and grid.rows[i][day_idx] == ShiftCode.EMPTY:
+                candidates.append(i)
         
         if candidates:
             random.shuffle(candidates)
-            schedule[candidates[0]["name"]][day_idx] = ShiftTypes.EARLY
+            grid.set(candidates[0], day_idx, ShiftCode.EARLY)
     
     # =========================================================================
     # Phase 5-6: 日勤・公休の配置
     # =========================================================================
     
-    def _phase5_fill_day(self, schedule: Dict) -> None:
+    def _phase5_fill_day(self, grid: ShiftGrid) -> None:
         """日勤で埋める（平準化を考慮）"""
-        for s in self.regulars:
-            name = s["name"]
-            empty_days = [d for d in range(self.days) if schedule[name][d] == ""]
-            empty_days.sort(key=lambda d: self._count_day_staff(schedule, d, ShiftTypes.DAY_SHIFTS))
+        if self.off_assignment == OffAssignment.FLOW:
+            # 公休を先に全員分まとめて配置し、残りを日勤で埋める
+            OffFlowAssigner(self).assign(grid)
+        
+        for i in self.regular_idx:
+            row = grid.rows[i]
+            empty_days = [d for d in range(self.days) if row[d] == ShiftCode.EMPTY]
+            empty_days.sort(key=lambda d: self._count_day_staff(grid, d, ShiftCode.DAY_SHIFTS))
             
             for d in empty_days:
-                curr_work = sum(1 for x in schedule[name] if self.rule_checker.is_work_shift(x))
-                if curr_work >= self.work_limits[name]:
+                curr_work = grid.count_in_row(i, ShiftCode.WORK_SHIFTS)
+                if curr_work >= self.work_limits[i]:
                     break
-                if self.rule_checker.check_rules(name, d, schedule, ShiftTypes.DAY):
-                    schedule[name][d] = ShiftTypes.DAY
+                if self.rule_checker.check_rules(i, d, grid, ShiftCode.DAY):
+                    grid.set(i, d, ShiftCode.DAY)
     
-    def _phase6_fill_off(self, schedule: Dict) -> None:
+    def _phase6_fill_off(self, grid: ShiftGrid) -> None:
         """公休の最適配置（目標数を超えないように）"""
-        for s in self.regulars:
-            name = s["name"]
-            
-            current_off = self._count_current_off(name, schedule)
+        # 各日の常勤の空きセル数（公休を置くたびに更新する）
+        empty_counts = [sum(1 for j in self.regular_idx if grid.rows[j][d] == ShiftCode.EMPTY)
+                        for d in range(self.days)]
+        
+        for i in self.regular_idx:
+            current_off = self._count_current_off(i, grid)
             if current_off >= self.target_off_days:
                 continue
             
-            empty_days = [d for d in range(self.days) if schedule[name][d] == ""]
+            row = grid.rows[i]
+            empty_days = [d for d in range(self.days) if row[d] == ShiftCode.EMPTY]
             if not empty_days:
                 continue
             
             needed_off = self.target_off_days - current_off
-            day_scores = self._calc_off_day_scores(name, empty_days, schedule)
+            day_scores = self._calc_off_day_scores(i, empty_days, grid, empty_counts)
             
             placed_count = 0
             for d, _ in day_scores:
                 if placed_count >= needed_off:
                     break
-                if self.rule_checker.check_rules(name, d, schedule, ShiftTypes.OFF):
-                    schedule[name][d] = ShiftTypes.OFF
+                if self.rule_checker.check_rules(i, d, grid, ShiftCode.OFF):
+                    grid.set(i, d, ShiftCode.OFF)
+                    empty_counts[d] -= 1
                     placed_count += 1
     
-    def _calc_off_day_scores(self, name: str, empty_days: List[int], 
-                              schedule: Dict) -> List[Tuple[int, int]]:
-        """公休配置の優先度スコアを計算"""
+    def _calc_off_day_scores(self, staff_idx: int, empty_days: List[int],
+                              grid: ShiftGrid, empty_counts: List[int]) -> List[Tuple[int, int]]:
+        """
+        公休配置の優先度スコアを計算
+        
+        Args:
+            empty_counts: 各日の常勤の空きセル数
+        """
         day_scores = []
         for d in empty_days:
-            day_cnt = self._count_day_staff(schedule, d, ShiftTypes.DAY_SHIFTS)
-            fixed_off = self._count_required_off(d, schedule)
-            others_empty = sum(1 for s2 in self.regulars 
-                               if s2["name"] != name and schedule[s2["name"]][d] == "")
+            day_cnt = self._count_day_staff(grid, d, ShiftCode.DAY_SHIFTS)
+            fixed_off = self._count_required_off(d, grid)
+            # 自分の空きセルを除く（empty_daysは自分が空いている日）
+            others_empty = empty_counts[d] - 1
             score = day_cnt + others_empty - fixed_off
             day_scores.append((d, score))
         
         day_scores.sort(key=lambda x: -x[1])
         return day_scores
     
-    def _phase6b_fill_remaining_with_day(self, schedule: Dict) -> None:
+    def _phase6b_fill_remaining_with_day(self, grid: ShiftGrid) -> None:
         """残りの空スロットを日勤または公休で埋める"""
-        for s in self.regulars:
-            name = s["name"]
-            empty_days = [d for d in range(self.days) if schedule[name][d] == ""]
-            empty_days.sort(key=lambda d: self._count_day_staff(schedule, d, ShiftTypes.DAY_SHIFTS))
+        for i in self.regular_idx:
+            row = grid.rows[i]
+            empty_days = [d for d in range(self.days) if row[d] == ShiftCode.EMPTY]
+            empty_days.sort(key=lambda d: self._count_day_staff(grid, d, ShiftCode.DAY_SHIFTS))
             
             for d in empty_days:
-                self._fill_empty_slot(name, d, schedule)
+                self._fill_empty_slot(i, d, grid)
     
-    def _fill_empty_slot(self, name: str, day_idx: int, schedule: Dict) -> None:
+    def _fill_empty_slot(self, staff_idx: int, day_idx: int, grid: ShiftGrid) -> None:
         """空スロットを埋める（日勤→早番→遅番→公休の順）"""
-        shift_order = [ShiftTypes.DAY, ShiftTypes.EARLY, ShiftTypes.LATE, ShiftTypes.OFF]
+        shift_order = [ShiftCode.DAY, ShiftCode.EARLY, ShiftCode.LATE, ShiftCode.OFF]
         
         for shift in shift_order:
-            if self.rule_checker.check_rules(name, day_idx, schedule, shift):
-                schedule[name][day_idx] = shift
+            if self.rule_checker.check_rules(staff_idx, day_idx, grid, shift):
+                grid.set(staff_idx, day_idx, shift)
                 return
     
     # =========================================================================
     # Phase 7-9: 調整フェーズ
     # =========================================================================
     
-    def _phase7_balance(self, schedule: Dict, fixed_days: Dict[str, Set[int]]) -> None:
+    def _phase7_balance(self, grid: ShiftGrid) -> None:
         """人員平準化調整"""
         for _ in range(SolverConfig.BALANCE_ITERATIONS):
-            daily_counts = self._get_daily_counts(schedule)
+            daily_counts = self._get_daily_counts(grid)
             if not daily_counts:
                 break
             
@@ -546,196 +642,223 @@ class ShiftSolver:
             if daily_counts[max_day] - daily_counts[min_day] < 2:
                 break
             
-            if not self._try_swap_shifts(schedule, fixed_days, max_day, min_day):
+            if not self._try_swap_shifts(grid, max_day, min_day):
                 break
     
-    def _try_swap_shifts(self, schedule: Dict, fixed_days: Dict[str, Set[int]],
-                          max_day: int, min_day: int) -> bool:
+    def _try_swap_shifts(self, grid: ShiftGrid, max_day: int, min_day: int) -> bool:
         """日勤と公休をスワップして平準化を試みる"""
-        for s in self.regulars:
-            name = s["name"]
-            if max_day in fixed_days[name] or min_day in fixed_days[name]:
+        for i in self.regular_idx:
+            if grid.is_fixed(i, max_day) or grid.is_fixed(i, min_day):
                 continue
             
-            if schedule[name][max_day] == ShiftTypes.DAY and schedule[name][min_day] == ShiftTypes.OFF:
-                schedule[name][max_day] = ""
-                schedule[name][min_day] = ""
+            row = grid.rows[i]
+            if row[max_day] == ShiftCode.DAY and row[min_day] == ShiftCode.OFF:
+                grid.set(i, max_day, ShiftCode.EMPTY)
+                grid.set(i, min_day, ShiftCode.EMPTY)
                 
-                if (self.rule_checker.check_rules(name, max_day, schedule, ShiftTypes.OFF) and 
-                    self.rule_checker.check_rules(name, min_day, schedule, ShiftTypes.DAY)):
-                    schedule[name][max_day] = ShiftTypes.OFF
-                    schedule[name][min_day] = ShiftTypes.DAY
+                if (self.rule_checker.check_rules(i, max_day, grid, ShiftCode.OFF) and
+                    self.rule_checker.check_rules(i, min_day, grid, ShiftCode.DAY)):
+                    grid.set(i, max_day, ShiftCode.OFF)
+                    grid.set(i, min_day, ShiftCode.DAY)
                     return True
                 else:
-                    schedule[name][max_day] = ShiftTypes.DAY
-                    schedule[name][min_day] = ShiftTypes.OFF
+                    grid.set(i, max_day, ShiftCode.DAY)
+                    grid.set(i, min_day, ShiftCode.OFF)
         
         return False
     
-    def _phase8_adjust(self, schedule: Dict, fixed_days: Dict[str, Set[int]]) -> None:
+    def _phase8_adjust(self, grid: ShiftGrid) -> None:
         """人員調整（不足解消）"""
         for _ in range(SolverConfig.ADJUST_ITERATIONS):
-            if not self._adjust_shortages(schedule, fixed_days):
+            if not self._adjust_shortages(grid):
                 break
     
-    def _adjust_shortages(self, schedule: Dict, fixed_days: Dict[str, Set[int]]) -> bool:
+    def _adjust_shortages(self, grid: ShiftGrid) -> bool:
         """不足を解消する調整を1回行う"""
         for d in range(self.days):
-            early_cnt = self._count_day_staff(schedule, d, [ShiftTypes.EARLY])
-            late_cnt = self._count_day_staff(schedule, d, [ShiftTypes.LATE])
-            day_total = self._count_day_staff(schedule, d, ShiftTypes.DAY_SHIFTS)
+            early_cnt = self._count_day_staff(grid, d, _EARLY)
+            late_cnt = self._count_day_staff(grid, d, _LATE)
+            day_total = self._count_day_staff(grid, d, ShiftCode.DAY_SHIFTS)
             
             # 早番不足
             if early_cnt == 0:
-                if self._convert_day_to_shift(schedule, fixed_days, d, ShiftTypes.EARLY):
+                if self._convert_day_to_shift(grid, d, ShiftCode.EARLY):
                     return True
             
             # 遅番不足
             if late_cnt == 0:
-                if self._convert_day_to_shift(schedule, fixed_days, d, ShiftTypes.LATE):
+                if self._convert_day_to_shift(grid, d, ShiftCode.LATE):
                     return True
             
             # 日勤帯不足
             if day_total < SolverConfig.MIN_DAY_STAFF:
-                if self._convert_off_to_day(schedule, fixed_days, d):
+                if self._convert_off_to_day(grid, d):
                     return True
         
         return False
     
-    def _convert_day_to_shift(self, schedule: Dict, fixed_days: Dict[str, Set[int]],
-                               day_idx: int, target_shift: str) -> bool:
+    def _convert_day_to_shift(self, grid: ShiftGrid, day_idx: int, target_shift: int) -> bool:
         """日勤を指定シフトに変換"""
-        for s in self.regulars:
-            name = s["name"]
-            if day_idx in fixed_days[name]:
+        for i in self.regular_idx:
+            if grid.is_fixed(i, day_idx):
                 continue
-            if schedule[name][day_idx] == ShiftTypes.DAY:
-                if self._try_convert_to_shift(name, day_idx, schedule, target_shift):
+            if grid.rows[i][day_idx] == ShiftCode.DAY:
+                if self._try_convert_to_shift(i, day_idx, grid, target_shift):
                     return True
         return False
     
-    def _convert_off_to_day(self, schedule: Dict, fixed_days: Dict[str, Set[int]],
-                            day_idx: int) -> bool:
+    def _convert_off_to_day(self, grid: ShiftGrid, day_idx: int) -> bool:
         """公休を日勤に変換"""
-        for s in self.regulars:
-            name = s["name"]
-            if day_idx in fixed_days[name]:
+        for i in self.regular_idx:
+            if grid.is_fixed(i, day_idx):
                 continue
-            if schedule[name][day_idx] == ShiftTypes.OFF:
+            row = grid.rows[i]
+            if row[day_idx] == ShiftCode.OFF:
                 # 他に人員が余っている日があるか確認
-                other_days = [od for od in range(self.days) 
-                              if od != day_idx 
-                              and schedule[name][od] == ShiftTypes.OFF 
-                              and od not in fixed_days[name]
-                              and self._count_day_staff(schedule, od, ShiftTypes.DAY_SHIFTS) >= 4]
+                other_days = [od for od in range(self.days)
+                              if od != day_idx
+                              and row[od] == ShiftCode.OFF
+                              and not grid.is_fixed(i, od)
+                              and self._count_day_staff(grid, od, ShiftCode.DAY_SHIFTS) >= 4]
                 
-                if other_days and self._try_convert_to_shift(name, day_idx, schedule, ShiftTypes.DAY):
+                if other_days and self._try_convert_to_shift(i, day_idx, grid, ShiftCode.DAY):
                     return True
         return False
     
-    def _phase9_reduce_duplicates(self, schedule: Dict, fixed_days: Dict[str, Set[int]]) -> None:
+    def _phase9_reduce_duplicates(self, grid: ShiftGrid) -> None:
         """早番・遅番過多の調整（厳守：各日1名ずつ）"""
         for d in range(self.days):
-            self._reduce_shift_duplicates(schedule, fixed_days, d, ShiftTypes.EARLY, ShiftTypes.LATE)
-            self._reduce_shift_duplicates(schedule, fixed_days, d, ShiftTypes.LATE, ShiftTypes.EARLY)
+            self._reduce_shift_duplicates(grid, d, ShiftCode.EARLY, ShiftCode.LATE)
+            self._reduce_shift_duplicates(grid, d, ShiftCode.LATE, ShiftCode.EARLY)
     
-    def _reduce_shift_duplicates(self, schedule: Dict, fixed_days: Dict[str, Set[int]],
-                                  day_idx: int, target_shift: str, alt_shift: str) -> None:
+    def _reduce_shift_duplicates(self, grid: ShiftGrid, day_idx: int,
+                                  target_shift: int, alt_shift: int) -> None:
         """特定シフトの重複を解消"""
-        while self._count_day_staff(schedule, day_idx, [target_shift]) > 1:
-            staff_list = [s for s in self.staff_dict_list 
-                          if schedule[s["name"]][day_idx] == target_shift 
-                          and s["type"] == 0
-                          and day_idx not in fixed_days[s["name"]]]
+        while self._count_day_staff(grid, day_idx, (target_shift,)) > 1:
+            staff_list = [i for i in self.regular_idx
+                          if grid.rows[i][day_idx] == target_shift
+                          and not grid.is_fixed(i, day_idx)]
             
             if not staff_list:
                 break
             
             converted = False
-            for s in staff_list:
-                name = s["name"]
-                schedule[name][day_idx] = ""
+            for i in staff_list:
+                grid.set(i, day_idx, ShiftCode.EMPTY)
                 
                 # 日勤を試す
-                if self.rule_checker.check_rules(name, day_idx, schedule, ShiftTypes.DAY):
-                    schedule[name][day_idx] = ShiftTypes.DAY
+                if self.rule_checker.check_rules(i, day_idx, grid, ShiftCode.DAY):
+                    grid.set(i, day_idx, ShiftCode.DAY)
                     converted = True
                     break
                 # 代替シフトを試す（不足している場合のみ）
-                elif self._count_day_staff(schedule, day_idx, [alt_shift]) == 0:
-                    if self.rule_checker.check_rules(name, day_idx, schedule, alt_shift):
-                        schedule[name][day_idx] = alt_shift
+                elif self._count_day_staff(grid, day_idx, (alt_shift,)) == 0:
+                    if self.rule_checker.check_rules(i, day_idx, grid, alt_shift):
+                        grid.set(i, day_idx, alt_shift)
                         converted = True
                         break
                 
-                schedule[name][day_idx] = target_shift
+                grid.set(i, day_idx, target_shift)
             
             if not converted:
+                # 日勤・代替シフト以外（公休など）でルールを満たせるなら、それを選ぶ
+                codes = (ShiftCode.DAY, ShiftCode.OFF)
+                if self._count_day_staff(grid, day_idx, (alt_shift,)) == 0:
+                    codes += (alt_shift,)
+                if self._sample_legal_cells(staff_list[0], grid, [day_idx], codes):
+                    continue
                 # 最後の手段：ルールを無視して日勤に変更
-                for s in staff_list:
-                    schedule[s["name"]][day_idx] = ShiftTypes.DAY
-                    break
+                grid.set(staff_list[0], day_idx, ShiftCode.DAY)
     
     # =========================================================================
     # 最終処理
     # =========================================================================
     
-    def _phase_final_cleanup(self, schedule: Dict) -> None:
+    def _phase_final_cleanup(self, grid: ShiftGrid) -> None:
         """最終クリーンアップ: 空スロットを埋める"""
-        for s in self.staff_dict_list:
-            name = s["name"]
+        for i in range(self.n_staff):
+            row = grid.rows[i]
             for d in range(self.days):
-                if schedule[name][d] == "":
-                    if self.rule_checker.check_rules(name, d, schedule, ShiftTypes.DAY):
-                        schedule[name][d] = ShiftTypes.DAY
-                    elif self.rule_checker.check_rules(name, d, schedule, ShiftTypes.OFF):
-                        schedule[name][d] = ShiftTypes.OFF
+                if row[d] == ShiftCode.EMPTY:
+                    if self.rule_checker.check_rules(i, d, grid, ShiftCode.DAY):
+                        grid.set(i, d, ShiftCode.DAY)
+                    elif self.rule_checker.check_rules(i, d, grid, ShiftCode.OFF):
+                        grid.set(i, d, ShiftCode.OFF)
                     else:
-                        schedule[name][d] = ShiftTypes.DAY  # 強制配置
+                        # 1セルずつでは埋まらない場合、残りの空きをまとめてルールを満たすように埋める
+                        rest = [e for e in range(d, self.days) if row[e] == ShiftCode.EMPTY]
+                        if self._sample_legal_cells(i, grid, rest, _CLEANUP_CODES):
+                            break
+                        grid.set(i, d, ShiftCode.DAY)  # 強制配置
+    
+    def _sample_legal_cells(self, staff_idx: int, grid: ShiftGrid, free_days: List[int],
+                            codes: Tuple[int, ...]) -> bool:
+        """
+        行のfree_daysのセルを、行全体がルールを満たすようにcodesのいずれかで埋める
+        
+        他のセルはそのままにして、ルールを満たす埋め方をRowPatternSamplerで一様に選ぶ。
+        勤務日数は上限（work_limits）以内を優先し、無理なら上限を外して選ぶ。
+        
+        Returns:
+            埋めた場合True（ルールを満たす埋め方がなければ何もせずFalse）
+        """
+        row = grid.rows[staff_idx]
+        free = set(free_days)
+        allowed = [codes if d in free else (row[d],) for d in range(self.days)]
+        nights = sum(1 for d in range(self.days) if d not in free and row[d] == ShiftCode.NIGHT)
+        automaton, start = self.rule_checker.row_automaton(staff_idx)
+        
+        for work_limit in (self.work_limits[staff_idx], self.days):
+            pattern = RowPatternSampler(automaton, start, allowed, work_limit, nights).sample()
+            if pattern is not None:
+                for d in free_days:
+                    grid.set(staff_idx, d, pattern[d])
+                return True
+        return False
     
     # =========================================================================
     # スコアリング・エラー収集
     # =========================================================================
     
-    def _calc_score(self, schedule: Dict) -> int:
+    def _calc_score(self, grid: ShiftGrid) -> int:
         """スケジュールのスコアを計算"""
-        score = 0
-        
+        return -sum(self._calc_penalties(grid).values())
+    
+    def _calc_penalties(self, grid: ShiftGrid) -> Dict[str, int]:
+        """スコアの内訳（各ペナルティ）を計算"""
         # 公休数ペナルティ
-        for s in self.staff_dict_list:
-            if s["type"] == 0:
-                cnt = sum(1 for x in schedule[s["name"]] if x.strip() == ShiftTypes.OFF)
-                score -= abs(cnt - self.target_off_days) * SolverConfig.PENALTY_OFF_DAYS
+        off_penalty = 0
+        for i in self.regular_idx:
+            cnt = grid.count_in_row(i, ShiftCode.OFF_CODES)
+            off_penalty += abs(cnt - self.target_off_days) * SolverConfig.PENALTY_OFF_DAYS
         
         # 夜勤目標ペナルティ
-        for s in self.staff_dict_list:
-            if s["night_target"] > 0:
-                cnt = schedule[s["name"]].count(ShiftTypes.NIGHT)
-                score -= abs(cnt - s["night_target"]) * SolverConfig.PENALTY_NIGHT_TARGET
-        
-        # 欠員ペナルティ
-        score -= self._calc_missing_penalty(schedule)
-        
-        # 重複ペナルティ
-        score -= self._calc_duplicate_penalty(schedule)
+        night_penalty = 0
+        for i, target in enumerate(self.night_targets):
+            if target > 0:
+                cnt = grid.count_in_row(i, _NIGHT)
+                night_penalty += abs(cnt - target) * SolverConfig.PENALTY_NIGHT_TARGET
         
-        # 平準化ペナルティ
-        score -= self._calc_variance_penalty(schedule)
-        
-        return score
+        return {
+            "off_days": off_penalty,
+            "night_target": night_penalty,
+            "missing": self._calc_missing_penalty(grid),      # 欠員ペナルティ
+            "duplicate": self._calc_duplicate_penalty(grid),  # 重複ペナルティ
+            "variance": self._calc_variance_penalty(grid),    # 平準化ペナルティ
+        }
     
-    def _calc_missing_penalty(self, schedule: Dict) -> int:
+    def _calc_missing_penalty(self, grid: ShiftGrid) -> int:
         """欠員ペナルティを計算"""
         penalty = 0
         
-        early_missing = sum(1 for d in range(self.days) 
-                            if self._count_day_staff(schedule, d, [ShiftTypes.EARLY]) == 0)
-        late_missing = sum(1 for d in range(self.days) 
-                           if self._count_day_staff(schedule, d, [ShiftTypes.LATE]) == 0)
-        night_missing = sum(1 for d in range(self.days) 
-                            if self._count_day_staff(schedule, d, [ShiftTypes.NIGHT]) == 0)
-        day_shortage = sum(1 for d in range(self.days) 
-                           if self._count_day_staff(schedule, d, ShiftTypes.DAY_SHIFTS) < SolverConfig.MIN_DAY_STAFF)
+        early_missing = sum(1 for d in range(self.days)
+                            if self._count_day_staff(grid, d, _EARLY) == 0)
+        late_missing = sum(1 for d in range(self.days)
+                           if self._count_day_staff(grid, d, _LATE) == 0)
+        night_missing = sum(1 for d in range(self.days)
+                            if self._count_day_staff(grid, d, _NIGHT) == 0)
+        day_shortage = sum(1 for d in range(self.days)
+                           if self._count_day_staff(grid, d, ShiftCode.DAY_SHIFTS) < SolverConfig.MIN_DAY_STAFF)
         
         penalty += early_missing * SolverConfig.PENALTY_EARLY_MISSING
         penalty += late_missing * SolverConfig.PENALTY_LATE_MISSING
@@ -744,37 +867,32 @@ class ShiftSolver:
         
         return penalty
     
-    def _calc_duplicate_penalty(self, schedule: Dict) -> int:
+    def _calc_duplicate_penalty(self, grid: ShiftGrid) -> int:
         """重複ペナルティを計算"""
-        early_duplicate = sum(1 for d in range(self.days) 
-                              if self._count_day_staff(schedule, d, [ShiftTypes.EARLY]) > 1)
-        late_duplicate = sum(1 for d in range(self.days) 
-                             if self._count_day_staff(schedule, d, [ShiftTypes.LATE]) > 1)
+        early_duplicate = sum(1 for d in range(self.days)
+                              if self._count_day_staff(grid, d, _EARLY) > 1)
+        late_duplicate = sum(1 for d in range(self.days)
+                             if self._count_day_staff(grid, d, _LATE) > 1)
         
         return (early_duplicate + late_duplicate) * SolverConfig.PENALTY_DUPLICATE
     
-    def _calc_variance_penalty(self, schedule: Dict) -> int:
+    def _calc_variance_penalty(self, grid: ShiftGrid) -> int:
         """平準化ペナルティを計算"""
-        daily_counts = self._get_daily_counts(schedule)
-        variance = self._calc_variance(daily_counts)
-        penalty = int(variance * SolverConfig.PENALTY_VARIANCE)
-        
-        if daily_counts:
-            max_cnt = max(daily_counts)
-            min_cnt = min(daily_counts)
-            if max_cnt - min_cnt >= 3:
-                penalty += (max_cnt - min_cnt) * SolverConfig.PENALTY_RANGE
-        
-        return penalty
+        return calc_variance_penalty(self._get_daily_counts(grid), SolverConfig)
     
-    def _collect_errors(self, schedule: Dict) -> List[str]:
+    def _create_evaluator(self, grid: ShiftGrid) -> ScoreEvaluator:
+        """シフト表のスコアを差分で評価するオブジェクトを作成"""
+        return ScoreEvaluator(grid, self.regular_idx, self.target_off_days,
+                              self.night_targets, SolverConfig)
+    
+    def _collect_errors(self, grid: ShiftGrid) -> List[str]:
         """エラーを収集"""
         errors = []
         
         # シフト配置エラー
         for d in range(self.days):
-            early_cnt = self._count_day_staff(schedule, d, [ShiftTypes.EARLY])
-            late_cnt = self._count_day_staff(schedule, d, [ShiftTypes.LATE])
+            early_cnt = self._count_day_staff(grid, d, _EARLY)
+            late_cnt = self._count_day_staff(grid, d, _LATE)
             
             if early_cnt == 0:
                 errors.append(f"{d+1}日: 早番を配置できませんでした")
@@ -786,77 +904,612 @@ class ShiftSolver:
             elif late_cnt > 1:
                 errors.append(f"{d+1}日: 遅番が{late_cnt}名います（1名が原則）")
             
-            if not any(schedule[s["name"]][d] == ShiftTypes.NIGHT for s in self.staff_dict_list):
+            if self._count_day_staff(grid, d, _NIGHT) == 0:
                 errors.append(f"{d+1}日: 夜勤を配置できませんでした")
         
         # 空スロットエラー
-        for s in self.staff_dict_list:
-            name = s["name"]
-            empty_days = [d+1 for d in range(self.days) if schedule[name][d] == ""]
+        for i, name in enumerate(self.names):
+            row = grid.rows[i]
+            empty_days = [d+1 for d in range(self.days) if row[d] == ShiftCode.EMPTY]
             if empty_days:
                 errors.append(f"{name}: {','.join(map(str, empty_days))}日が未配置です")
         
+        # シフトルール違反（固定シフト・前月末の勤務により避けられない場合）
+        for i in self.regular_idx:
+            bad_day = self.rule_checker.validate_row(i, grid)
+            if bad_day is not None:
+                errors.append(f"{self.names[i]}: {bad_day+1}日がシフトルールを満たしていません")
+        
         return errors
     
     # =========================================================================
     # メイン処理
     # =========================================================================
     
-    def solve(self) -> Tuple[Dict, List[str]]:
+    def solve(self, progress_callback: Optional[Callable[[Dict], None]] = None,
+              include_schedule: bool = False, cancel_event=None) -> Tuple[Dict, List[str]]:
         """
         シフトを計算する
         
+        engine の名前で登録された探索エンジン（engines.py）で最良解を求める。
+        workers > 1 の場合は試行回数を複数プロセスに分割して並列探索する。
+        engine が tabu の場合は1回構築したスケジュールからタブー探索を行う（逐次実行）。
+        engine が exact の場合は厳密解法で解き、解が得られなければ通常の探索を行う。
+        engine が portfolio の場合は multistart・tabu・exact を別々のプロセスで競わせる。
+        engine が colgen の場合は1回構築したスケジュールから列生成を行う（逐次実行）。
+        lns_iterations・lns_time_ms が指定されていれば、探索で得た最良解を
+        破壊と再構築で改善する。anneal_iterations・anneal_time_ms が指定されていれば、
+        さらに焼きなましで改善する。
+        計算前に初期状態から解消できない欠員を求め（analyze()）、見つかった場合は
+        試行回数をINFEASIBLE_MAX_ATTEMPTSまでに抑えて、欠員の説明をエラーの先頭に加える。
+        
+        Args:
+            progress_callback: 進捗通知用コールバック。最良スコア更新時と
+                               一定試行ごとに進捗の辞書を渡す
+                               （attempts, best_score, penalties, improved, schedule）
+            include_schedule: 最良スコア更新時の進捗に最良スケジュールを含めるか
+            cancel_event: キャンセル用イベント（is_set()を持つオブジェクト）。
+                          試行間・フェーズ間で確認し、セットされていれば中断する
+        
+        Returns:
+            (schedule, errors): シフト表（{スタッフ名: [日1, 日2, ...]}）とエラーリストのタプル
+        
+        Raises:
+            SolveCancelled: cancel_eventがセットされた場合
+            ValueError: engine が登録されていない名前の場合
+        """
+        deadline = None
+        if self.time_limit_ms is not None:
+            deadline = time.monotonic() + self.time_limit_ms / 1000
+        
+        # 並列実行時もワーカーに計算済みの初期状態を渡す
+        self._get_seed_state()
+        
+        # 解消できない欠員が分かっている場合は、欠員のない解を探し続けないよう試行回数を抑える
+        self.feasibility = self.analyze()
+        max_attempts = self.max_attempts
+        if not self.feasibility.feasible:
+            self.max_attempts = min(max_attempts, SolverConfig.INFEASIBLE_MAX_ATTEMPTS)
+        
+        self.exact_status = None
+        engine = get_engine(self.engine)
+        try:
+            result = engine(self, cancel_event, progress_callback, include_schedule, deadline)
+        finally:
+            self.max_attempts = max_attempts
+        
+        if result.schedule is not None and (self.lns_iterations or self.lns_time_ms):
+            result = self._apply_improvement(result, *self._run_lns(result, cancel_event),
+                                             progress_callback, include_schedule)
+        
+        if result.schedule is not None and (self.anneal_iterations or self.anneal_time_ms):
+            result = self._apply_improvement(result, *self._run_anneal(result, cancel_event),
+                                             progress_callback, include_schedule)
+        
+        if cancel_event is not None and cancel_event.is_set():
+            raise SolveCancelled()
+        
+        self.attempts_completed = result.attempts
+        self.early_exit = result.early_exit
+        
+        best_grid = result.schedule
+        if best_grid is None:
+            return None, []
+        errors = self.feasibility.issues + self._collect_errors(best_grid)
+        return best_grid.to_dict(self.names), errors
+    
+    def analyze(self) -> FeasibilityReport:
+        """
+        計算前に、固定シフト・希望だけから解消できない欠員を求める（feasibility.py）
+        
         Returns:
-            (schedule, errors): シフト表とエラーリストのタプル
+            充足可能性の分析結果
+        """
+        return FeasibilityAnalyzer(self, SolverConfig).analyze()
+    
+    def _search_multistart(self, stop_event=None,
+                           progress_callback: Optional[Callable[[Dict], None]] = None,
+                           include_schedule: bool = False,
+                           deadline: Optional[float] = None) -> SearchResult:
+        """max_attempts回の試行を行う（workers > 1 の場合は並列）"""
+        if self.workers > 1 and self.max_attempts > 1:
+            return self._merge_results(solve_parallel(
+                self, self.workers, progress_callback, include_schedule, stop_event, deadline))
+        return self._search(self.max_attempts, stop_event, progress_callback,
+                            include_schedule, deadline)
+    
+    def _search(self, attempts: int, stop_event=None,
+                progress_callback: Optional[Callable[[Dict], None]] = None,
+                include_schedule: bool = False,
+                deadline: Optional[float] = None) -> SearchResult:
+        """
+        指定回数の試行を行い、最良のスケジュールを返す
+        
+        Args:
+            attempts: 試行回数
+            stop_event: 停止イベント（is_set()を持つオブジェクト）。
+                        試行間・フェーズ間で確認し、セットされていれば
+                        その時点の最良解を返す（途中の試行は破棄）
+            progress_callback: 進捗通知用コールバック
+            include_schedule: 最良スコア更新時の進捗に最良スケジュールを含めるか
+            deadline: 打ち切り時刻（time.monotonic()基準）。
+                      最初の1試行は必ず完了させる
+        
+        Returns:
+            探索結果
         """
         best_schedule = None
-        best_score = -999999
-        
-        for _ in range(self.max_attempts):
-            schedule = {s["name"]: [""] * self.days for s in self.staff_dict_list}
-            night_counts = {s["name"]: 0 for s in self.staff_dict_list}
-            fixed_days = {s["name"]: set() for s in self.staff_dict_list}
-            
-            # 各フェーズを実行
-            self._phase0_prev_month(schedule, fixed_days)
-            self._phase1_fixed_and_requests(schedule, fixed_days, night_counts)
-            self._phase2_night_requests(schedule, fixed_days, night_counts)
-            self._phase3_daily_night(schedule, night_counts)
-            self._phase4_early_late(schedule)
-            self._phase5_fill_day(schedule)
-            self._phase6_fill_off(schedule)
-            self._phase6b_fill_remaining_with_day(schedule)
-            self._phase7_balance(schedule, fixed_days)
-            self._phase8_adjust(schedule, fixed_days)
-            self._phase9_reduce_duplicates(schedule, fixed_days)
-            self._phase_final_cleanup(schedule)
+        best_score = SolverConfig.INITIAL_BEST_SCORE
+        best_penalties: Dict[str, int] = {}
+        completed = 0
+        exit_early = False
+        
+        def should_stop() -> bool:
+            if stop_event is not None and stop_event.is_set():
+                return True
+            return (deadline is not None and best_schedule is not None
+                    and time.monotonic() >= deadline)
+        
+        for attempt in range(1, attempts + 1):
+            if should_stop():
+                break
+            
+            try:
+                # 最良解を上回れないと分かった試行は途中で打ち切る
+                prune_at = best_score if best_schedule is not None else None
+                schedule = self._run_attempt(should_stop, prune_at)
+            except SolveCancelled:
+                break
+            completed = attempt
+            if schedule is None:
+                if (progress_callback is not None
+                        and attempt % SolverConfig.PROGRESS_INTERVAL == 0):
+                    progress_callback({
+                        "attempts": attempt,
+                        "best_score": best_score,
+                        "penalties": best_penalties,
+                        "improved": False,
+                    })
+                continue
             
             # スコア計算
-            score = self._calc_score(schedule)
+            penalties = self._calc_penalties(schedule)
+            score = -sum(penalties.values())
             
-            if score > best_score:
+            improved = score > best_score
+            if improved:
                 best_score = score
-                best_schedule = copy.deepcopy(schedule)
+                best_schedule = schedule
+                best_penalties = penalties
+            
+            exit_early = self._should_exit_early(schedule, score)
+            
+            if progress_callback is not None and (
+                    improved or exit_early or attempt % SolverConfig.PROGRESS_INTERVAL == 0):
+                progress = {
+                    "attempts": attempt,
+                    "best_score": best_score,
+                    "penalties": best_penalties,
+                    "improved": improved,
+                }
+                if improved and include_schedule:
+                    progress["schedule"] = best_schedule.to_dict(self.names)
+                progress_callback(progress)
             
             # 早期終了判定
-            if self._should_exit_early(schedule, score):
+            if exit_early:
+                break
+        
+        return SearchResult(best_schedule, best_score, completed, exit_early)
+    
+    def _search_exact(self, stop_event=None,
+                      progress_callback: Optional[Callable[[Dict], None]] = None,
+                      include_schedule: bool = False,
+                      deadline: Optional[float] = None) -> SearchResult:
+        """
+        厳密解法で解く
+        
+        構築フェーズを1回実行した結果（CP-SATでは初期解の候補）と厳密解法の解のうち、
+        良い方を返す。結果の状態はself.exact_statusに保存する。
+        
+        Args:
+            deadline: 打ち切り時刻（time.monotonic()基準）。指定時は残り時間を厳密解法の時間上限にする
+        
+        Returns:
+            探索結果
+        """
+        should_stop = stop_event.is_set if stop_event is not None else None
+        exact = ExactSolver(self, SolverConfig)
+        hint = self._run_attempt(should_stop)
+        time_limit_ms = self.time_limit_ms
+        if deadline is not None:
+            time_limit_ms = max(1, int((deadline - time.monotonic()) * 1000))
+        result = exact.solve(
+            time_limit_ms=time_limit_ms,
+            workers=self.workers,
+            should_stop=should_stop,
+            hint=hint if exact.backend == "cp-sat" else None
+        )
+        self.exact_status = result.status
+        
+        grid, score = hint, self._calc_score(hint)
+        if result.grid is not None:
+            # 時間切れ・平準化を考慮しない解（バックトラッキング）が構築の結果より悪ければ構築の結果を採用する
+            exact_score = self._calc_score(result.grid)
+            if exact_score >= score:
+                grid, score = result.grid, exact_score
+        if progress_callback is not None:
+            progress = {
+                "attempts": 1,
+                "best_score": score,
+                "penalties": self._calc_penalties(grid),
+                "improved": True,
+            }
+            if include_schedule:
+                progress["schedule"] = grid.to_dict(self.names)
+            progress_callback(progress)
+        
+        return SearchResult(grid, score, 1, self._should_exit_early(grid, score))
+    
+    def _search_tabu(self, stop_event=None,
+                     progress_callback: Optional[Callable[[Dict], None]] = None,
+                     include_schedule: bool = False,
+                     deadline: Optional[float] = None) -> SearchResult:
+        """
+        1回構築したスケジュールからタブー探索を行う
+        
+        max_attempts をタブー探索の反復回数として扱う。最良解が早期終了条件を満たした時点で終了する。
+        引数は_search()と同じ（最初の構築は必ず完了させる）。
+        
+        Returns:
+            探索結果（attemptsはタブー探索の反復回数）
+        """
+        tabu = TabuSearch(self.rule_checker, self.regular_idx)
+        return self._search_from_attempt(tabu.run, stop_event, progress_callback,
+                                         include_schedule, deadline)
+    
+    def _search_colgen(self, stop_event=None,
+                       progress_callback: Optional[Callable[[Dict], None]] = None,
+                       include_schedule: bool = False,
+                       deadline: Optional[float] = None) -> SearchResult:
+        """
+        1回構築したスケジュールの行を最初の候補として列生成を行う
+        
+        max_attempts を価格付け（候補の追加）の回数として扱う。最良解が早期終了条件を満たした時点で終了する。
+        引数は_search()と同じ（最初の構築は必ず完了させる）。
+        
+        Returns:
+            探索結果（attemptsは価格付けの回数）
+        """
+        colgen = ColumnGeneration(self, SolverConfig)
+        # 複数回の構築の行を最初の候補に加え、最良の構築から始める
+        should_stop = stop_event.is_set if stop_event is not None else None
+        start, start_score = None, SolverConfig.INITIAL_BEST_SCORE
+        for attempt in range(ColumnGenerationConfig.SEED_ATTEMPTS):
+            if attempt > 0 and ((should_stop is not None and should_stop())
+                                or (deadline is not None and time.monotonic() >= deadline)):
                 break
+            grid = self._run_attempt(should_stop)
+            colgen.add_rows(grid)
+            score = self._calc_score(grid)
+            if score > start_score:
+                start, start_score = grid, score
+        return self._search_from_attempt(colgen.run, stop_event, progress_callback,
+                                         include_schedule, deadline, start)
+    
+    def _search_from_attempt(self, improve: Callable[..., Tuple[ShiftGrid, int, int]],
+                             stop_event=None,
+                             progress_callback: Optional[Callable[[Dict], None]] = None,
+                             include_schedule: bool = False,
+                             deadline: Optional[float] = None,
+                             start: Optional[ShiftGrid] = None) -> SearchResult:
+        """
+        1回構築したスケジュールをimproveで改善する（タブー探索・列生成で共通）
         
-        errors = self._collect_errors(best_schedule) if best_schedule else []
-        return best_schedule, errors
+        Args:
+            improve: 改善処理（TabuSearch.run・ColumnGeneration.runと同じ引数で、
+                     (best_grid, best_score, iterations) を返す）。
+                     max_attempts を反復回数として渡す
+            start: 改善を始めるスケジュール（省略時はここで1回構築する）
+            その他の引数は_search()と同じ（最初の構築は必ず完了させる）
+        
+        Returns:
+            探索結果（attemptsはimproveの反復回数）
+        """
+        grid = start if start is not None else self._run_attempt()
+        evaluator = self._create_evaluator(grid)
+        exit_early = self._should_exit_early(grid, evaluator.score)
+        
+        def report_progress(iteration: int, best_grid: ShiftGrid, best_score: int,
+                            improved: bool) -> None:
+            nonlocal exit_early
+            if improved:
+                exit_early = self._should_exit_early(best_grid, best_score)
+            if progress_callback is None:
+                return
+            progress = {
+                "attempts": iteration,
+                "best_score": best_score,
+                "penalties": self._calc_penalties(best_grid),
+                "improved": improved,
+            }
+            if improved and include_schedule:
+                progress["schedule"] = best_grid.to_dict(self.names)
+            progress_callback(progress)
+        
+        def should_stop() -> bool:
+            return exit_early or (stop_event is not None and stop_event.is_set())
+        
+        if progress_callback is not None:
+            report_progress(0, grid, evaluator.score, True)
+        
+        best_grid, best_score, iterations = improve(
+            evaluator,
+            iterations=self.max_attempts,
+            deadline=deadline,
+            should_stop=should_stop,
+            progress_callback=report_progress
+        )
+        
+        return SearchResult(best_grid, best_score, iterations, exit_early)
+    
+    def _run_lns(self, result: SearchResult, stop_event=None) -> Tuple[ShiftGrid, int]:
+        """
+        探索結果の最良解を破壊と再構築で改善する
+        
+        Returns:
+            (best_grid, best_score)
+        """
+        deadline = None
+        if self.lns_time_ms is not None:
+            deadline = time.monotonic() + self.lns_time_ms / 1000
+        
+        return LargeNeighbourhoodSearch(self).run(
+            result.schedule,
+            result.score,
+            iterations=self.lns_iterations or None,
+            deadline=deadline,
+            should_stop=stop_event.is_set if stop_event is not None else None
+        )
+    
+    def _run_anneal(self, result: SearchResult, stop_event=None) -> Tuple[ShiftGrid, int]:
+        """
+        探索結果の最良解を焼きなましで改善する
+        
+        Returns:
+            (best_grid, best_score)
+        """
+        deadline = None
+        if self.anneal_time_ms is not None:
+            deadline = time.monotonic() + self.anneal_time_ms / 1000
+        
+        evaluator = self._create_evaluator(result.schedule.copy())
+        annealer = SimulatedAnnealing(self.rule_checker, self.regular_idx)
+        return annealer.run(
+            evaluator,
+            iterations=self.anneal_iterations or None,
+            deadline=deadline,
+            should_stop=stop_event.is_set if stop_event is not None else None
+        )
+    
+    def _apply_improvement(self, result: SearchResult, best_grid: ShiftGrid, best_score: int,
+                           progress_callback: Optional[Callable[[Dict], None]] = None,
+                           include_schedule: bool = False) -> SearchResult:
+        """
+        改善段階の結果を探索結果に反映する（改善した場合は進捗を通知する）
+        
+        Args:
+            result: 改善前の探索結果
+            best_grid: 改善段階の最良スケジュール
+            best_score: best_gridのスコア
+            progress_callback: 進捗通知用コールバック
+            include_schedule: 進捗に最良スケジュールを含めるか
+        
+        Returns:
+            反映後の探索結果
+        """
+        if best_score <= result.score:
+            return result
+        
+        if progress_callback is not None:
+            progress = {
+                "attempts": result.attempts,
+                "best_score": best_score,
+                "penalties": self._calc_penalties(best_grid),
+                "improved": True,
+            }
+            if include_schedule:
+                progress["schedule"] = best_grid.to_dict(self.names)
+            progress_callback(progress)
+        
+        return result._replace(schedule=best_grid, score=best_score)
+    
+    def _merge_results(self, results: List[SearchResult]) -> SearchResult:
+        """並列ワーカーの探索結果を最良スコアでまとめる"""
+        best_schedule = None
+        best_score = SolverConfig.INITIAL_BEST_SCORE
+        for result in results:
+            if result.schedule is None:
+                continue
+            score = self._calc_score(result.schedule)
+            if score > best_score:
+                best_schedule = result.schedule
+                best_score = score
+        
+        return SearchResult(
+            best_schedule,
+            best_score,
+            sum(r.attempts for r in results),
+            any(r.early_exit for r in results)
+        )
+    
+    def _get_seed_state(self) -> Tuple[ShiftGrid, List[int]]:
+        """
+        Phase 0-2 を実行した初期状態を取得する（初回のみ計算してキャッシュ）
+        
+        Phase 0-2 は乱数を使わないため、全試行で同じ結果になる。
+        固定セルのフラグはこの時点で確定し、以降は変更しない。
+        
+        Returns:
+            (grid, night_counts)
+        """
+        if self._seed_state is None:
+            grid = ShiftGrid(self.n_staff, self.days)
+            night_counts = [0] * self.n_staff
+            
+            self._phase0_prev_month(grid)
+            self._phase1_fixed_and_requests(grid, night_counts)
+            self._phase2_night_requests(grid, night_counts)
+            
+            self._seed_state = (grid, night_counts)
+        return self._seed_state
+    
+    def _run_attempt(self, should_stop: Optional[Callable[[], bool]] = None,
+                     prune_at: Optional[int] = None) -> Optional[ShiftGrid]:
+        """
+        全フェーズを1回実行してスケジュールを構築する
+        
+        Phase 0-2 はキャッシュした初期状態を複製して使い、Phase 3 以降を実行する。
+        
+        Args:
+            should_stop: フェーズ間で呼ばれる中断判定関数
+            prune_at: 最終スコアがこの値以下にしかならないと分かった時点で試行を打ち切る
+                      （分枝限定法。Noneの場合は打ち切らない）
+        
+        Returns:
+            スケジュール（prune_atにより打ち切った場合はNone）
+        
+        Raises:
+            SolveCancelled: フェーズ間でshould_stop()がTrueを返した場合
+        """
+        seed_grid, seed_night_counts = self._get_seed_state()
+        # セルフラグは Phase 3 以降では参照のみのため複製せず共有される
+        grid = seed_grid.copy()
+        night_counts = list(seed_night_counts)
+        
+        phases = [
+            (self._phase3_daily_night, (grid, night_counts)),
+            (self._phase4_early_late, (grid,)),
+            (self._phase5_fill_day, (grid,)),
+            (self._phase6_fill_off, (grid,)),
+            (self._phase6b_fill_remaining_with_day, (grid,)),
+            (self._phase7_balance, (grid,)),
+            (self._phase8_adjust, (grid,)),
+            (self._phase9_reduce_duplicates, (grid,)),
+            (self._phase_final_cleanup, (grid,)),
+        ]
+        
+        # 各フェーズを実行
+        for phase, args in phases:
+            if should_stop is not None and should_stop():
+                raise SolveCancelled()
+            phase(*args)
+            if prune_at is not None and self._is_hopeless(grid, phase, prune_at):
+                return None
+        
+        return grid
+    
+    # =========================================================================
+    # 分枝限定法による試行の打ち切り
+    # =========================================================================
+    
+    def _is_hopeless(self, grid: ShiftGrid, phase: Callable, prune_at: int) -> bool:
+        """
+        フェーズ終了時点で、最終スコアがprune_at以下にしかならないと分かるか（Phase 4 後に判定）
+        
+        最終スコアの上界は、以降のフェーズで減らせないペナルティの合計から求める。
+        Phase 5 以降は夜勤・明け・固定日のセルとパートスタッフの行を書き換えないため、
+        - 夜勤の欠員・夜勤目標のペナルティは確定している
+        - 日勤帯に入りうるスタッフが最低人員に届かない日の不足は解消できない
+        - どの常勤スタッフもルール上入れない日の早番・遅番の欠員は解消できない
+        """
+        if phase != self._phase4_early_late:
+            return False
+        
+        cfg = SolverConfig
+        size = ShiftCode.SIZE
+        counts = grid.day_counts
+        nights = counts[ShiftCode.NIGHT::size]
+        rests = counts[ShiftCode.NIGHT_REST::size]
+        night_penalty = sum(abs(grid.count_in_row(i, _NIGHT) - target)
+                            for i, target in enumerate(self.night_targets) if target > 0)
+        bound = -(night_penalty * cfg.PENALTY_NIGHT_TARGET
+                  + nights.count(0) * cfg.PENALTY_NIGHT_MISSING)
+        # 日勤帯に入りうる人数: 書き換えられるセル（夜勤・明け以外）と、書き換えられない日勤帯のセル
+        bound -= cfg.PENALTY_DAY_SHORTAGE * sum(
+            1 for base, night, rest in zip(self._get_capacity_base(), nights, rests)
+            if base - night - rest < cfg.MIN_DAY_STAFF)
+        
+        early = counts[ShiftCode.EARLY::size]
+        late = counts[ShiftCode.LATE::size]
+        if bound - (early.count(0) * cfg.PENALTY_EARLY_MISSING
+                    + late.count(0) * cfg.PENALTY_LATE_MISSING) > prune_at:
+            return False  # 欠員がすべて解消できなくても上回れる
+        missing = ([(d, ShiftCode.EARLY, cfg.PENALTY_EARLY_MISSING)
+                    for d in range(self.days) if early[d] == 0]
+                   + [(d, ShiftCode.LATE, cfg.PENALTY_LATE_MISSING)
+                      for d in range(self.days) if late[d] == 0])
+        
+        # 早番・遅番に入れるスタッフがいない日: 書き換えられないセルに挟まれて
+        # 隣接する日のルール（check_rulesと同じ遷移表）を満たせない場合（連勤は確認しない）
+        for d, code, penalty in missing:
+            if not any(self._may_take(grid, i, d, code) for i in self.regular_idx):
+                bound -= penalty
+        
+        return bound <= prune_at
+    
+    def _may_take(self, grid: ShiftGrid, staff_idx: int, day_idx: int, code: int) -> bool:
+        """
+        Phase 5 以降にセルがcodeになりうるか
+        
+        書き換えられるセルで、前日・翌日のうち書き換えられないものとの組がルールを満たすか。
+        書き換えられる前日・翌日は空き（どのシフトとも組める）とみなす。
+        """
+        if self._is_frozen(grid, staff_idx, day_idx):
+            return False
+        prev = ShiftCode.EMPTY
+        if day_idx == 0:
+            prev = self.rule_checker.get_prev_shift(staff_idx, 0, grid)
+        elif self._is_frozen(grid, staff_idx, day_idx - 1):
+            prev = grid.rows[staff_idx][day_idx - 1] & ShiftCode.KIND_MASK
+        following = ShiftCode.EMPTY
+        if day_idx + 1 < self.days and self._is_frozen(grid, staff_idx, day_idx + 1):
+            following = grid.rows[staff_idx][day_idx + 1] & ShiftCode.KIND_MASK
+        return PLACE_LEGAL[prev][code][following]
+    
+    def _get_capacity_base(self) -> List[int]:
+        """
+        日ごとの「日勤帯に入りうる人数 + 夜勤・明けの人数」（初期状態から1回だけ求める）
+        
+        Phase 3 以降の夜勤・明けの人数を引くと、日勤帯に入りうる人数になる。
+        """
+        if self._capacity_base is None:
+            seed, _ = self._get_seed_state()
+            self._capacity_base = [
+                sum(1 for i in range(self.n_staff)
+                    if not self._is_frozen(seed, i, d) or seed.rows[i][d] in _NIGHT_AND_REST
+                    or IS_DAY_SHIFT[seed.rows[i][d]])
+                for d in range(self.days)]
+        return self._capacity_base
+    
+    def _is_frozen(self, grid: ShiftGrid, staff_idx: int, day_idx: int) -> bool:
+        """Phase 4 以降に書き換えられないセルか（固定日・夜勤・明け・パートスタッフの行）"""
+        if staff_idx not in self._regular_set or grid.is_fixed(staff_idx, day_idx):
+            return True
+        return grid.rows[staff_idx][day_idx] in (ShiftCode.NIGHT, ShiftCode.NIGHT_REST)
     
-    def _should_exit_early(self, schedule: Dict, score: int) -> bool:
+    def _should_exit_early(self, grid: ShiftGrid, score: int) -> bool:
         """早期終了すべきかどうか判定"""
         if score <= SolverConfig.EARLY_EXIT_SCORE:
             return False
         
-        early_missing = sum(1 for d in range(self.days) 
-                            if self._count_day_staff(schedule, d, [ShiftTypes.EARLY]) == 0)
-        late_missing = sum(1 for d in range(self.days) 
-                           if self._count_day_staff(schedule, d, [ShiftTypes.LATE]) == 0)
-        night_missing = sum(1 for d in range(self.days) 
-                            if self._count_day_staff(schedule, d, [ShiftTypes.NIGHT]) == 0)
-        day_shortage = sum(1 for d in range(self.days) 
-                           if self._count_day_staff(schedule, d, ShiftTypes.DAY_SHIFTS) < SolverConfig.MIN_DAY_STAFF)
+        early_missing = sum(1 for d in range(self.days)
+                            if self._count_day_staff(grid, d, _EARLY) == 0)
+        late_missing = sum(1 for d in range(self.days)
+                           if self._count_day_staff(grid, d, _LATE) == 0)
+        night_missing = sum(1 for d in range(self.days)
+                            if self._count_day_staff(grid, d, _NIGHT) == 0)
+        day_shortage = sum(1 for d in range(self.days)
+                           if self._count_day_staff(grid, d, ShiftCode.DAY_SHIFTS) < SolverConfig.MIN_DAY_STAFF)
         
         return early_missing == 0 and late_missing == 0 and night_missing == 0 and day_shortage == 0